@@ -0,0 +1 @@
+"""Benchmark suite for the research pipeline (run as ``python -m benchmarks.<name>``)."""
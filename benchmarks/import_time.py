@@ -0,0 +1,83 @@
+"""
+Import-time budget for the ``src`` package.
+
+Runs ``python -X importtime`` in a fresh interpreter for each module, with
+numpy and pandas pre-imported (they are unavoidable), and reports the extra
+cumulative import cost of the module against ``BUDGET_MS``.  Exits non-zero
+when a module goes over budget or pulls in a heavy optional dependency.
+
+    python -m benchmarks.import_time [--json out.json]
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+
+MODULES = ["src", "src.load", "src.factor_build", "src.neutralise", "src.portfolio", "src.report"]
+
+# extra milliseconds on top of numpy + pandas, per module
+BUDGET_MS = 75.0
+
+# modules that must only ever be imported on demand
+HEAVY = ("matplotlib", "statsmodels", "sklearn", "alphalens", "scipy")
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module: str) -> Dict[str, object]:
+    """Import ``module`` in a subprocess and parse its ``-X importtime`` trace."""
+    code = f"import numpy, pandas; import {module}"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative_us = 0
+    loaded: List[str] = []
+    seen_pandas = False
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        name = m.group(4)
+        if not seen_pandas:
+            seen_pandas = name == "pandas"
+            continue
+        loaded.append(name)
+        # top-level entries (no nesting indent) are what ``import module`` added
+        if len(m.group(3)) == 1:
+            cumulative_us += int(m.group(2))
+    heavy = sorted({n for n in loaded if n.split(".")[0] in HEAVY})
+    return {
+        "module": module,
+        "import_ms": cumulative_us / 1000.0,
+        "budget_ms": BUDGET_MS,
+        "heavy_imports": heavy,
+        "ok": cumulative_us / 1000.0 <= BUDGET_MS and not heavy,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    results = [measure(m) for m in MODULES]
+    for r in results:
+        flag = "ok " if r["ok"] else "FAIL"
+        extra = f"  heavy: {', '.join(r['heavy_imports'])}" if r["heavy_imports"] else ""
+        print(f"[{flag}] {r['module']:<18} {r['import_ms']:7.1f} ms / {BUDGET_MS:.0f} ms{extra}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+Stage benchmarks on synthetic data at multiples of the research scale.
+
+For every scale the universe of ``benchmarks.synthetic`` is multiplied (years
+and call frequency stay fixed), the parquets are generated once into
+``WORK_DIR/scale-<n>-y<years>-s<seed>`` and the public pipeline functions are run on them in a
+fresh worker process with ``TONE_TRACE`` pointed at a private trace, so wall
+and CPU time, the tracemalloc peak and input / output shapes come from
+``src.instrument``.  The worker's maximum RSS is reported per scale.
+
+    python -m benchmarks.stages [--scales 1 10 50] [--repeat 1] [--json out.json]
+                                [--compare baseline.json] [--work-dir DIR]
+
+With ``--compare`` each stage's wall time and peak memory are printed as a
+ratio against an earlier report of the same stage and scale.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from . import synthetic
+
+ROOT = Path(__file__).resolve().parents[1]
+
+WORK_DIR = ROOT / "data" / ".cache" / "bench"
+
+SCALES = (1, 10, 50)
+
+_FILES = ("stock_prices.parquet", "ff5_daily.parquet", "tone_dispersion.parquet")
+
+# timed in pipeline order; each consumes the previous stages' outputs
+STAGES = (
+    "build_daily_factor",
+    "neutralise",
+    "build_weights",
+    "pnl",
+    "calculate_turnover",
+    "calculate_metrics",
+    "analyze_factor_exposures",
+)
+
+
+def _run_stages(data_dir: str, trace: str, repeat: int) -> Dict[str, object]:
+    """Worker: run every stage ``repeat`` times against ``data_dir``."""
+    os.environ["TONE_TRACE"] = trace
+    os.environ.pop("TONE_PROFILE", None)
+
+    import resource
+
+    from src import load, neutralise, portfolio, report
+    from src.betas import FACTORS
+    from src.factor_build import build_daily_factor
+
+    load.DATA = Path(data_dir)
+    neutralise.FF = None
+    errors: Dict[str, str] = {}
+
+    def call(name, func, *args):
+        try:
+            return func(*args)
+        except Exception as exc:  # a failing stage must not hide the others
+            errors[name] = f"{type(exc).__name__}: {exc}"
+            return None
+
+    for _ in range(repeat):
+        load.cache.clear()
+        factor = call("build_daily_factor", build_daily_factor)
+        resid = None if factor is None else call("neutralise", neutralise.neutralise, factor)
+        weights = None if resid is None else call("build_weights", portfolio.build_weights, resid)
+        if weights is None:
+            continue
+        daily = call("pnl", portfolio.pnl, weights)
+        call("calculate_turnover", portfolio.calculate_turnover, weights)
+        if daily is None:
+            continue
+        call("calculate_metrics", report.calculate_metrics, daily)
+        ff = load.ff_factors(columns=FACTORS)
+        call("analyze_factor_exposures", report.analyze_factor_exposures, daily, ff)
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+    return {"max_rss_mb": round(rss_mb, 1), "errors": errors}
+
+
+def _records(trace: Path) -> List[Dict[str, object]]:
+    """Top-level records of the benchmarked stages in a trace file."""
+    if not trace.exists():
+        return []
+    with open(trace) as fh:
+        rows = [json.loads(line) for line in fh if line.strip()]
+    return [r for r in rows if r["stage"] in STAGES and r["parent"] is None]
+
+
+def bench_scale(
+    scale: int, work_dir: Path, repeat: int = 1, seed: int = 0, years: int = synthetic.BASE_YEARS
+) -> List[Dict[str, object]]:
+    """Generate (or reuse) the data for ``scale`` and benchmark every stage."""
+    symbols = synthetic.BASE_SYMBOLS * scale
+    data_dir = work_dir / f"scale-{scale}-y{years}-s{seed}"
+    if not all((data_dir / f).exists() for f in _FILES):
+        t0 = time.perf_counter()
+        synthetic.generate(data_dir, symbols=symbols, years=years, seed=seed)
+        print(f"generated scale {scale} in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+    trace = data_dir / "trace.jsonl"
+    trace.unlink(missing_ok=True)
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        worker = pool.submit(_run_stages, str(data_dir), str(trace), repeat).result()
+
+    n_calls = _parquet_rows(data_dir / "tone_dispersion.parquet")
+    results = []
+    for name in STAGES:
+        runs = [r for r in _records(trace) if r["stage"] == name]
+        row: Dict[str, object] = {
+            "scale": scale,
+            "symbols": symbols,
+            "years": years,
+            "calls": n_calls,
+            "stage": name,
+            "runs": len(runs),
+            "max_rss_mb": worker["max_rss_mb"],
+        }
+        if runs:
+            best = min(runs, key=lambda r: r["wall_s"])
+            row.update(
+                wall_s=best["wall_s"],
+                cpu_s=best["cpu_s"],
+                peak_mb=max(r["peak_mb"] for r in runs),
+                inputs=best.get("inputs"),
+                output=best.get("output"),
+            )
+        if name in worker["errors"]:
+            row["error"] = worker["errors"][name]
+        results.append(row)
+    return results
+
+
+def _parquet_rows(path: Path) -> int:
+    import pyarrow.parquet as pq
+
+    return pq.ParquetFile(path).metadata.num_rows
+
+
+def _environment() -> Dict[str, object]:
+    import numpy
+    import pandas
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results: Sequence[Dict[str, object]], baseline: Path) -> None:
+    """Print wall-time and peak-memory ratios against an earlier report."""
+    before = {
+        (r["scale"], r["stage"]): r
+        for r in json.loads(Path(baseline).read_text())["results"]
+    }
+    print(f"\nvs {baseline} (ratio new / old)")
+    for r in results:
+        old = before.get((r["scale"], r["stage"]))
+        if old is None or "wall_s" not in old or "wall_s" not in r:
+            continue
+        wall = r["wall_s"] / old["wall_s"] if old["wall_s"] else float("nan")
+        peak = r["peak_mb"] / old["peak_mb"] if old["peak_mb"] else float("nan")
+        print(f"  {r['scale']:>3}x {r['stage']:<26} wall {wall:6.2f}  peak {peak:6.2f}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scales", type=int, nargs="+", default=list(SCALES))
+    parser.add_argument("--years", type=int, default=synthetic.BASE_YEARS)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", type=Path, default=WORK_DIR)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--compare", type=Path, help="earlier --json report")
+    args = parser.parse_args(argv)
+
+    results: List[Dict[str, object]] = []
+    for scale in args.scales:
+        rows = bench_scale(scale, args.work_dir, args.repeat, args.seed, args.years)
+        for r in rows:
+            if "wall_s" in r:
+                print(
+                    f"{scale:>3}x {r['stage']:<26} {r['wall_s']:9.3f} s"
+                    f" {r['peak_mb']:9.1f} MB peak  {r['max_rss_mb']:8.1f} MB rss"
+                )
+            else:
+                print(f"{scale:>3}x {r['stage']:<26} {r.get('error', 'not run')}")
+        results.extend(rows)
+
+    if args.json:
+        report = {"environment": _environment(), "results": results}
+        Path(args.json).write_text(json.dumps(report, indent=2, default=str))
+    if args.compare:
+        compare(results, args.compare)
+    return 0 if not any("error" in r for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Deterministic synthetic research data in the schemas ``src/load.py`` reads.
+
+Writes ``stock_prices.parquet`` (long: date, symbol, open, high, low, close,
+adjClose, volume), ``ff5_daily.parquet`` (FF5 + UMD + rf indexed by date) and
+``tone_dispersion.parquet`` (one row per call: symbol, company_id, year,
+quarter, date string, tone_dispersion, call_key).  The same arguments always
+produce the same files.  Prices are written in blocks of symbols so that
+memory stays bounded for large universes.
+
+    python -m benchmarks.synthetic OUT_DIR [--symbols 685] [--years 20]
+                                           [--calls-per-quarter 1.0] [--seed 0]
+"""
+import argparse
+import hashlib
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+FACTORS = ["mktrf", "smb", "hml", "rmw", "cma", "umd"]
+
+# daily factor vols roughly matching the 2005–2024 FF sample
+_FACTOR_VOL = np.array([0.012, 0.006, 0.007, 0.004, 0.004, 0.009])
+
+# current research data: ~685 symbols, 20 years of calls
+BASE_SYMBOLS = 685
+BASE_YEARS = 20
+
+_BLOCK = 500  # symbols per price row group
+
+
+def _symbols(n: int) -> np.ndarray:
+    return np.array([f"S{i:05d}" for i in range(n)])
+
+
+def _listing(rng: np.random.Generator, n: int, days: int):
+    """First and last trading-day position of each symbol (some IPOs / delistings)."""
+    first = np.where(rng.random(n) < 0.3, rng.integers(0, int(days * 0.6), n), 0)
+    last = np.where(
+        rng.random(n) < 0.2, rng.integers(int(days * 0.5), days, n), days - 1
+    )
+    last = np.maximum(last, np.minimum(first + 250, days - 1))
+    return first, last
+
+
+def generate(
+    out_dir: Path,
+    symbols: int = BASE_SYMBOLS,
+    years: int = BASE_YEARS,
+    calls_per_quarter: float = 1.0,
+    start: str = "2005-01-03",
+    seed: int = 0,
+) -> Dict[str, Path]:
+    """
+    Write the three research parquets into ``out_dir`` and return their paths.
+
+    Parameters:
+    -----------
+    out_dir : Path
+        Target directory (created)
+    symbols : int
+        Universe size
+    years : int
+        Years of daily history (252 business days each)
+    calls_per_quarter : float
+        Expected earnings calls per listed symbol and quarter (Poisson)
+    start : str
+        First business day
+    seed : int
+        Seed of every random draw
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    dates = pd.bdate_range(start, periods=252 * years, name="date")
+    days = len(dates)
+    names = _symbols(symbols)
+    rng = np.random.default_rng([seed, 0])
+
+    # ---------------- factors (a month of history before the prices) --------
+    ff_dates = pd.bdate_range(end=dates[-1], periods=days + 21, name="date")
+    ff = pd.DataFrame(
+        rng.normal(0.0002, _FACTOR_VOL, (len(ff_dates), len(FACTORS))).round(4),
+        index=ff_dates,
+        columns=FACTORS,
+    )
+    ff["rf"] = 0.0001
+    ff_path = out_dir / "ff5_daily.parquet"
+    ff.to_parquet(ff_path)
+    F = ff.loc[dates, FACTORS].to_numpy()
+
+    first, last = _listing(rng, symbols, days)
+
+    # ---------------- prices: one factor model, written per symbol block ----
+    px_path = out_dir / "stock_prices.parquet"
+    writer = None
+    try:
+        for lo in range(0, symbols, _BLOCK):
+            hi = min(lo + _BLOCK, symbols)
+            brng = np.random.default_rng([seed, 1, lo])
+            n = hi - lo
+            betas = np.column_stack(
+                [brng.normal(1.0, 0.3, n), brng.normal(0.0, 0.5, (n, len(FACTORS) - 1))]
+            )
+            ret = F @ betas.T + brng.normal(0, 0.015, (days, n))
+            adj = 50 * np.exp(np.cumsum(ret, axis=0))
+            listed = (np.arange(days)[:, None] >= first[lo:hi]) & (
+                np.arange(days)[:, None] <= last[lo:hi]
+            )
+            d_idx, s_idx = np.nonzero(listed)
+            adj = adj[d_idx, s_idx]
+            close = adj * (1 + brng.uniform(0, 0.3, n))[s_idx]  # pre-split-adjustment
+            spread = np.abs(brng.normal(0, 0.01, len(adj)))
+            table = pa.table(
+                {
+                    "date": pa.array(dates.values[d_idx]),
+                    "symbol": pa.array(names[lo:hi][s_idx]),
+                    "open": close * (1 + brng.normal(0, 0.005, len(adj))),
+                    "high": close * (1 + spread),
+                    "low": close * (1 - spread),
+                    "close": close,
+                    "adjClose": adj,
+                    "volume": brng.integers(10_000, 5_000_000, len(adj)),
+                }
+            )
+            if writer is None:
+                writer = pq.ParquetWriter(px_path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    # ---------------- calls: Poisson count per listed symbol-quarter -------
+    crng = np.random.default_rng([seed, 2])
+    quarters = pd.period_range(dates[0], dates[-1], freq="Q")
+    q_start = dates.searchsorted(quarters.start_time)
+    q_end = dates.searchsorted(quarters.end_time, side="right")
+    counts = crng.poisson(calls_per_quarter, (len(quarters), symbols))
+    q_idx, s_idx = np.nonzero(counts)
+    q_idx, s_idx = np.repeat(q_idx, counts[q_idx, s_idx]), np.repeat(
+        s_idx, counts[q_idx, s_idx]
+    )
+    day = q_start[q_idx] + (
+        crng.random(len(q_idx)) * (q_end[q_idx] - q_start[q_idx])
+    ).astype(np.int64)
+    day = np.minimum(day, days - 1)
+    keep = (day >= first[s_idx]) & (day <= last[s_idx])
+    day, s_idx, q_idx = day[keep], s_idx[keep], q_idx[keep]
+
+    # before the open or after the close
+    hour = np.where(crng.random(len(day)) < 0.5, "08:00:00", "16:30:00")
+    stamp = pd.DatetimeIndex(dates.values[day]).strftime("%Y-%m-%d").to_numpy()
+    date_str = np.char.add(np.char.add(stamp.astype(str), " "), hour)
+    tone = np.clip(crng.normal(0.155, 0.042, len(day)), 0.0, 1.0)
+    tone[crng.random(len(day)) < 0.004] = np.nan  # a few unscored calls
+
+    calls = pd.DataFrame(
+        {
+            "symbol": names[s_idx],
+            "company_id": 100_000 + s_idx,
+            "year": quarters.year.to_numpy()[q_idx],
+            "quarter": quarters.quarter.to_numpy()[q_idx],
+            "date": date_str,
+            "tone_dispersion": tone,
+        }
+    )
+    calls["call_key"] = [
+        hashlib.sha1(f"{s}|{d}|{i}".encode()).hexdigest()
+        for i, (s, d) in enumerate(zip(calls["symbol"], calls["date"]))
+    ]
+    calls = calls.sort_values(["symbol", "date"], kind="stable").reset_index(drop=True)
+    calls_path = out_dir / "tone_dispersion.parquet"
+    calls.to_parquet(calls_path, index=False)
+
+    return {"prices": px_path, "ff": ff_path, "calls": calls_path}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("out_dir", type=Path)
+    parser.add_argument("--symbols", type=int, default=BASE_SYMBOLS)
+    parser.add_argument("--years", type=int, default=BASE_YEARS)
+    parser.add_argument("--calls-per-quarter", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    paths = generate(
+        args.out_dir, args.symbols, args.years, args.calls_per_quarter, seed=args.seed
+    )
+    for name, path in paths.items():
+        print(f"{name:<7} {path} ({path.stat().st_size / 2**20:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
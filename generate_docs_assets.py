@@ -11,7 +11,7 @@ import numpy as np
 import pandas as pd
 import seaborn as sns
 
-from src import factor_build, neutralise, portfolio, report
+from src import pipeline
 from src.load import ff_factors
 
 # Configure matplotlib for high-quality output
@@ -30,24 +30,22 @@ output_dir.mkdir(parents=True, exist_ok=True)
 data_dir = Path("docs/assets/data")
 data_dir.mkdir(parents=True, exist_ok=True)
 
+# factor → resid → weights → pnl stages, reused from the stage cache
+PIPE = pipeline.backtest(smoothing=0.75)
+
 
 def generate_factor_performance_summary():
     """Generate a comprehensive factor performance summary chart."""
 
     # Run the pipeline to get results
     print("Building factor and portfolio...")
-    factor = factor_build.build_daily_factor()
+    factor = PIPE["factor"]
     if factor.empty:
         print("No factor data available")
         return
 
-    resid = neutralise.neutralise(factor)
-    weights = portfolio.build_weights(resid, smoothing=0.75)
-    pnl = portfolio.pnl(weights)
-    turnover = portfolio.calculate_turnover(weights)
-
-    # Calculate performance metrics
-    metrics = report.calculate_metrics(pnl)
+    out = PIPE.run("pnl", "turnover", "metrics")
+    pnl, turnover, metrics = out["pnl"], out["turnover"], out["metrics"]
 
     # Create summary visualization
     fig, axes = plt.subplots(2, 2, figsize=(12, 8))
@@ -10,7 +10,7 @@ import pandas as pd
 import seaborn as sns
 from pathlib import Path
 
-from src import factor_build, neutralise, portfolio, report
+from src import pipeline, report
 
 # Configure matplotlib for high-quality output
 plt.style.use('seaborn-v0_8-whitegrid')
@@ -26,19 +26,20 @@ output_dir.mkdir(parents=True, exist_ok=True)
 data_dir = Path("assets/data")
 data_dir.mkdir(parents=True, exist_ok=True)
 
+# the three analyses share one backtest: stages run once and are cached
+PIPE = pipeline.backtest(smoothing=0.75)
+
 def generate_recent_performance_analysis():
     """Generate performance analysis focusing on recent period where factor works."""
     
     print("Building factor and portfolio for recent performance analysis...")
-    factor = factor_build.build_daily_factor()
+    factor = PIPE["factor"]
     if factor.empty:
         print("No factor data available")
         return None
     
-    resid = neutralise.neutralise(factor)
-    weights = portfolio.build_weights(resid, smoothing=0.75)
-    pnl = portfolio.pnl(weights)
-    turnover = portfolio.calculate_turnover(weights)
+    out = PIPE.run("pnl", "turnover")
+    pnl, turnover = out["pnl"], out["turnover"]
     
     # Focus on recent period (2020+) where factor shows positive performance
     recent_pnl = pnl.loc['2020':]
@@ -117,10 +118,7 @@ def generate_recent_performance_analysis():
 def generate_regime_comparison():
     """Compare performance across different time regimes."""
     
-    factor = factor_build.build_daily_factor()
-    resid = neutralise.neutralise(factor)
-    weights = portfolio.build_weights(resid, smoothing=0.75)
-    pnl = portfolio.pnl(weights)
+    pnl = PIPE["pnl"]
     
     # Define regimes
     regimes = {
@@ -170,11 +168,8 @@ def generate_regime_comparison():
 def generate_updated_metrics():
     """Generate updated metrics focusing on recent performance."""
     
-    factor = factor_build.build_daily_factor()
-    resid = neutralise.neutralise(factor)
-    weights = portfolio.build_weights(resid, smoothing=0.75)
-    pnl = portfolio.pnl(weights)
-    turnover = portfolio.calculate_turnover(weights)
+    out = PIPE.run("pnl", "turnover")
+    pnl, turnover = out["pnl"], out["turnover"]
     
     # Recent performance metrics
     recent_pnl = pnl.loc['2020':]
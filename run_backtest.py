@@ -4,7 +4,7 @@ import time
 import matplotlib.pyplot as plt
 import pandas as pd
 
-from src import factor_build, neutralise, portfolio, report
+from src import pipeline, report
 from src.load import ff_factors
 
 # Create outputs directory if it doesn't exist
@@ -13,14 +13,37 @@ os.makedirs("outputs", exist_ok=True)
 # Set smoothing parameter - 0.75 provides good balance of turnover reduction and performance
 SMOOTHING = 0.75
 
+
+def plot_turnover(turnover: pd.Series, path: str = "outputs/turnover.png") -> None:
+    avg_turnover = turnover.mean()
+    plt.figure(figsize=(12, 6))
+    turnover.iloc[-100:].plot()  # Last 100 days for clarity
+    plt.axhline(
+        y=avg_turnover, color="r", linestyle="--", label=f"Average: {avg_turnover:.4f}"
+    )
+    plt.title(f"Daily Turnover with Smoothing={SMOOTHING}")
+    plt.ylabel("Turnover")
+    plt.xlabel("Date")
+    plt.grid(True, alpha=0.3)
+    plt.legend()
+    plt.savefig(path)
+    plt.close()
+
+
+# Stages are cached on disk keyed by their inputs, parameters and code, so
+# re-running after an unrelated change skips straight to the plots.
+pipe = pipeline.backtest(smoothing=SMOOTHING)
+pipe.add("tearsheet", report.make_tearsheet, deps=["resid"], persist=False, exclusive=True)
+pipe.add("turnover_plot", plot_turnover, deps=["turnover"], persist=False, exclusive=True)
+
 print("[1/5] Building raw factor…")
 start = time.time()
-factor_raw = factor_build.build_daily_factor()
+factor_raw = pipe["factor"]
 print(f"    Raw factor: {len(factor_raw)} rows in {time.time()-start:.1f}s")
 
 print("[2/5] Neutralising factor…")
 start = time.time()
-factor_neut = neutralise.neutralise(factor_raw)
+factor_neut = pipe["resid"]
 print(f"    Neutralised factor: {len(factor_neut)} rows in {time.time()-start:.1f}s")
 if isinstance(factor_neut, pd.Series):
     factor_neut.to_frame().to_parquet("outputs/factor_panel.parquet")
@@ -31,11 +54,11 @@ print("    Saved outputs/factor_panel.parquet")
 # 3) weights & pnl
 print(f"[3/5] Building weights with smoothing={SMOOTHING}…")
 start = time.time()
-w = portfolio.build_weights(factor_neut, smoothing=SMOOTHING)
+w = pipe["weights"]
 print(f"    Weights matrix: {w.shape} in {time.time()-start:.1f}s")
 
 # Calculate turnover statistics
-turnover = portfolio.calculate_turnover(w)
+turnover = pipe["turnover"]
 avg_turnover = turnover.mean()
 max_turnover = turnover.max()
 print(f"    Turnover: avg={avg_turnover:.4f}, max={max_turnover:.4f}")
@@ -47,14 +70,15 @@ else:  # single-date case → Series
 
 print("[4/5] Computing PnL…")
 start = time.time()
-pnl = portfolio.pnl(w)
+pnl = pipe["pnl"]
 ir = pnl.mean() / pnl.std() * 252**0.5
 print(f"    IR(5-day): {ir:.3f} in {time.time()-start:.1f}s")
 print(f"    Sharpe Ratio (IR/(1+turnover)): {ir/(1+avg_turnover):.4f}")
 
 print("[5/5] Generating enhanced visualizations…")
-# Standard tearsheet
-report.make_tearsheet(factor_neut)
+# Standard tearsheet, turnover plot and metrics are independent branches
+pipe.run("tearsheet", "turnover_plot", "metrics")
+print("✓ Turnover plot saved to outputs/turnover.png")
 
 # Enhanced tearsheet using our improved metrics
 try:
@@ -129,20 +153,6 @@ try:
 except Exception as e:
     print(f"Note: Basic tearsheet generated. Enhanced metrics error: {e}")
 
-# Create turnover plot
-plt.figure(figsize=(12, 6))
-turnover.iloc[-100:].plot()  # Last 100 days for clarity
-plt.axhline(
-    y=avg_turnover, color="r", linestyle="--", label=f"Average: {avg_turnover:.4f}"
-)
-plt.title(f"Daily Turnover with Smoothing={SMOOTHING}")
-plt.ylabel("Turnover")
-plt.xlabel("Date")
-plt.grid(True, alpha=0.3)
-plt.legend()
-plt.savefig("outputs/turnover.png")
-print("✓ Turnover plot saved to outputs/turnover.png")
-
 print("\n✓ Backtest complete")
 print(f"  IR(5-day): {ir:.3f}")
 print(f"  Avg Turnover: {avg_turnover:.4f}")
@@ -15,7 +15,6 @@ setup(
         "matplotlib>=3.7.0",
         # NLP and ML
         "nltk>=3.8.0",
-        "scikit-learn>=1.3.0",
         # API Integration
         "requests>=2.30.0",
         # File formats
@@ -1 +1,43 @@
-"""Earnings call tone analysis package."""
+"""Earnings call tone analysis package.
+
+Submodules are imported on first attribute access (``src.portfolio`` …) and
+none of them loads data or heavy optional libraries (matplotlib, statsmodels,
+scikit-learn) at import time.
+"""
+import importlib
+from types import ModuleType
+from typing import List
+
+_SUBMODULES = (
+    "analytics",
+    "betas",
+    "chunked",
+    "dispersion",
+    "events",
+    "factor_build",
+    "incremental",
+    "ingest",
+    "instrument",
+    "load",
+    "matrix_store",
+    "neutralise",
+    "pipeline",
+    "portfolio",
+    "report",
+    "score_cache",
+    "segments",
+    "sentiment",
+    "sweep",
+    "text_factors",
+    "trading_calendar",
+)
+
+
+def __getattr__(name: str) -> ModuleType:
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    return sorted(list(globals()) + list(_SUBMODULES))
@@ -0,0 +1,223 @@
+"""Factor analytics on the factor's own (date, symbol) events.
+
+Forward returns are looked up by integer position in the price matrix only
+where the factor has a value, so memory scales with the number of events
+rather than dates × symbols × periods.  The per-date statistics (rank IC,
+quantile returns, autocorrelation) are ``segments`` reductions over the
+date-sorted events.
+
+``factor_data`` builds the shared input: one row per event with a column of
+forward returns per period (``"5D"``, ``"10D"`` …), the ``factor`` value and
+its per-date ``factor_quantile`` (1 = lowest).  Its rows are sorted by date,
+which the other functions rely on.
+"""
+import warnings
+from typing import Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import segments
+from .events import EventPanel
+
+
+def period_label(period: int) -> str:
+    return f"{int(period)}D"
+
+
+def _date_offsets(data: pd.DataFrame) -> Tuple[pd.Index, np.ndarray]:
+    """Dates and CSR offsets of the date-sorted rows of ``data``."""
+    dates = data.index.get_level_values(0)
+    offsets = segments.offsets_of(dates.to_numpy())
+    return dates[offsets[:-1]], offsets
+
+
+def _corr(a: np.ndarray, b: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Per-segment Pearson correlation (NaN for fewer than two points or no spread)."""
+    da, db = segments.demean(a, offsets), segments.demean(b, offsets)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return segments.total(da * db, offsets) / np.sqrt(
+            segments.total(da * da, offsets) * segments.total(db * db, offsets)
+        )
+
+
+def _forward(ev: EventPanel, px: pd.DataFrame, periods: Sequence[int]) -> np.ndarray:
+    """Events × periods forward returns, gathered by integer position in ``px``."""
+    ti = px.index.get_indexer(ev.dates)[ev.date_codes]
+    si = px.columns.get_indexer(ev.symbols)[ev.codes]
+    ok = (ti >= 0) & (si >= 0)
+
+    P = px.to_numpy(dtype=float)
+    out = np.full((len(ev), len(periods)), np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for j, h in enumerate(periods):
+            m = ok & (ti + h < len(P))
+            out[m, j] = P[ti[m] + h, si[m]] / P[ti[m], si[m]] - 1
+    return out
+
+
+def forward_returns(
+    factor: pd.Series, px: pd.DataFrame, periods: Sequence[int] = (5, 10)
+) -> pd.DataFrame:
+    """
+    Forward returns ``px[t + h] / px[t] - 1`` (``h`` price rows) at the
+    factor's (date, symbol) positions.
+
+    Events on dates or symbols missing from ``px``, or too close to the end
+    of the price history, get NaN.  Rows come back sorted by date and symbol.
+    """
+    ev = EventPanel.from_series(factor)
+    return pd.DataFrame(
+        _forward(ev, px, periods),
+        index=ev.to_series().index,
+        columns=[period_label(h) for h in periods],
+    )
+
+
+def factor_data(
+    factor: pd.Series,
+    px: pd.DataFrame,
+    periods: Sequence[int] = (5, 10),
+    quantiles: int = 5,
+) -> pd.DataFrame:
+    """
+    Forward returns, factor value and factor quantile per event.
+
+    Events without every forward return are dropped before the quantiles are
+    assigned, so each date's buckets cover the events that are analysed.
+    """
+    ev = EventPanel.from_series(factor)
+    data = pd.DataFrame(
+        _forward(ev, px, periods),
+        index=ev.to_series().index,
+        columns=[period_label(h) for h in periods],
+    )
+    data["factor"] = ev.values
+    data = data.dropna()
+    _, offsets = _date_offsets(data)
+    return data.assign(
+        factor_quantile=segments.quantile_bucket(
+            data["factor"].to_numpy(), offsets, quantiles
+        )
+    )
+
+
+def _period_columns(data: pd.DataFrame) -> List[Hashable]:
+    return [c for c in data.columns if c not in ("factor", "factor_quantile")]
+
+
+def rank_ic(data: pd.DataFrame) -> pd.DataFrame:
+    """Daily Spearman rank correlation of the factor with each forward return."""
+    dates, offsets = _date_offsets(data)
+    fr = segments.rank(data["factor"].to_numpy(dtype=float), offsets)
+    cols = _period_columns(data)
+    ic = np.column_stack(
+        [
+            _corr(fr, segments.rank(data[c].to_numpy(dtype=float), offsets), offsets)
+            for c in cols
+        ]
+    )
+    return pd.DataFrame(ic, index=dates, columns=cols)
+
+
+def ic_summary(ic: pd.DataFrame) -> pd.DataFrame:
+    """Mean, volatility, risk-adjusted mean and t-statistic of the daily IC."""
+    n = ic.count()
+    mean, std = ic.mean(), ic.std()
+    return pd.DataFrame(
+        {
+            "ic_mean": mean,
+            "ic_std": std,
+            "risk_adjusted_ic": mean / std,
+            "t_stat": mean / std * np.sqrt(n),
+            "positive_share": (ic > 0).sum() / n,
+            "days": n,
+        }
+    ).T
+
+
+def _demeaned(data: pd.DataFrame, column: Hashable, offsets: np.ndarray) -> np.ndarray:
+    return segments.demean(data[column].to_numpy(dtype=float), offsets)
+
+
+def quantile_returns(data: pd.DataFrame, demeaned: bool = True) -> pd.DataFrame:
+    """
+    Mean forward return of each factor quantile over all events (quantile ×
+    period); with ``demeaned`` each date's mean return is subtracted first.
+    """
+    _, offsets = _date_offsets(data)
+    q = data["factor_quantile"].to_numpy()
+    counts = np.bincount(q)[1:]
+    out = {}
+    for c in _period_columns(data):
+        r = _demeaned(data, c, offsets) if demeaned else data[c].to_numpy(dtype=float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[c] = np.bincount(q, weights=r)[1:] / counts
+    return pd.DataFrame(
+        out, index=pd.RangeIndex(1, len(counts) + 1, name="factor_quantile")
+    )
+
+
+def quantile_returns_by_date(
+    data: pd.DataFrame, period: int, demeaned: bool = True
+) -> pd.DataFrame:
+    """Mean ``period`` forward return per date and quantile (dates × quantiles)."""
+    dates, offsets = _date_offsets(data)
+    col = period_label(period)
+    r = _demeaned(data, col, offsets) if demeaned else data[col].to_numpy(dtype=float)
+    q = data["factor_quantile"].to_numpy()
+    Q = int(q.max()) if len(q) else 0
+    key = segments.segment_ids(offsets) * Q + (q - 1)
+    size = len(dates) * Q
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.bincount(key, weights=r, minlength=size) / np.bincount(
+            key, minlength=size
+        )
+    return pd.DataFrame(
+        mean.reshape(len(dates), Q),
+        index=dates,
+        columns=pd.RangeIndex(1, Q + 1, name="factor_quantile"),
+    )
+
+
+def quantile_spread(
+    data: pd.DataFrame,
+    period: int,
+    top: Optional[int] = None,
+    bottom: int = 1,
+) -> pd.Series:
+    """Daily mean ``period`` return of the ``top`` quantile minus the ``bottom`` one."""
+    by_date = quantile_returns_by_date(data, period, demeaned=False)
+    high = by_date.columns[-1] if top is None else top
+    return (by_date[high] - by_date[bottom]).rename(f"q{high}-q{bottom}")
+
+
+def cumulative_quantile_returns(by_date: pd.DataFrame, period: int) -> pd.DataFrame:
+    """
+    Compound each quantile's ``period``-day mean returns from
+    ``quantile_returns_by_date``, as the equivalent daily rate
+    ``(1 + r) ** (1 / period) - 1`` (dates without events contribute 0).
+    """
+    daily = (1 + by_date) ** (1.0 / period)
+    return daily.fillna(1.0).cumprod() - 1
+
+
+def factor_autocorrelation(factor: pd.Series, lag: int = 1) -> pd.Series:
+    """
+    Rank autocorrelation of the factor: per date, the correlation of each
+    symbol's cross-sectional factor rank with its rank ``lag`` factor dates
+    earlier, over the symbols present on both dates.
+    """
+    ev = EventPanel.from_series(factor)
+    D, S = len(ev.dates), len(ev.symbols)
+    r = segments.rank(ev.values, ev.offsets)
+    seg = ev.date_codes
+    keys = seg.astype(np.int64) * S + ev.codes  # ascending: sorted by date, symbol
+
+    prev = (seg.astype(np.int64) - lag) * S + ev.codes
+    pos = np.minimum(np.searchsorted(keys, prev), max(len(keys) - 1, 0))
+    hit = (seg >= lag) & (keys[pos] == prev) if len(keys) else np.zeros(0, bool)
+
+    offsets = np.r_[0, np.cumsum(np.bincount(seg[hit], minlength=D))]
+    return pd.Series(_corr(r[hit], r[pos[hit]], offsets), index=ev.dates, name="autocorr")
@@ -0,0 +1,197 @@
+import warnings
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from . import instrument, load, matrix_store
+
+FACTORS = ["mktrf", "smb", "hml", "rmw", "cma", "umd"]
+
+# bump when the estimator changes so on-disk caches are rebuilt
+ENGINE_VERSION = 1
+
+
+def _window_sums(a: np.ndarray, window: int) -> np.ndarray:
+    """Trailing ``window``-row sums along axis 0 from one cumulative sum."""
+    c = np.cumsum(a, axis=0)
+    c[window:] -= c[:-window].copy()
+    return c
+
+
+def _covariance(
+    spp: np.ndarray, sf: np.ndarray, n: np.ndarray, iu: np.ndarray, ju: np.ndarray
+) -> np.ndarray:
+    """Centred cross-product matrices from Σff' (upper triangle), Σf and n."""
+    k = sf.shape[-1]
+    mean_f = sf / np.maximum(n, 1.0)[..., None]
+    sxx = np.empty(sf.shape[:-1] + (k, k))
+    for p, (i, j) in enumerate(zip(iu, ju)):
+        sxx[..., i, j] = spp[..., p] - sf[..., i] * mean_f[..., j]
+        sxx[..., j, i] = sxx[..., i, j]
+    return sxx
+
+
+def rolling_betas(
+    returns: pd.DataFrame,
+    factors: pd.DataFrame,
+    window: int = 252,
+    min_periods: Optional[int] = None,
+    chunk: int = 64,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Rolling OLS betas of every stock on the FF5 + UMD factor returns.
+
+    For each stock and date the regression ``r = a + b·f + e`` is fitted on
+    the trailing ``window`` rows where both the stock return and all factor
+    returns are present.  Rather than running one regression per stock and
+    date, the windowed cross-products Σf, Σff', Σr and Σfr are taken from
+    running cumulative sums for a block of ``chunk`` stocks at a time, so
+    memory is bounded by the chunk size.  Windows without gaps share the
+    factor covariance of their date, inverted once per date; the remaining
+    (date, stock) systems of a block are solved in one stacked
+    ``np.linalg.solve``.
+
+    Parameters:
+    -----------
+    returns : pd.DataFrame
+        Stock (excess) returns, dates × symbols
+    factors : pd.DataFrame
+        Factor returns with the ``FACTORS`` columns, indexed by date
+    window : int
+        Number of trailing observations in each regression
+    min_periods : int, optional
+        Minimum valid observations for a beta, defaults to ``window // 2``
+    chunk : int
+        Number of stocks processed per block
+
+    Returns:
+    --------
+    Dict[str, pd.DataFrame]
+        One dates × symbols beta matrix per factor (NaN where undetermined)
+    """
+    if min_periods is None:
+        min_periods = window // 2
+    min_periods = max(min_periods, len(FACTORS) + 2)
+
+    F = factors.reindex(returns.index)[FACTORS].to_numpy(dtype=float)
+    f_ok = ~np.isnan(F).any(axis=1)
+    F = np.where(f_ok[:, None], F, 0.0)
+    R = returns.to_numpy(dtype=float)
+
+    T, S = R.shape
+    k = len(FACTORS)
+    out = np.full((k, T, S), np.nan)
+    iu, ju = np.triu_indices(k)
+    P = F[:, iu] * F[:, ju]  # unique entries of f f'
+
+    # Windows in which a stock has every observation the factors have share
+    # one factor covariance matrix per date: invert those once.
+    n_full = _window_sums(f_ok.astype(float), window)
+    inv_full = np.linalg.pinv(
+        _covariance(
+            _window_sums(P, window), _window_sums(F, window), n_full, iu, ju
+        ),
+        hermitian=True,
+    )
+
+    for lo in range(0, S, chunk):
+        r = R[:, lo : lo + chunk]
+        m = (~np.isnan(r) & f_ok[:, None]).astype(float)
+        r0 = np.where(m > 0, r, 0.0)
+        fm = m[:, :, None] * F[:, None, :]  # T × s × k
+
+        n = _window_sums(m, window)
+        sf = _window_sums(fm, window)
+        sr = _window_sums(r0, window)
+        sfr = _window_sums(fm * r0[:, :, None], window)
+
+        valid = n >= min_periods
+        safe_n = np.where(valid, n, 1.0)
+        sxy = sfr - sf * (sr / safe_n)[..., None]
+        beta = np.einsum("tij,tsj->tsi", inv_full, sxy)
+
+        # stocks with gaps inside the window need their own system
+        partial = valid & (n < n_full[:, None])
+        if partial.any():
+            spp = _window_sums(m[:, :, None] * P[:, None, :], window)[partial]
+            sxx = _covariance(spp, sf[partial], n[partial], iu, ju)
+            try:
+                beta[partial] = np.linalg.solve(sxx, sxy[partial][..., None])[..., 0]
+            except np.linalg.LinAlgError:
+                # a degenerate window somewhere in the block: fall back to
+                # the pseudo-inverse, which leaves collinear directions at 0
+                beta[partial] = np.matmul(
+                    np.linalg.pinv(sxx, hermitian=True), sxy[partial][..., None]
+                )[..., 0]
+        beta[~valid] = np.nan
+        out[:, :, lo : lo + chunk] = np.moveaxis(beta, -1, 0)
+
+    return {
+        f: pd.DataFrame(out[i], index=returns.index, columns=returns.columns)
+        for i, f in enumerate(FACTORS)
+    }
+
+
+@instrument.instrumented()
+def stock_betas(
+    window: int = 252, min_periods: Optional[int] = None, refresh: bool = False
+) -> Dict[str, pd.DataFrame]:
+    """
+    Rolling betas of every stock in ``load.prices()`` to the FF5 + UMD factors.
+
+    Excess returns (``pct_change`` minus ``rf``) are regressed with
+    ``rolling_betas``.  The result is cached under ``load.CACHE_DIR`` as one
+    memory-mapped ``matrix_store`` per factor and reused until either input
+    parquet changes or ``refresh=True``.
+    """
+    source = {
+        "prices": list(load._fingerprint(load.DATA / "stock_prices.parquet")),
+        "ff": list(load._fingerprint(load.DATA / "ff5_daily.parquet")),
+        "window": window,
+        "min_periods": min_periods,
+        "version": ENGINE_VERSION,
+    }
+    stores = {
+        f: load.CACHE_DIR / f"betas.w{window}.{f}.matrix" for f in FACTORS
+    }
+    if not refresh and all(
+        (matrix_store.read_meta(p) or {}).get("source") == source
+        for p in stores.values()
+    ):
+        return {f: matrix_store.open_matrix(p) for f, p in stores.items()}
+
+    px = load.prices()
+    ff = load.ff_factors(start=px.index.min(), end=px.index.max())
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        rets = px.pct_change(fill_method=None)
+    rets = rets.sub(ff["rf"].reindex(rets.index), axis=0)
+
+    betas = rolling_betas(rets, ff, window=window, min_periods=min_periods)
+    load.CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    for f, p in stores.items():
+        matrix_store.write_matrix(betas[f], p, source=source)
+    return betas
+
+
+def betas_at(index: pd.MultiIndex, betas: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Look up each (date, symbol) row's betas as of the previous price date.
+
+    Betas estimated through ``t - 1`` are used for a signal dated ``t`` so no
+    return of the trade date itself leaks into the exposure.  Rows without a
+    beta come back as NaN.
+    """
+    first = betas[FACTORS[0]]
+    dates = pd.DatetimeIndex(index.get_level_values(0))
+    symbols = index.get_level_values(1)
+
+    di = first.index.searchsorted(dates, side="left") - 1
+    si = first.columns.get_indexer(symbols)
+    ok = (di >= 0) & (si >= 0)
+
+    out = np.full((len(index), len(FACTORS)), np.nan)
+    for j, f in enumerate(FACTORS):
+        out[ok, j] = betas[f].to_numpy()[di[ok], si[ok]]
+    return pd.DataFrame(out, index=index, columns=FACTORS)
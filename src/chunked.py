@@ -0,0 +1,155 @@
+"""Out-of-core backtest in date blocks under a memory budget.
+
+The factor and its residual are sparse (one row per call) and stay in
+memory.  Everything dense — centred ranks, smoothed weights, prices and
+forward returns — is produced one block of weight dates at a time:
+
+* the smoothing recurrence of each block starts from the last weight row of
+  the previous block, so the weights equal one pass over the whole history;
+* each block reads only the price rows from its first date to ``horizon``
+  rows past its last date (the look-ahead of the forward returns), with the
+  parquet filters pushed down and without touching the loader memo;
+* PnL and turnover are per-date reductions written into full-length
+  vectors, and the weights optionally stream into a ``matrix_store``.
+
+The block length is chosen so the dense arrays of one block fit in
+``memory_mb``.  The results are those of ``portfolio.build_weights`` →
+``portfolio.pnl`` / ``portfolio.calculate_turnover`` on the same residual.
+"""
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from . import instrument, load, matrix_store
+from .factor_build import build_daily_factor
+from .neutralise import neutralise
+from .portfolio import centred_ranks, shape_ranks, smooth_weights
+
+# dense float64 arrays alive per block row and symbol (ranks, targets,
+# weights, two price rows, forward returns, products and pandas copies)
+_ARRAYS_PER_CELL = 10
+
+
+def block_rows(n_symbols: int, memory_mb: float, horizon: int = 0) -> int:
+    """Weight dates per block so that one block's dense arrays fit ``memory_mb``."""
+    per_row = max(n_symbols, 1) * 8 * _ARRAYS_PER_CELL
+    return max(int(memory_mb * 2**20 // per_row) - horizon, 1)
+
+
+@instrument.instrumented("chunked_backtest")
+def run_chunked(
+    resid: Optional[pd.Series] = None,
+    gross: float = 1.0,
+    smoothing: float = 0.75,
+    exponent: float = 0.75,
+    horizon: int = 5,
+    memory_mb: float = 512.0,
+    weights_path: Optional[Union[str, Path]] = None,
+) -> Dict[str, pd.Series]:
+    """
+    Weights, PnL and turnover of ``resid`` computed block by block.
+
+    Parameters:
+    -----------
+    resid : pd.Series, optional
+        Neutralised signal with MultiIndex (date, symbol); defaults to
+        ``neutralise(build_daily_factor())``
+    gross, smoothing, exponent : float
+        As in ``portfolio.build_weights``
+    horizon : int
+        Forward-return horizon, as in ``portfolio.pnl``
+    memory_mb : float
+        Budget for the dense arrays of one block
+    weights_path : Path, optional
+        Stream the weights into a ``matrix_store`` at this path
+
+    Returns:
+    --------
+    Dict[str, pd.Series]
+        ``pnl`` (indexed by price date) and ``turnover`` (by weight date)
+    """
+    if not (0 <= smoothing <= 1):
+        raise ValueError("Smoothing parameter must be between 0 and 1")
+    if resid is None:
+        resid = neutralise(build_daily_factor())
+
+    # sort once by date; the signal itself is O(calls) and stays in memory
+    resid = resid.sort_index(level=0, kind="stable", sort_remaining=False)
+    sig_dates = resid.index.get_level_values(0)
+    dates = pd.DatetimeIndex(sig_dates.unique(), name=resid.index.names[0])
+    symbols = pd.Index(
+        np.unique(resid.index.get_level_values(1)), name=resid.index.names[1]
+    )
+    starts = sig_dates.searchsorted(dates, side="left")
+    ends = sig_dates.searchsorted(dates, side="right")
+
+    # price calendar of the traded symbols, and each weight date's row in it
+    px_dates, priced = load.price_labels(symbols)
+    common = symbols.intersection(priced)
+    if common.empty:
+        raise ValueError("weights vs price columns have no overlap")
+    col = symbols.get_indexer(common)
+    px_pos = px_dates.get_indexer(dates)
+
+    pnl = np.zeros(len(px_dates))
+    turnover = np.zeros(len(dates))
+    out = None
+    if weights_path is not None:
+        out = matrix_store.allocate_matrix(dates, symbols, weights_path)
+
+    rows = block_rows(len(symbols), memory_mb, horizon)
+    prev: Optional[np.ndarray] = None
+    for lo in range(0, len(dates), rows):
+        hi = min(lo + rows, len(dates))
+
+        # ---------------- weights, carrying the previous block's last row --
+        block = resid.iloc[starts[lo] : ends[hi - 1]]
+        centred = centred_ranks(block).reindex(index=dates[lo:hi], columns=symbols)
+        W = shape_ranks(centred.to_numpy(), gross, exponent)
+        del centred
+        if smoothing != 0:
+            W = smooth_weights(W, gross, smoothing, prev=prev)
+
+        first_row = W[:1] if prev is None else prev[None]
+        dW = np.abs(np.diff(W, axis=0, prepend=first_row))
+        turnover[lo:hi] = np.nansum(dW, axis=1) / 2  # skips NaN like DataFrame.sum
+        del dW
+        if out is not None:
+            out[lo:hi] = W
+
+        # ---------------- PnL: weights of date k - 1 earn from date k ------
+        # (portfolio.pnl shifts by one weight row and reindexes on the price
+        # calendar, so only price dates that are weight dates hold positions)
+        before = np.zeros((1, len(symbols))) if prev is None else prev[None]
+        held = np.vstack([before, W[:-1]])
+        pos = px_pos[lo:hi]
+        live = (pos >= 0) & (pos + horizon < len(px_dates))
+        if lo == 0:
+            live[0] = False  # no weights before the first date
+        if live.any():
+            first, last = pos[live].min(), pos[live].max() + horizon
+            px = load.prices(
+                start=px_dates[first], end=px_dates[last], symbols=symbols, memo=False
+            )
+            P = px.reindex(index=px_dates[first : last + 1], columns=common).to_numpy(
+                dtype=float
+            )
+            del px
+            r = pos[live] - first
+            with np.errstate(invalid="ignore", divide="ignore"):
+                fwd = P[r + horizon] / P[r] - 1
+            contrib = np.nan_to_num(held[live][:, col]) * fwd
+            pnl[pos[live]] = np.where(np.isnan(contrib), 0.0, contrib).sum(axis=1)
+            del P, fwd, contrib
+        prev = W[-1].copy()
+        del W, held
+
+    if out is not None:
+        out.flush()
+        del out
+    return {
+        "pnl": pd.Series(pnl, index=px_dates),
+        "turnover": pd.Series(turnover, index=dates),
+    }
@@ -0,0 +1,325 @@
+"""Streaming call-level tone dispersion from turn-level sentiment scores.
+
+Input is any number of parquet or JSON-lines files of scored speaker turns,
+one record per turn with the ``TURN_COLUMNS`` fields (extra columns such as
+``company_id``, ``year`` or ``quarter`` are carried through per call).  The
+output is the call-level table ``load.tone_calls()`` reads: one row per
+``call_key`` with ``symbol``, ``date`` (call timestamp), ``tone_dispersion``
+(population variance of the turn scores, NaN below ``MIN_TURNS`` scored
+turns), ``tone_mean`` and ``n_turns``.
+
+Files are split into chunks of about ``chunk_rows`` turns (parquet row
+groups, JSON-lines read in slices) that are reduced in a process pool to
+per-call moments ``(n, mean, M2)``: a single sort by ``call_key`` plus
+``segments`` reductions, two passes over the chunk.  Partial moments of the
+same call — a transcript split across chunks or files — are combined with the
+pairwise update of Chan et al.,
+
+    n = n_a + n_b,  mean = mean_a + d * n_b / n,  M2 = M2_a + M2_b + d² n_a n_b / n
+
+(``d = mean_b - mean_a``), which never subtracts large sums of squares.  Only
+these per-call moments are held, so memory grows with the number of calls,
+not with the number of turns, and at most ``2 * n_jobs`` chunks are in
+flight.
+
+    python -m src.dispersion TURNS [TURNS ...] [--out PATH] [--jobs N]
+"""
+import argparse
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from . import instrument, load, segments
+
+TURN_COLUMNS = ["symbol", "call_key", "date", "turn", "role", "score"]
+# call attributes passed through from the turn records when present
+CALL_COLUMNS = ["symbol", "date", "company_id", "year", "quarter"]
+MIN_TURNS = 2
+
+_SUFFIXES = {".parquet": "parquet", ".jsonl": "jsonl", ".json": "jsonl"}
+
+Chunk = Tuple[str, str, Optional[List[int]]]
+
+
+def turn_files(
+    sources: Union[str, Path, Iterable[Union[str, Path]]],
+    exclude: Iterable[Union[str, Path]] = (),
+) -> List[Path]:
+    """
+    Turn-score files under ``sources`` (files, or directories searched
+    recursively), leaving out files at or below any ``exclude`` path — the
+    outputs of a run whose output location lies inside its sources.
+    """
+    if isinstance(sources, (str, Path)):
+        sources = [sources]
+    skip = [Path(p).resolve() for p in exclude]
+
+    def kept(path: Path) -> bool:
+        path = path.resolve()
+        return not any(path == s or s in path.parents for s in skip)
+
+    files: List[Path] = []
+    for src in map(Path, sources):
+        if src.is_dir():
+            files.extend(
+                sorted(
+                    p
+                    for p in src.rglob("*")
+                    if p.suffix.lower() in _SUFFIXES and kept(p)
+                )
+            )
+        elif src.suffix.lower() in _SUFFIXES:
+            if kept(src):
+                files.append(src)
+        else:
+            raise ValueError(f"unsupported turn file {src} (use .parquet or .jsonl)")
+    return files
+
+
+def _chunks(files: Sequence[Path], chunk_rows: int) -> Iterator[Chunk]:
+    """Work units: runs of parquet row groups (~``chunk_rows``), whole JSON-lines files."""
+    import pyarrow.parquet as pq
+
+    for path in files:
+        kind = _SUFFIXES[path.suffix.lower()]
+        if kind == "jsonl":
+            yield str(path), kind, None
+            continue
+        meta = pq.ParquetFile(path).metadata
+        groups: List[int] = []
+        rows = 0
+        for i in range(meta.num_row_groups):
+            groups.append(i)
+            rows += meta.row_group(i).num_rows
+            if rows >= chunk_rows:
+                yield str(path), kind, groups
+                groups, rows = [], 0
+        if groups:
+            yield str(path), kind, groups
+
+
+def _read_chunk(
+    path: str,
+    kind: str,
+    groups: Optional[List[int]],
+    chunk_rows: int,
+    columns: Sequence[str] = (*TURN_COLUMNS, *CALL_COLUMNS),
+) -> Iterator[pd.DataFrame]:
+    """Yield the turn records of one work unit as DataFrames."""
+    if kind == "parquet":
+        import pyarrow.parquet as pq
+
+        pf = pq.ParquetFile(path)
+        names = pf.schema_arrow.names
+        wanted = [c for c in dict.fromkeys(columns) if c in names]
+        yield pf.read_row_groups(groups, columns=wanted).to_pandas()
+    else:
+        # values as written, like parquet (no automatic "date" parsing)
+        with pd.read_json(
+            path, lines=True, chunksize=chunk_rows, dtype=False, convert_dates=False
+        ) as reader:
+            yield from reader
+
+
+def call_moments(turns: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-call moments of one batch of turn records.
+
+    Returns one row per ``call_key`` with ``n`` (scored turns), ``mean`` and
+    ``m2`` (sum of squared deviations from the mean) of the non-NaN scores,
+    plus the first value of each present ``CALL_COLUMNS`` field.
+    """
+    missing = {"call_key", "score"} - set(turns.columns)
+    if missing:
+        raise KeyError(f"turn records lack columns {sorted(missing)}")
+
+    order, offsets = segments.sort_by(turns["call_key"].to_numpy())
+    scores = turns["score"].to_numpy(dtype=float)[order]
+    n = segments.count(scores, offsets)
+    mean = segments.mean(scores, offsets)
+    m2 = segments.total(segments.demean(scores, offsets) ** 2, offsets)
+
+    firsts = order[offsets[:-1]]
+    out = turns.iloc[firsts][[c for c in CALL_COLUMNS if c in turns.columns]]
+    out = out.reset_index(drop=True)
+    out.insert(0, "call_key", turns["call_key"].to_numpy()[firsts])
+    return out.assign(n=n.astype(np.int64), mean=np.where(n > 0, mean, 0.0), m2=m2)
+
+
+def merge_moments(parts: Sequence[pd.DataFrame]) -> pd.DataFrame:
+    """Combine partial ``call_moments`` of the same calls (pairwise update, vectorised)."""
+    parts = [p for p in parts if len(p)]
+    if len(parts) <= 1:
+        return parts[0] if parts else pd.DataFrame()
+    frame = pd.concat(parts, ignore_index=True)
+    order, offsets = segments.sort_by(frame["call_key"].to_numpy())
+    frame = frame.iloc[order].reset_index(drop=True)
+
+    n_i = frame["n"].to_numpy(dtype=float)
+    mean_i = frame["mean"].to_numpy()
+    n = segments.total(n_i, offsets)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(n > 0, segments.total(n_i * mean_i, offsets) / n, 0.0)
+    # M2 = Σ M2_i + Σ n_i (mean_i - mean)²: the k-way form of the pairwise update
+    d = mean_i - segments.broadcast(mean, offsets)
+    m2 = segments.total(frame["m2"].to_numpy(), offsets) + segments.total(
+        n_i * d * d, offsets
+    )
+
+    out = frame.iloc[offsets[:-1]].reset_index(drop=True)
+    return out.assign(n=n.astype(np.int64), mean=mean, m2=m2)
+
+
+Reducer = Callable[[pd.DataFrame], pd.DataFrame]
+Merger = Callable[[Sequence[pd.DataFrame]], pd.DataFrame]
+
+
+def _reduce_chunk(
+    per_batch: Reducer,
+    merge: Merger,
+    path: str,
+    kind: str,
+    groups: Optional[List[int]],
+    chunk_rows: int,
+) -> pd.DataFrame:
+    """Per-call partials of one work unit (runs in a worker process)."""
+    batches = _read_chunk(path, kind, groups, chunk_rows)
+    return merge([per_batch(batch) for batch in batches])
+
+
+def stream_calls(
+    sources: Union[str, Path, Iterable[Union[str, Path]]],
+    per_batch: Optional[Reducer] = None,
+    merge: Optional[Merger] = None,
+    chunk_rows: int = 500_000,
+    n_jobs: Optional[int] = None,
+    exclude: Iterable[Union[str, Path]] = (),
+) -> pd.DataFrame:
+    """
+    One streaming pass over the turn files under ``sources`` (except those
+    under ``exclude``, see ``turn_files``).
+
+    ``per_batch`` reduces a batch of turn records to one row of mergeable
+    per-call partials per ``call_key`` and ``merge`` combines partials of the
+    same calls; both must be module-level functions so worker processes can
+    receive them.  Partials are merged in chunk (file and row) order.
+    Defaults to ``call_moments`` / ``merge_moments``.
+    """
+    per_batch = per_batch or call_moments
+    merge = merge or merge_moments
+    chunks = list(_chunks(turn_files(sources, exclude), chunk_rows))
+    n_jobs = max(min(n_jobs or os.cpu_count() or 1, len(chunks)), 1)
+
+    merged = pd.DataFrame()
+    pending: List[pd.DataFrame] = []
+
+    def collect(part: pd.DataFrame) -> None:
+        # fold partials in once they outnumber the calls already merged, so
+        # merging stays linear in the number of chunks
+        nonlocal merged, pending
+        pending.append(part)
+        if sum(len(p) for p in pending) >= max(len(merged), chunk_rows // 10):
+            merged, pending = merge([merged, *pending]), []
+
+    if n_jobs <= 1:
+        for chunk in chunks:
+            collect(_reduce_chunk(per_batch, merge, *chunk, chunk_rows))
+    else:
+        with ProcessPoolExecutor(n_jobs) as pool:
+            # partials are folded in chunk order, so the merged calls always
+            # cover a leading run of each call's turns
+            running: Deque["Future[pd.DataFrame]"] = deque()
+            for chunk in chunks:
+                running.append(
+                    pool.submit(_reduce_chunk, per_batch, merge, *chunk, chunk_rows)
+                )
+                if len(running) >= 2 * n_jobs:
+                    collect(running.popleft().result())
+            for fut in running:
+                collect(fut.result())
+    merged = merge([merged, *pending])
+    if merged.empty:
+        raise ValueError("no turn records found")
+    return merged
+
+
+def dispersion_table(moments: pd.DataFrame, min_turns: int = MIN_TURNS) -> pd.DataFrame:
+    """Call-level table in the ``tone_dispersion.parquet`` layout from merged moments."""
+    n = moments["n"].to_numpy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        variance = moments["m2"].to_numpy() / n
+    variance = np.where(n >= max(min_turns, 1), variance, np.nan)
+    calls = moments.drop(columns=["n", "mean", "m2"]).assign(
+        tone_dispersion=variance,
+        tone_mean=np.where(n > 0, moments["mean"].to_numpy(), np.nan),
+        n_turns=n,
+    )
+    if "date" in calls.columns:
+        calls = calls.sort_values(["date", "call_key"], kind="stable")
+    return calls.reset_index(drop=True)
+
+
+@instrument.instrumented("tone_dispersion")
+def compute_dispersion(
+    sources: Union[str, Path, Iterable[Union[str, Path]]],
+    out: Optional[Union[str, Path]] = None,
+    chunk_rows: int = 500_000,
+    n_jobs: Optional[int] = None,
+    min_turns: int = MIN_TURNS,
+) -> pd.DataFrame:
+    """
+    Stream turn scores into the call-level tone-dispersion table.
+
+    Parameters:
+    -----------
+    sources : path or iterable of paths
+        Turn-score parquet / JSON-lines files or directories holding them
+    out : Path, optional
+        Write the table here (e.g. ``load.DATA / "tone_dispersion.parquet"``);
+        never read as input, even when it lies under ``sources``
+    chunk_rows : int
+        Approximate turns per work unit
+    n_jobs : int, optional
+        Worker processes (default: all CPUs); 1 runs in the calling process
+    min_turns : int
+        Scored turns a call needs for a defined dispersion
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per call, sorted by call timestamp
+    """
+    exclude = [out] if out is not None else []
+    merged = stream_calls(
+        sources, call_moments, merge_moments, chunk_rows, n_jobs, exclude
+    )
+    calls = dispersion_table(merged, min_turns)
+    if out is not None:
+        write_calls(calls, out)
+    return calls
+
+
+def write_calls(calls: pd.DataFrame, path: Union[str, Path]) -> Path:
+    """Write a call table atomically (temporary sibling, then rename)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    calls.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("turns", nargs="+", help="turn-score files or directories")
+    parser.add_argument("--out", default=str(load.DATA / "tone_dispersion.parquet"))
+    parser.add_argument("--chunk-rows", type=int, default=500_000)
+    parser.add_argument("--jobs", type=int, default=None)
+    args = parser.parse_args()
+    table = compute_dispersion(args.turns, args.out, args.chunk_rows, args.jobs)
+    print(f"{len(table)} calls → {args.out}")
@@ -0,0 +1,210 @@
+import warnings
+from typing import Hashable, List, Optional, Sequence, cast
+
+import numpy as np
+import pandas as pd
+
+from . import segments
+
+
+class EventPanel:
+    """
+    Sparse (date, symbol) → value panel in CSR layout.
+
+    Events are grouped by date: the values of date ``dates[i]`` are
+    ``values[offsets[i]:offsets[i + 1]]`` for the symbols
+    ``symbols[codes[offsets[i]:offsets[i + 1]]]``, sorted by symbol code.
+    Memory scales with the number of events instead of dates × symbols, and
+    ranking, weighting, turnover and PnL run on the arrays directly.
+    """
+
+    __slots__ = ("dates", "symbols", "offsets", "codes", "values", "name")
+
+    def __init__(
+        self,
+        dates: pd.DatetimeIndex,
+        symbols: pd.Index,
+        offsets: np.ndarray,
+        codes: np.ndarray,
+        values: np.ndarray,
+        name: Optional[Hashable] = None,
+    ) -> None:
+        self.dates = pd.DatetimeIndex(dates)
+        self.symbols = pd.Index(symbols)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.codes = np.asarray(codes, dtype=np.int32)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.name = name
+        if len(self.offsets) != len(self.dates) + 1 or self.offsets[-1] != len(self.values):
+            raise ValueError("offsets do not match dates and values")
+
+    # -------------------------------------------------------------- #
+    # construction / conversion
+    # -------------------------------------------------------------- #
+    @classmethod
+    def _from_codes(
+        cls,
+        dates: pd.DatetimeIndex,
+        symbols: pd.Index,
+        date_codes: np.ndarray,
+        codes: np.ndarray,
+        values: np.ndarray,
+        name: Optional[Hashable] = None,
+    ) -> "EventPanel":
+        order = np.lexsort((codes, date_codes))
+        counts = np.bincount(date_codes, minlength=len(dates))
+        offsets = np.r_[0, np.cumsum(counts)]
+        return cls(dates, symbols, offsets, codes[order], values[order], name)
+
+    @classmethod
+    def from_series(cls, s: pd.Series) -> "EventPanel":
+        """Build from a Series indexed by (date, symbol); NaN values are dropped."""
+        s = s.dropna()
+        d_codes, dates = pd.factorize(s.index.get_level_values(0), sort=True)
+        s_codes, symbols = pd.factorize(s.index.get_level_values(1), sort=True)
+        dates = pd.DatetimeIndex(dates, name=s.index.names[0])
+        symbols = symbols.rename(s.index.names[1])
+        return cls._from_codes(dates, symbols, d_codes, s_codes, s.to_numpy(float), s.name)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "EventPanel":
+        """Build from a dense dates × symbols frame, keeping non-zero cells."""
+        arr = df.to_numpy(dtype=float)
+        d_codes, s_codes = np.nonzero(~np.isnan(arr) & (arr != 0))
+        return cls._from_codes(
+            pd.DatetimeIndex(df.index), df.columns, d_codes, s_codes, arr[d_codes, s_codes]
+        )
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __repr__(self) -> str:
+        return (
+            f"EventPanel({len(self)} events, {len(self.dates)} dates, "
+            f"{len(self.symbols)} symbols)"
+        )
+
+    @property
+    def date_codes(self) -> np.ndarray:
+        """Row (date position) of every event."""
+        return np.repeat(np.arange(len(self.dates)), np.diff(self.offsets))
+
+    @property
+    def nbytes(self) -> int:
+        return self.offsets.nbytes + self.codes.nbytes + self.values.nbytes
+
+    def to_series(self) -> pd.Series:
+        """
+        Long Series indexed by (date, symbol).  The index is assembled from
+        the panel's level/code arrays and the values are not copied.
+        """
+        # the code arrays are used as given (the stubs only admit int lists)
+        codes = cast(List[Sequence[int]], [self.date_codes, self.codes])
+        index = pd.MultiIndex(
+            levels=[self.dates, self.symbols],
+            codes=codes,
+            names=[self.dates.name or "date", self.symbols.name or "symbol"],
+            verify_integrity=False,
+        )
+        return pd.Series(self.values, index=index, name=self.name, copy=False)
+
+    def to_frame(self, fill_value: float = 0.0) -> pd.DataFrame:
+        """Dense dates × symbols frame (what ``unstack`` would give)."""
+        out = np.full((len(self.dates), len(self.symbols)), fill_value)
+        out[self.date_codes, self.codes] = self.values
+        return pd.DataFrame(out, index=self.dates, columns=self.symbols)
+
+    # -------------------------------------------------------------- #
+    # transforms
+    # -------------------------------------------------------------- #
+    def ffill(self, hold: int, calendar: Optional[pd.DatetimeIndex] = None) -> "EventPanel":
+        """
+        As-of forward fill: each event stays active for ``hold`` dates of
+        ``calendar`` (default: the panel's own dates), starting on the first
+        calendar date on or after the event, until a newer event for the
+        same symbol replaces it.
+        """
+        if hold < 1:
+            raise ValueError("hold must be at least 1")
+        calendar = self.dates if calendar is None else pd.DatetimeIndex(calendar)
+        pos = calendar.searchsorted(self.dates, side="left")[self.date_codes]
+        keep = pos < len(calendar)
+        pos, codes, values = pos[keep], self.codes[keep], self.values[keep]
+
+        # next event position of the same symbol caps each holding period
+        order = np.lexsort((pos, codes))
+        nxt = np.full(len(pos), np.iinfo(np.int64).max)
+        same = codes[order][1:] == codes[order][:-1]
+        nxt[order[:-1][same]] = pos[order][1:][same]
+        end = np.minimum(np.minimum(pos + hold, nxt), len(calendar))
+        lengths = np.maximum(end - pos, 0)
+
+        src = np.repeat(np.arange(len(pos)), lengths)
+        step = np.arange(len(src)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return EventPanel._from_codes(
+            calendar, self.symbols, pos[src] + step, codes[src], values[src], self.name
+        )
+
+    def rank_weights(self, gross: float = 1.0, exponent: float = 0.75) -> "EventPanel":
+        """
+        Long–short target weights per date, as ``portfolio.build_weights``
+        computes them before smoothing: centred average-tie ranks raised to
+        ``exponent`` and scaled to ``gross``.
+        """
+        offsets = self.offsets
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r = segments.rank(self.values, offsets)
+            n = segments.broadcast(np.diff(offsets).astype(float), offsets)
+            centred = (2 * r - n - 1) / n
+            centred = np.sign(centred) * np.abs(centred) ** exponent
+            total = segments.total(np.abs(centred), offsets)
+            w = centred / segments.broadcast(total, offsets) * gross
+        return EventPanel(self.dates, self.symbols, self.offsets, self.codes, w, "weight")
+
+    # -------------------------------------------------------------- #
+    # portfolio analytics
+    # -------------------------------------------------------------- #
+    def turnover(self) -> pd.Series:
+        """
+        Half the sum of absolute weight changes between consecutive panel
+        dates (same definition as ``portfolio.calculate_turnover``).
+        """
+        D, S = len(self.dates), len(self.symbols)
+        seg = self.date_codes
+        ok = ~np.isnan(self.values)
+        # today's weights minus the same symbols' weights on the previous date
+        keys = np.r_[seg[ok] * S + self.codes[ok], (seg[ok] + 1) * S + self.codes[ok]]
+        vals = np.r_[self.values[ok], -self.values[ok]]
+        uniq, inv = np.unique(keys, return_inverse=True)
+        diff = np.bincount(inv, weights=vals, minlength=len(uniq))
+        rows = uniq // S
+        inside = rows < D
+        out = np.bincount(rows[inside], weights=np.abs(diff[inside]), minlength=D) / 2
+        out[:1] = 0.0  # no previous date to trade from
+        return pd.Series(out, index=self.dates)
+
+    def pnl(self, px: pd.DataFrame, horizon: int = 5) -> pd.Series:
+        """
+        Daily PnL of holding each date's weights over the next ``horizon``
+        price dates, with the same timing as ``portfolio.pnl``: the weights of
+        panel date ``i - 1`` earn the forward return from panel date ``i``.
+        Forward returns are looked up only at the events' positions in ``px``.
+        """
+        si_all = px.columns.get_indexer(self.symbols)
+        if (si_all < 0).all():
+            raise ValueError("weights vs price columns have no overlap")
+        ti_all = px.index.get_indexer(self.dates)
+
+        seg = self.date_codes
+        ti = np.r_[ti_all, -1][seg + 1]  # price row of the *next* panel date
+        si = si_all[self.codes]
+        ok = (ti >= 0) & (si >= 0) & (ti + horizon < len(px))
+
+        P = px.to_numpy(dtype=float)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            fwd = P[ti[ok] + horizon, si[ok]] / P[ti[ok], si[ok]] - 1
+        contrib = self.values[ok] * fwd
+        good = ~np.isnan(contrib)
+        out = np.bincount(ti[ok][good], weights=contrib[good], minlength=len(px))
+        return pd.Series(out, index=px.index)
@@ -1,50 +1,91 @@
 import pandas as pd
-from pandas.tseries.offsets import BDay
 
-from .load import tone_calls
+from . import instrument, segments, trading_calendar
+from .load import DateLike, tone_calls
 
 
 
 
 
-def build_daily_factor() -> pd.Series:
+def call_timestamps(calls: pd.DataFrame) -> pd.Series:
+    """Parsed call time of each row, from 'date' or 'trade_date' (NaT if unparseable)."""
+    # robust datetime parse from 'date' or 'trade_date'
+    if "date" in calls.columns:
+        return pd.to_datetime(calls["date"], errors="coerce")
+    if "trade_date" in calls.columns:
+        return pd.to_datetime(calls["trade_date"], errors="coerce")
+    raise KeyError("tone_calls() must provide 'date' or 'trade_date' column")
+
+
+def trade_dates(call_ts: pd.Series) -> pd.Series:
+    """
+    Trade date of each call on the NYSE session calendar: calls before a
+    session's open trade that session, later calls (intraday or after the
+    close, also across weekends and holidays) roll to the next session.
+    """
+    return pd.Series(
+        trading_calendar.nyse().trade_dates(call_ts),
+        index=call_ts.index,
+        name="trade_date",
+    )
+
+
+@instrument.instrumented()
+def build_daily_factor(start: DateLike = None, end: DateLike = None) -> pd.Series:
     """Return z-scored tone‐dispersion indexed by trade_date + ticker.
+
+    ``start`` / ``end`` restrict the calls read from disk (by call timestamp).
     
     Note: We negate the tone dispersion because:
     - High tone dispersion = high uncertainty = poor future performance
     - Low tone dispersion = low uncertainty = good future performance
     - Factor should be positive for stocks expected to outperform
     """
-    calls = tone_calls()
+    calls = tone_calls(
+        columns=["symbol", "date", "trade_date", "tone_dispersion"],
+        start=start,
+        end=end,
+    )
+    return factor_from_calls(calls)
 
-    # robust datetime parse from 'date' or 'trade_date'
-    if "date" in calls.columns:
-        calls["call_ts"] = pd.to_datetime(calls["date"], errors="coerce")
-    elif "trade_date" in calls.columns:
-        calls["call_ts"] = pd.to_datetime(calls["trade_date"], errors="coerce")
-    else:
-        raise KeyError("tone_calls() must provide 'date' or 'trade_date' column")
 
+def factor_from_calls(calls: pd.DataFrame) -> pd.Series:
+    """
+    ``build_daily_factor`` on an already loaded frame of calls.  Every trade
+    date is z-scored on its own, so a subset of the calls holding all calls
+    of some trade dates gives exactly those dates' factor values.
+    """
+    call_ts = call_timestamps(calls)
+
+    # tone_calls() is shared and read-only: work on a narrowed copy and
     # drop bad rows early
-    calls = calls.dropna(subset=["call_ts"])
+    n_calls = len(calls)
+    calls = (
+        calls[["symbol", "tone_dispersion"]]
+        .assign(call_ts=call_ts)
+        .dropna(subset=["call_ts"])
+    )
+    instrument.dropped(n_calls - len(calls), "unparseable call date")
 
-    # trade date = *next NYSE business day* (simple BDay)
-    calls["trade_date"] = calls["call_ts"].dt.normalize() + BDay(1)
+    calls["trade_date"] = trade_dates(calls["call_ts"])
+    n_mapped = len(calls)
+    calls = calls.dropna(subset=["trade_date"])
+    instrument.dropped(n_mapped - len(calls), "outside trading calendar")
 
     # aggregate multiple calls per symbol-date by mean dispersion
-    calls = (
-        calls.groupby(["trade_date", "symbol"], as_index=False)["tone_dispersion"]
-        .mean()
-    )
-    factor = calls.set_index(["trade_date", "symbol"])["tone_dispersion"].rename("tone_var")
+    agg = calls.groupby(["trade_date", "symbol"])["tone_dispersion"].mean()
+    factor = agg.rename("tone_var")
 
     # NEGATE the factor: low dispersion (certainty) = positive signal
     factor = -factor
 
-    # z-score cross-section
-    factor = (
-        factor.groupby(level=0, group_keys=False)
-        .transform(lambda s: (s - s.mean()) / s.std(ddof=0))
-        .dropna()
-    )
+    # z-score cross-section (groupby output is already sorted by trade_date)
+    offsets = segments.offsets_of(factor.index.get_level_values(0).to_numpy())
+    n_rows = len(factor)
+    factor = pd.Series(
+        segments.zscore(factor.to_numpy(dtype=float), offsets),
+        index=factor.index,
+        name=factor.name,
+    ).dropna()
+    instrument.dropped(n_rows - len(factor), "undefined z-score")
     return factor
@@ -0,0 +1,253 @@
+"""Incremental ingestion of call batches into a year-partitioned dataset.
+
+The dataset lives in ``load.DATA / load.TONE_DATASET`` (``data/tone_dispersion``):
+
+* ``<year>/part-<n>.parquet`` – the calls of one batch whose call timestamp
+  falls in ``year``; files are only ever added
+* ``keys-<n>.npy``             – sorted 64-bit BLAKE2b digests of every
+  stored ``call_key``
+* ``manifest.json``           – per partition its files with their row
+  counts and min / max call timestamps, the partition's totals, the current
+  key file and the next file number
+
+``ingest_calls`` deduplicates on ``call_key`` at write time: repeated keys
+inside a batch keep their last row, and keys already stored anywhere in the
+dataset are skipped, also when a re-delivered call's timestamp moved to
+another year.  The batch's keys are looked up in the memory-mapped key file
+with ``np.searchsorted``, so no partition is read.  The new files (data and a
+merged key file) are written before the manifest, which is replaced
+atomically, so readers never see a file that is not complete and an
+interrupted ingest leaves orphans that no reader opens.  A manifest without a
+key file (written before it existed) has it rebuilt from the partitions once.
+
+Once a manifest exists, readers use the dataset only.  The first ingest into
+an empty dataset therefore imports the single-file table next to it
+(``tone_dispersion.parquet``) before the batch, so the history it holds stays
+in the factor; a dataset created before that file appeared picks it up with
+``python -m src.ingest data/tone_dispersion.parquet``.
+
+``load.tone_calls`` reads the manifest and opens only the files whose date
+range overlaps the requested window, so ingest cost follows the batch and
+load cost the query range rather than the whole history.
+
+    python -m src.ingest CALLS.parquet [...] [--root DIR] [--batch-rows N]
+"""
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Set, Union
+
+import numpy as np
+import pandas as pd
+
+from . import instrument, load
+
+MANIFEST_VERSION = 1
+
+
+def dataset_root() -> Path:
+    """Default dataset directory (follows ``load.DATA``)."""
+    return load.DATA / load.TONE_DATASET
+
+
+def read_manifest(root: Optional[Union[str, Path]] = None) -> Dict[str, Any]:
+    """The dataset manifest (an empty one if nothing was ingested yet)."""
+    path = Path(root or dataset_root()) / load.MANIFEST
+    if not path.exists():
+        return {"version": MANIFEST_VERSION, "next_file": 0, "rows": 0, "partitions": {}}
+    return json.loads(path.read_text())
+
+
+def _write_manifest(root: Path, manifest: Dict[str, Any]) -> None:
+    tmp = root / f"{load.MANIFEST}.tmp-{os.getpid()}"
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, root / load.MANIFEST)
+
+
+def key_digests(keys: Iterable[Any]) -> np.ndarray:
+    """64-bit BLAKE2b digests (uint64) of ``call_key`` values, as in the key file."""
+    return np.fromiter(
+        (
+            int.from_bytes(hashlib.blake2b(str(k).encode(), digest_size=8).digest(), "little")
+            for k in keys
+        ),
+        dtype="<u8",
+    )
+
+
+def _stored_keys(root: Path, manifest: Dict[str, Any]) -> np.ndarray:
+    """Sorted digests of the ``call_key`` values already stored in any partition."""
+    if manifest.get("keys"):
+        keys: np.ndarray = np.load(root / manifest["keys"], mmap_mode="r")
+        return keys
+
+    import pyarrow.dataset as ds
+
+    files = [
+        str(root / year / f["name"])
+        for year, part in manifest["partitions"].items()
+        for f in part["files"]
+    ]
+    if not files:
+        return np.empty(0, dtype="<u8")
+    table = ds.dataset(files, format="parquet").to_table(columns=["call_key"])
+    return np.sort(key_digests(table.column(0).to_pylist()))
+
+
+def _batches(path: Union[str, Path], batch_rows: int) -> Iterable[pd.DataFrame]:
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(str(path), format="parquet")
+    for batch in dataset.to_batches(batch_size=batch_rows):
+        yield batch.to_pandas()
+
+
+def _check_columns(columns: Iterable[str], what: str) -> None:
+    for col in ("call_key", "date"):
+        if col not in columns:
+            raise KeyError(f"{what} need a {col!r} column")
+
+
+def _seed(root: Path, batch_rows: int = 100_000) -> Optional[Path]:
+    """Import the single-file call table next to an empty dataset, if any."""
+    import pyarrow.parquet as pq
+
+    legacy = root.parent / f"{load.TONE_DATASET}.parquet"
+    if (root / load.MANIFEST).exists() or not legacy.exists():
+        return None
+    _check_columns(pq.read_schema(legacy).names, f"calls in {legacy}")
+    for calls in _batches(legacy, batch_rows):
+        _append(calls, root)
+    return legacy
+
+
+@instrument.instrumented("ingest_calls")
+def ingest_calls(
+    calls: pd.DataFrame, root: Optional[Union[str, Path]] = None
+) -> Dict[str, Any]:
+    """
+    Append a batch of calls to the dataset, skipping known ``call_key`` values.
+
+    Parameters:
+    -----------
+    calls : pd.DataFrame
+        Call-level rows (``call_key``, ``symbol``, ``date``, ``tone_dispersion``
+        and any further columns, the same for every batch)
+    root : Path, optional
+        Dataset directory (default ``data/tone_dispersion``)
+
+    Returns:
+    --------
+    Dict[str, Any]
+        ``rows`` in the batch, ``new`` rows written, ``duplicates`` skipped,
+        ``unparseable`` call dates dropped, the ``partitions`` written to and
+        the single-file table imported first (``seeded``, else None)
+    """
+    root = Path(root or dataset_root())
+    _check_columns(calls.columns, "ingested calls")
+    seeded = _seed(root)
+    summary = _append(calls, root)
+    summary["seeded"] = str(seeded) if seeded else None
+    return summary
+
+
+def _append(calls: pd.DataFrame, root: Path) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {
+        "rows": len(calls),
+        "new": 0,
+        "duplicates": 0,
+        "unparseable": 0,
+        "partitions": [],
+    }
+
+    ts = pd.to_datetime(calls["date"], errors="coerce")
+    ok = ts.notna().to_numpy()
+    summary["unparseable"] = int((~ok).sum())
+    instrument.dropped(summary["unparseable"], "unparseable call date")
+    calls, ts = calls[ok], ts[ok]
+    last = ~calls["call_key"].duplicated(keep="last").to_numpy()
+    summary["duplicates"] = int((~last).sum())
+    calls, ts = calls[last], ts[last]
+
+    root.mkdir(parents=True, exist_ok=True)
+    manifest = read_manifest(root)
+    stored = _stored_keys(root, manifest)
+    digests = key_digests(calls["call_key"])
+    known = np.zeros(len(digests), dtype=bool)
+    if len(stored):
+        pos = np.minimum(np.searchsorted(stored, digests), len(stored) - 1)
+        known = stored[pos] == digests
+    summary["duplicates"] += int(known.sum())
+    calls, ts, digests = calls[~known], ts[~known], digests[~known]
+
+    years = ts.dt.year.to_numpy()
+    for year in np.unique(years):
+        name = str(int(year))
+        rows = years == year
+        batch, batch_ts = calls[rows], ts[rows]
+        part = manifest["partitions"].setdefault(
+            name,
+            {"year": name, "rows": 0, "min_date": None, "max_date": None, "files": []},
+        )
+
+        (root / name).mkdir(exist_ok=True)
+        file_name = f"part-{manifest['next_file']:06d}.parquet"
+        tmp = root / name / f".{file_name}.tmp-{os.getpid()}"
+        batch.to_parquet(tmp, index=False)
+        os.replace(tmp, root / name / file_name)
+
+        lo, hi = str(batch_ts.min()), str(batch_ts.max())
+        part["files"].append(
+            {"name": file_name, "rows": len(batch), "min_date": lo, "max_date": hi}
+        )
+        part["rows"] += len(batch)
+        part["min_date"] = min(lo, part["min_date"] or lo)
+        part["max_date"] = max(hi, part["max_date"] or hi)
+        manifest["next_file"] += 1
+        manifest["rows"] += len(batch)
+        summary["new"] += len(batch)
+        summary["partitions"].append(name)
+
+    instrument.dropped(summary["duplicates"], "duplicate call_key")
+    if summary["new"]:
+        # merge the new digests into a fresh key file the manifest then names
+        digests = np.sort(digests)
+        merged = np.insert(stored, np.searchsorted(stored, digests), digests)
+        old_keys, keys = manifest.get("keys"), f"keys-{manifest['next_file']:06d}.npy"
+        tmp = root / f".{keys}.tmp-{os.getpid()}.npy"
+        np.save(tmp, merged)
+        os.replace(tmp, root / keys)
+        manifest["keys"] = keys
+        _write_manifest(root, manifest)
+        if old_keys:
+            (root / old_keys).unlink()
+    return summary
+
+
+def ingest_files(
+    paths: Iterable[Union[str, Path]],
+    root: Optional[Union[str, Path]] = None,
+    batch_rows: int = 100_000,
+) -> Dict[str, Any]:
+    """Ingest call parquet files (e.g. ``dispersion`` output) in record batches."""
+    total: Dict[str, Any] = {"rows": 0, "new": 0, "duplicates": 0, "unparseable": 0}
+    partitions: Set[str] = set()
+    for path in paths:
+        for calls in _batches(path, batch_rows):
+            res = ingest_calls(calls, root)
+            for k in ("rows", "new", "duplicates", "unparseable"):
+                total[k] += res[k]
+            partitions.update(res["partitions"])
+    total["partitions"] = sorted(partitions)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("calls", nargs="+", help="call-level parquet files")
+    parser.add_argument("--root", default=None, help="dataset directory")
+    parser.add_argument("--batch-rows", type=int, default=100_000)
+    args = parser.parse_args()
+    print(json.dumps(ingest_files(args.calls, args.root, args.batch_rows), indent=2))
@@ -0,0 +1,277 @@
+"""Per-stage instrumentation: timings, memory, shapes and dropped rows.
+
+Stages are marked with the ``instrumented`` decorator (or the ``stage``
+context manager).  Nothing is measured unless one of the environment
+variables below is set, so production code pays only a dictionary lookup:
+
+``TONE_TRACE=path/to/trace.jsonl``
+    Append one JSON record per stage call with wall and CPU seconds, the
+    tracemalloc peak above the stage's starting point, input / output shapes
+    and the rows dropped inside the stage (``dropped(n, reason)``).
+``TONE_PROFILE=build_weights,pnl`` (or ``all``)
+    Run the named stages under cProfile and dump ``<stage>-<pid>-<n>.prof``
+    files into ``TONE_PROFILE_DIR`` (default ``load.CACHE_DIR / "profiles"``).
+    Only the outermost profiled stage of a thread writes a profile; profiled
+    stages nested inside it are already covered by that file.
+
+``python -m src.instrument trace.jsonl`` prints a per-stage summary.
+
+tracemalloc is process-wide: it is started by the first traced stage and left
+running, and its peak counter can only serve one stage tree at a time.  The
+thread whose stage enters first measures memory until its outermost stage
+ends; stages running meanwhile on other threads (e.g. concurrent ``Pipeline``
+stages) record ``peak_mb: null``.  A measured peak covers every thread's
+allocations during the stage.
+"""
+import contextvars
+import cProfile
+import functools
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+import pandas as pd
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# innermost running stage of this thread / task
+_current: "contextvars.ContextVar[Optional[Record]]" = contextvars.ContextVar(
+    "tone_stage", default=None
+)
+# profiler of the outermost profiled stage, with the thread it profiles
+_profiler: "contextvars.ContextVar[Optional[Tuple[int, cProfile.Profile]]]" = (
+    contextvars.ContextVar("tone_profiler", default=None)
+)
+_write_lock = threading.Lock()
+# thread currently measuring memory (owns the tracemalloc peak counter)
+_mem_lock = threading.Lock()
+_mem_owner: Optional[int] = None
+_profile_seq = itertools.count()
+
+
+def _trace_path() -> Optional[Path]:
+    path = os.environ.get("TONE_TRACE")
+    return Path(path) if path else None
+
+
+def _profiled(name: str) -> bool:
+    wanted = os.environ.get("TONE_PROFILE", "")
+    if not wanted:
+        return False
+    names = {n.strip() for n in wanted.split(",")}
+    return "all" in names or name in names
+
+
+def _start_profile() -> Optional[cProfile.Profile]:
+    """A running profiler for a new profiled stage, or None if one is active."""
+    active = _profiler.get()
+    if active is not None and active[0] == threading.get_ident():
+        return None  # nested: the enclosing stage's profile covers it
+    prof = cProfile.Profile()
+    try:
+        prof.enable()
+    except ValueError:  # Python 3.12+: another thread is already profiling
+        return None
+    return prof
+
+
+def _profile_dir() -> Path:
+    from . import load
+
+    return Path(os.environ.get("TONE_PROFILE_DIR", load.CACHE_DIR / "profiles"))
+
+
+def shape_of(obj: Any) -> Any:
+    """JSON-friendly shape of a frame, array or panel (None for other objects)."""
+    if isinstance(obj, pd.Series):
+        return [len(obj)]
+    shape = getattr(obj, "shape", None)
+    if shape is not None:
+        return list(shape)
+    if type(obj).__name__ == "EventPanel":
+        return [len(obj.dates), len(obj.symbols), len(obj)]
+    return None
+
+
+class Record:
+    """Measurements of one stage call."""
+
+    __slots__ = ("stage", "parent", "fields", "dropped", "_mem0", "_peak", "_measured")
+
+    def __init__(self, stage: str, parent: Optional["Record"]) -> None:
+        self.stage = stage
+        self.parent = parent
+        self.fields: Dict[str, Any] = {}
+        self.dropped: Dict[str, int] = {}
+        self._mem0 = 0
+        self._peak = 0
+        self._measured = False
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "stage": self.stage,
+            "parent": self.parent.stage if self.parent else None,
+            **self.fields,
+            "dropped": self.dropped,
+        }
+
+
+def _claim_memory() -> bool:
+    """Whether the calling thread may measure memory (claims it if free)."""
+    global _mem_owner
+    me = threading.get_ident()
+    with _mem_lock:
+        if _mem_owner is None:
+            _mem_owner = me
+        return _mem_owner == me
+
+
+def _release_memory() -> None:
+    global _mem_owner
+    with _mem_lock:
+        _mem_owner = None
+
+
+def dropped(count: int, reason: str) -> None:
+    """Report ``count`` rows removed by the running stage (no-op when untraced)."""
+    rec = _current.get()
+    if rec is not None and count:
+        rec.dropped[reason] = rec.dropped.get(reason, 0) + int(count)
+
+
+@contextmanager
+def stage(name: str, inputs: Optional[List[Any]] = None) -> Iterator[Optional[Record]]:
+    """
+    Measure the enclosed block as stage ``name``.  Yields the ``Record``
+    (None when neither tracing nor profiling is enabled); set
+    ``record.fields["output"]`` to report an output shape.
+    """
+    trace = _trace_path()
+    profile = _profiled(name)
+    if trace is None and not profile:
+        yield None
+        return
+
+    parent = _current.get()
+    rec = Record(name, parent)
+    token = _current.set(rec)
+
+    # the outermost measured stage of the owning thread releases the counter
+    owns_memory = False
+    if trace is not None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        rec._measured = _claim_memory()
+        owns_memory = rec._measured and not (parent is not None and parent._measured)
+        if rec._measured:
+            rec._mem0 = tracemalloc.get_traced_memory()[0]
+            if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+                tracemalloc.reset_peak()
+        if inputs is not None:
+            rec.fields["inputs"] = [shape_of(a) for a in inputs]
+
+    prof = _start_profile() if profile else None
+    prof_token = (
+        _profiler.set((threading.get_ident(), prof)) if prof is not None else None
+    )
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    error = None
+    try:
+        yield rec
+    except BaseException as exc:
+        error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        if prof is not None:
+            prof.disable()
+        if prof_token is not None:
+            _profiler.reset(prof_token)
+        wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+        _current.reset(token)
+
+        if prof is not None:
+            out = _profile_dir()
+            out.mkdir(parents=True, exist_ok=True)
+            prof.dump_stats(out / f"{name}-{os.getpid()}-{next(_profile_seq)}.prof")
+
+        if trace is not None:
+            peak_mb = None
+            if rec._measured:
+                # the peak since this stage started, including nested stages
+                # (which reset the tracemalloc peak on entry)
+                peak = max(tracemalloc.get_traced_memory()[1], rec._peak)
+                if parent is not None and parent._measured:
+                    parent._peak = max(parent._peak, peak)
+                peak_mb = round(max(peak - rec._mem0, 0) / 2**20, 3)
+            if owns_memory:
+                _release_memory()
+            rec.fields.update(
+                time=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                pid=os.getpid(),
+                wall_s=round(wall, 6),
+                cpu_s=round(cpu, 6),
+                peak_mb=peak_mb,
+            )
+            if error is not None:
+                rec.fields["error"] = error
+            line = json.dumps(rec.as_dict(), default=str)
+            with _write_lock:
+                trace.parent.mkdir(parents=True, exist_ok=True)
+                with open(trace, "a") as fh:
+                    fh.write(line + "\n")
+
+
+def instrumented(name: Optional[str] = None) -> Callable[[F], F]:
+    """Decorator form of ``stage``; records argument and return shapes."""
+
+    def wrap(func: F) -> F:
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def inner(*args: Any, **kwargs: Any) -> Any:
+            if _trace_path() is None and not _profiled(label):
+                return func(*args, **kwargs)
+            with stage(label, [*args, *kwargs.values()]) as rec:
+                result = func(*args, **kwargs)
+                if rec is not None:
+                    rec.fields["output"] = shape_of(result)
+                return result
+
+        return inner  # type: ignore[return-value]
+
+    return wrap
+
+
+def summarise(path: Path) -> pd.DataFrame:
+    """Per-stage call count, total / mean wall and CPU time, max peak memory."""
+    with open(path) as fh:
+        rows = [json.loads(line) for line in fh if line.strip()]
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame(rows)
+    df["dropped_rows"] = df["dropped"].map(lambda d: sum(d.values()))
+    return (
+        df.groupby("stage")
+        .agg(
+            calls=("wall_s", "size"),
+            wall_s=("wall_s", "sum"),
+            mean_wall_s=("wall_s", "mean"),
+            cpu_s=("cpu_s", "sum"),
+            peak_mb=("peak_mb", "max"),
+            dropped_rows=("dropped_rows", "sum"),
+        )
+        .sort_values("wall_s", ascending=False)
+    )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m src.instrument TRACE.jsonl")
+    print(summarise(Path(sys.argv[1])).to_string())
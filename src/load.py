@@ -1,29 +1,257 @@
+import json
+import os
+import threading
 from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import pandas as pd
 
+from . import instrument, matrix_store
+
 DATA = Path(__file__).resolve().parents[1] / "data"
 
+DateLike = Union[str, pd.Timestamp, None]
 
-def ff_factors() -> pd.DataFrame:
-    return pd.read_parquet(DATA / "ff5_daily.parquet")
+# year-partitioned call dataset under DATA written by ``ingest``
+TONE_DATASET = "tone_dispersion"
+MANIFEST = "manifest.json"
 
+# opt-in on-disk cache of derived frames (the memory-mapped price matrix)
+CACHE_DIR = Path(os.environ.get("TONE_CACHE_DIR", DATA / ".cache"))
 
-# src/load.py
-def prices():
-    path = DATA / "stock_prices.parquet"
+
+def _fingerprint(path: Path) -> Tuple[int, int]:
+    """Cheap file identity: (mtime in ns, size in bytes)."""
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+def _freeze(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return a view of a freshly loaded ``df`` whose column data cannot be
+    written to.  ``df`` itself must not be used afterwards.
+    """
+    if df.shape[1] and len(set(df.dtypes)) == 1:
+        arr = df.to_numpy()
+        arr.flags.writeable = False
+        return pd.DataFrame(arr, index=df.index, columns=df.columns, copy=False)
+
+    cols = {}
+    for i in range(df.shape[1]):
+        col = df.iloc[:, i].to_numpy()
+        col.flags.writeable = False
+        cols[i] = col
+    out = pd.DataFrame(cols, index=df.index, copy=False)
+    out.columns = df.columns
+    return out
+
+
+class FrameCache:
+    """
+    Process-wide memo of loaded frames.
+
+    Entries are keyed on the loader name, source path and call arguments and
+    are invalidated whenever the source file's mtime or size changes.  Cached
+    frames are shared between callers and therefore read-only: take a
+    ``.copy()`` before modifying one in place.
+    """
+
+    def __init__(self) -> None:
+        self._frames: Dict[Hashable, Tuple[Tuple[int, int], pd.DataFrame]] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(
+        self, key: Hashable, path: Path, loader: Callable[[], pd.DataFrame]
+    ) -> pd.DataFrame:
+        fp = _fingerprint(path)
+        with self._lock:
+            entry = self._frames.get(key)
+            if entry is not None:
+                if entry[0] == fp:
+                    self._hits += 1
+                    return entry[1]
+                self._invalidations += 1
+            self._misses += 1
+
+        frame = _freeze(loader())
+        with self._lock:
+            self._frames[key] = (fp, frame)
+        return frame
+
+    def clear(self) -> None:
+        """Drop every cached frame and reset the counters."""
+        with self._lock:
+            self._frames.clear()
+            self._hits = self._misses = self._invalidations = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and the number of cached frames."""
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "invalidations": self._invalidations,
+                "entries": len(self._frames),
+                "bytes": int(
+                    sum(f.memory_usage(index=True).sum() for _, f in self._frames.values())
+                ),
+            }
+
+
+cache = FrameCache()
+
+
+def _check_lfs(path: Path) -> None:
     # detect Git LFS pointer files and prompt user to fetch real data
     try:
         with open(path, 'rb') as f:
             first = f.readline()
         if first.startswith(b'version https://git-lfs.github.com'):
             raise RuntimeError(
-                "data/stock_prices.parquet appears to be a Git LFS pointer.\n"
+                f"data/{path.name} appears to be a Git LFS pointer.\n"
                 "Please run `git lfs install` and `git lfs pull` to fetch the actual data."
             )
     except OSError:
         raise RuntimeError(f"Unable to open {path}")
-    px = pd.read_parquet(path)
+
+
+def _disk_cache_enabled(disk_cache: Optional[bool]) -> bool:
+    if disk_cache is not None:
+        return disk_cache
+    return os.environ.get("TONE_DISK_CACHE", "").lower() in ("1", "true", "yes")
+
+
+def _bound(value: DateLike) -> Optional[pd.Timestamp]:
+    return None if value is None else pd.Timestamp(value)
+
+
+def _key(
+    columns: Optional[Sequence[str]],
+    start: DateLike,
+    end: DateLike,
+    symbols: Optional[Iterable[str]],
+) -> Tuple:
+    """Hashable, order-insensitive form of the read arguments."""
+    return (
+        None if columns is None else tuple(columns),
+        None if start is None else str(_bound(start)),
+        None if end is None else str(_bound(end)),
+        None if symbols is None else tuple(sorted({s.upper() for s in symbols})),
+    )
+
+
+def _read(
+    path: Union[Path, Sequence[str]],
+    columns: Optional[Sequence[str]] = None,
+    start: DateLike = None,
+    end: DateLike = None,
+    symbols: Optional[Iterable[str]] = None,
+    date_col: str = "date",
+    symbol_col: str = "symbol",
+) -> pd.DataFrame:
+    """
+    Read ``path`` (a file, or a list of files sharing one schema) through a
+    pyarrow dataset, pushing the column projection and the date / symbol
+    predicates down to the scan so that row groups outside the requested
+    window are skipped instead of decoded.  Requested columns that the file
+    does not have are ignored.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(path, format="parquet")
+    schema = dataset.schema
+    start, end = _bound(start), _bound(end)
+
+    if columns is not None:
+        columns = [c for c in columns if c in schema.names]
+        # pandas index columns are needed to restore the frame's index
+        index_cols = [
+            c
+            for c in (schema.pandas_metadata or {}).get("index_columns", [])
+            if isinstance(c, str)
+        ]
+        needed = [date_col] if (start is not None or end is not None) else []
+        if symbols is not None:
+            needed.append(symbol_col)
+        columns = list(dict.fromkeys([*index_cols, *columns, *needed]))
+
+    filt = None
+    exact_dates = False
+    if start is not None or end is not None:
+        field = ds.field(date_col)
+        dtype = schema.field(date_col).type
+        if pa.types.is_timestamp(dtype) or pa.types.is_date(dtype):
+            lo = None if start is None else pa.scalar(start.to_pydatetime())
+            hi = None if end is None else pa.scalar(end.to_pydatetime())
+        else:
+            # ISO-formatted strings: coarse day-level bounds here, exact
+            # comparison after parsing below
+            exact_dates = True
+            lo = None if start is None else pa.scalar(start.strftime("%Y-%m-%d"))
+            hi = (
+                None
+                if end is None
+                else pa.scalar((end + pd.Timedelta(days=1)).strftime("%Y-%m-%d"))
+            )
+        if lo is not None:
+            filt = field >= lo.cast(dtype)
+        if hi is not None:
+            upper = field < hi if exact_dates else field <= hi.cast(dtype)
+            filt = upper if filt is None else filt & upper
+
+    if symbols is not None:
+        wanted = pc.utf8_upper(ds.field(symbol_col)).isin(
+            sorted({s.upper() for s in symbols})
+        )
+        filt = wanted if filt is None else filt & wanted
+
+    df = dataset.to_table(columns=columns, filter=filt).to_pandas()
+
+    if exact_dates:
+        ts = pd.to_datetime(df[date_col], errors="coerce")
+        keep = ts.notna()
+        if start is not None:
+            keep &= ts >= start
+        if end is not None:
+            keep &= ts <= end
+        df = df[keep.to_numpy()].reset_index(drop=True)
+    return df
+
+
+def ff_factors(
+    columns: Optional[Sequence[str]] = None,
+    start: DateLike = None,
+    end: DateLike = None,
+) -> pd.DataFrame:
+    """Daily FF5 + UMD factor returns indexed by date, optionally windowed."""
+    path = DATA / "ff5_daily.parquet"
+    key = ("ff_factors", str(path), _key(columns, start, end, None))
+    return cache.get(key, path, lambda: _read(path, columns, start, end))
+
+
+def _pivot_prices(
+    path: Path,
+    start: DateLike = None,
+    end: DateLike = None,
+    symbols: Optional[Iterable[str]] = None,
+) -> pd.DataFrame:
+    # only the three columns the wide matrix needs are decoded
+    px = _read(path, ["date", "symbol", "adjClose"], start, end, symbols)
 
     # long form → wide: adjClose, upper-case symbols
     px = px.pivot(index="date", columns="symbol", values="adjClose").sort_index()
@@ -31,5 +259,158 @@ def prices():
     return px
 
 
-def tone_calls() -> pd.DataFrame:
-    return pd.read_parquet(DATA / "tone_dispersion.parquet")
+def _cached_pivot(path: Path) -> pd.DataFrame:
+    """Open the memory-mapped wide price matrix, rebuilding it if stale."""
+    mtime, size = _fingerprint(path)
+    source = {"file": path.name, "mtime_ns": mtime, "size": size}
+    store = CACHE_DIR / f"{path.stem}.matrix"
+    meta = matrix_store.read_meta(store)
+    if meta is None or meta["source"] != source:
+        matrix_store.write_matrix(_pivot_prices(path), store, source=source)
+    return matrix_store.open_matrix(store)
+
+
+def _slice_wide(
+    px: pd.DataFrame,
+    start: DateLike = None,
+    end: DateLike = None,
+    symbols: Optional[Iterable[str]] = None,
+) -> pd.DataFrame:
+    if start is not None or end is not None:
+        px = px.loc[_bound(start) : _bound(end)]
+    if symbols is not None:
+        px = px[px.columns.intersection(pd.Index({s.upper() for s in symbols}))]
+    # drop dates on which none of the requested symbols has a price, as a
+    # pushed-down read of the long table would
+    return px.dropna(how="all") if symbols is not None else px
+
+
+# src/load.py
+@instrument.instrumented()
+def prices(
+    start: DateLike = None,
+    end: DateLike = None,
+    symbols: Optional[Iterable[str]] = None,
+    disk_cache: Optional[bool] = None,
+    memo: bool = True,
+) -> pd.DataFrame:
+    """
+    Wide adjClose matrix (dates × upper-case symbols).
+
+    ``start`` / ``end`` (inclusive) and ``symbols`` restrict the read; they are
+    pushed down into the parquet scan so unrequested rows are never decoded.
+
+    The pivoted matrix is memoised for the lifetime of the process.  With
+    ``disk_cache=True`` (or ``TONE_DISK_CACHE=1``) the full matrix is also
+    persisted under ``CACHE_DIR`` as a ``matrix_store`` and reopened with
+    ``np.memmap``, so later runs and worker processes skip the long → wide
+    pivot and share one physical copy until ``stock_prices.parquet`` changes.
+    Windows are sliced from the mapped matrix.
+
+    ``memo=False`` bypasses the in-process memo, for callers that stream
+    through many windows once (``chunked``) and must not accumulate them.
+    """
+    path = DATA / "stock_prices.parquet"
+    _check_lfs(path)
+    persist = _disk_cache_enabled(disk_cache)
+
+    def _load() -> pd.DataFrame:
+        if persist:
+            return _slice_wide(_cached_pivot(path), start, end, symbols)
+        return _pivot_prices(path, start, end, symbols)
+
+    if not memo:
+        return _load()
+    key = ("prices", str(path), _key(None, start, end, symbols))
+    return cache.get(key, path, _load)
+
+
+def tone_source() -> Path:
+    """
+    File identifying the current call data: the manifest of the
+    year-partitioned dataset written by ``ingest`` when there is one,
+    ``tone_dispersion.parquet`` otherwise (the first ingest imports that
+    file into the dataset).
+    """
+    manifest = DATA / TONE_DATASET / MANIFEST
+    return manifest if manifest.exists() else DATA / "tone_dispersion.parquet"
+
+
+def tone_files(start: DateLike = None, end: DateLike = None) -> List[Path]:
+    """
+    Call files holding the calls of [start, end]: the dataset files whose
+    manifest date range overlaps the window (others are never opened), or the
+    single ``tone_dispersion.parquet``.
+    """
+    source = tone_source()
+    if source.name != MANIFEST:
+        return [source]
+    manifest = json.loads(source.read_text())
+    start, end = _bound(start), _bound(end)
+    files = []
+    for year, part in sorted(manifest["partitions"].items()):
+        for f in part["files"]:
+            if start is not None and pd.Timestamp(f["max_date"]) < start:
+                continue
+            if end is not None and pd.Timestamp(f["min_date"]) > end:
+                continue
+            files.append(source.parent / year / f["name"])
+    return files
+
+
+@instrument.instrumented()
+def tone_calls(
+    columns: Optional[Sequence[str]] = None,
+    start: DateLike = None,
+    end: DateLike = None,
+    symbols: Optional[Iterable[str]] = None,
+    memo: bool = True,
+) -> pd.DataFrame:
+    """
+    Call-level tone dispersion, optionally projected and windowed on call date.
+
+    Reads the ``ingest`` dataset (only the partitions overlapping the window)
+    when it exists, ``tone_dispersion.parquet`` otherwise.  ``memo=False``
+    bypasses the in-process memo, as for ``prices``.
+    """
+    source = tone_source()
+    key = ("tone_calls", str(source), _key(columns, start, end, symbols))
+
+    def _load() -> pd.DataFrame:
+        files = tone_files(start, end)
+        if not files:
+            return pd.DataFrame(columns=list(columns or ["symbol", "date"]))
+        if source.name != MANIFEST:
+            return _read(files[0], columns, start, end, symbols)
+        return _read([str(f) for f in files], columns, start, end, symbols)
+
+    if not memo:
+        return _load()
+    return cache.get(key, source, _load)
+
+
+def price_labels(
+    symbols: Optional[Iterable[str]] = None,
+) -> Tuple[pd.DatetimeIndex, pd.Index]:
+    """
+    Row and column labels of ``prices(symbols=symbols)`` — the dates on which
+    any of the symbols has a row and the upper-case symbols present — from a
+    batch-wise scan of the date and symbol columns only.
+    """
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    path = DATA / "stock_prices.parquet"
+    _check_lfs(path)
+    filt = None
+    if symbols is not None:
+        filt = pc.utf8_upper(ds.field("symbol")).isin(sorted({s.upper() for s in symbols}))
+    dates, names = set(), set()
+    dataset = ds.dataset(path, format="parquet")
+    for batch in dataset.to_batches(columns=["date", "symbol"], filter=filt):
+        dates.update(pc.unique(batch.column(0)).to_pandas())
+        names.update(pc.unique(batch.column(1)).to_pylist())
+    return (
+        pd.DatetimeIndex(sorted(dates), name="date"),
+        pd.Index(sorted(names), name="symbol").str.upper(),
+    )
@@ -0,0 +1,214 @@
+"""Memory-mapped on-disk store for wide dates × symbols matrices.
+
+A store is a directory holding
+
+* ``values.npy``  – C-contiguous float64/float32 block (dates × symbols)
+* ``dates.npy``   – datetime64[ns] row labels
+* ``symbols.npy`` – unicode column labels
+* ``meta.json``   – dtype, shape, index names and the source fingerprint
+
+``open_matrix`` maps ``values.npy`` read-only with ``np.memmap`` and wraps it in
+a DataFrame without copying, so any number of processes reopening the same
+store share one physical copy of the data through the page cache.
+
+``write_rows`` replaces the trailing rows of an existing store in place, for
+writers that extend a matrix by a few dates at a time (``incremental``).
+"""
+import io
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+_VALUES = "values.npy"
+_DATES = "dates.npy"
+_SYMBOLS = "symbols.npy"
+_META = "meta.json"
+
+
+def write_matrix(
+    frame: pd.DataFrame,
+    path: Union[str, Path],
+    dtype: npt.DTypeLike = np.float64,
+    source: Optional[Dict[str, Any]] = None,
+) -> Path:
+    """
+    Persist a wide numeric frame as a memory-mappable store.
+
+    The store is written to a temporary sibling directory and moved into
+    place, so concurrent readers never observe a half-written store.
+
+    Parameters:
+    -----------
+    frame : pd.DataFrame
+        Matrix with a DatetimeIndex and string columns
+    path : str or Path
+        Store directory (created or replaced)
+    dtype : np.dtype
+        Storage dtype, float64 (default) or float32 to halve the footprint
+    source : dict, optional
+        Provenance recorded in ``meta.json`` (e.g. the source file fingerprint)
+    """
+    path = Path(path)
+    dtype = np.dtype(dtype)
+    if dtype.kind != "f":
+        raise ValueError(f"matrix store holds floating point data, got {dtype}")
+
+    tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    np.save(tmp / _VALUES, np.ascontiguousarray(frame.to_numpy(dtype=dtype)))
+    np.save(tmp / _DATES, pd.DatetimeIndex(frame.index).to_numpy("datetime64[ns]"))
+    np.save(tmp / _SYMBOLS, frame.columns.to_numpy(dtype=str))
+    meta = {
+        "dtype": dtype.str,
+        "shape": list(frame.shape),
+        "index_name": frame.index.name,
+        "columns_name": frame.columns.name,
+        "source": source or {},
+    }
+    (tmp / _META).write_text(json.dumps(meta, indent=2))
+
+    if path.exists():
+        shutil.rmtree(path)
+    os.replace(tmp, path)
+    return path
+
+
+def allocate_matrix(
+    index: pd.DatetimeIndex,
+    columns: pd.Index,
+    path: Union[str, Path],
+    dtype: npt.DTypeLike = np.float64,
+    source: Optional[Dict[str, Any]] = None,
+) -> np.memmap:
+    """
+    Create a store of the given labels and return its values as a writable
+    ``np.memmap`` (zero-filled), for writers that produce the matrix in row
+    blocks without holding it in memory.  Unlike ``write_matrix`` the store
+    is written in place; flush the returned map before reopening it.
+    """
+    path = Path(path)
+    dtype = np.dtype(dtype)
+    if dtype.kind != "f":
+        raise ValueError(f"matrix store holds floating point data, got {dtype}")
+    shutil.rmtree(path, ignore_errors=True)
+    path.mkdir(parents=True)
+
+    values = np.lib.format.open_memmap(
+        path / _VALUES, mode="w+", dtype=dtype, shape=(len(index), len(columns))
+    )
+    np.save(path / _DATES, pd.DatetimeIndex(index).to_numpy("datetime64[ns]"))
+    np.save(path / _SYMBOLS, columns.to_numpy(dtype=str))
+    meta = {
+        "dtype": dtype.str,
+        "shape": [len(index), len(columns)],
+        "index_name": index.name,
+        "columns_name": columns.name,
+        "source": source or {},
+    }
+    (path / _META).write_text(json.dumps(meta, indent=2))
+    return values
+
+
+def write_rows(frame: pd.DataFrame, path: Union[str, Path], row: int) -> Path:
+    """
+    Replace the rows of an existing store from position ``row`` on with
+    ``frame`` (same columns), extending or truncating it in place.  Rows
+    before ``row`` are neither read nor rewritten, so the cost follows the
+    length of ``frame`` rather than of the store.
+
+    Unlike ``write_matrix`` this is not atomic: a reader opening the store
+    meanwhile may see a shape mismatch, and a crash leaves the rows from
+    ``row`` on undefined.  Writers keep their own commit record and rewrite
+    the same rows again after a failure.  Falls back to ``write_matrix``
+    when the ``values.npy`` header cannot be patched in place.
+    """
+    path = Path(path)
+    meta = read_meta(path)
+    if meta is None:
+        raise FileNotFoundError(f"no matrix store at {path}")
+    symbols = np.load(path / _SYMBOLS)
+    if symbols.tolist() != frame.columns.to_numpy(dtype=str).tolist():
+        raise ValueError(f"columns of the new rows differ from the store at {path}")
+    if not 0 <= row <= meta["shape"][0]:
+        raise ValueError(f"row {row} is outside the store at {path}")
+
+    dtype = np.dtype(meta["dtype"])
+    dates = np.concatenate(
+        [
+            np.load(path / _DATES)[:row],
+            pd.DatetimeIndex(frame.index).to_numpy("datetime64[ns]"),
+        ]
+    )
+    shape = (len(dates), len(symbols))
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(
+        header,
+        {
+            "descr": np.lib.format.dtype_to_descr(dtype),
+            "fortran_order": False,
+            "shape": shape,
+        },
+    )
+
+    with open(path / _VALUES, "r+b") as f:
+        in_place = np.lib.format.read_magic(f) == (1, 0)
+        if in_place:
+            np.lib.format.read_array_header_1_0(f)
+            in_place = f.tell() == len(header.getvalue())
+        if in_place:
+            values = np.ascontiguousarray(frame.to_numpy(dtype=dtype))
+            f.seek(f.tell() + row * len(symbols) * dtype.itemsize)
+            f.write(values.tobytes())
+            f.truncate()
+            f.seek(0)
+            f.write(header.getvalue())
+    if not in_place:
+        head = open_matrix(path).iloc[:row]
+        frame = pd.concat([head, frame.set_axis(head.columns, axis=1)])
+        return write_matrix(frame, path, dtype, meta["source"])
+
+    tmp = path / f"{_DATES}.tmp-{os.getpid()}.npy"
+    np.save(tmp, dates)
+    os.replace(tmp, path / _DATES)
+    meta["shape"] = list(shape)
+    tmp = path / f"{_META}.tmp-{os.getpid()}"
+    tmp.write_text(json.dumps(meta, indent=2))
+    os.replace(tmp, path / _META)
+    return path
+
+
+def read_meta(path: Union[str, Path]) -> Optional[Dict[str, Any]]:
+    """Return the store's metadata, or None if no complete store exists."""
+    meta = Path(path) / _META
+    if not meta.exists():
+        return None
+    return json.loads(meta.read_text())
+
+
+def open_matrix(path: Union[str, Path]) -> pd.DataFrame:
+    """
+    Reopen a store as a read-only DataFrame backed by ``np.memmap``.
+
+    No data is read until it is touched; the frame's values are a view of the
+    mapped file.  Operations that need a private copy (arithmetic, ``fillna``
+    …) allocate as usual, but slicing rows keeps sharing the mapping.
+    """
+    path = Path(path)
+    meta = read_meta(path)
+    if meta is None:
+        raise FileNotFoundError(f"no matrix store at {path}")
+
+    values = np.load(path / _VALUES, mmap_mode="r")
+    dates = pd.DatetimeIndex(np.load(path / _DATES), name=meta["index_name"])
+    symbols = pd.Index(np.load(path / _SYMBOLS).astype(object), name=meta["columns_name"])
+    if values.shape != (len(dates), len(symbols)):
+        raise ValueError(f"corrupt matrix store at {path}: shape mismatch")
+    return pd.DataFrame(values, index=dates, columns=symbols, copy=False)
@@ -1,51 +1,115 @@
+from typing import Dict, Optional, Union, cast
+
 import pandas as pd
 import numpy as np
-import statsmodels.api as sm  # only for API consistency, but fallback for small samples
 
+from . import instrument, segments
+from .betas import FACTORS, betas_at, stock_betas
 from .load import ff_factors
 
-FF = ff_factors()
+# Daily FF5 + UMD returns.  Left unset so importing this module does no I/O;
+# the factor's date window is loaded on first use.  Assign a frame here to
+# override the source (e.g. in tests).
+FF: Optional[pd.DataFrame] = None
+
 
+def _ff_window(dates: pd.Index) -> pd.DataFrame:
+    """FF factor returns covering ``dates``."""
+    if FF is not None:
+        return FF
+    return ff_factors(start=dates.min(), end=dates.max())
 
-def _get_date_index(df: pd.DataFrame) -> pd.Index:
+
+def _get_date_index(df: Union[pd.Series, pd.DataFrame]) -> pd.Index:
     """Return the first level of the index as a plain date Index."""
     if isinstance(df.index, pd.MultiIndex):
         return df.index.get_level_values(0)
     return df.index
 
 
-def neutralise(factor: pd.Series) -> pd.Series:
+def _segment_residuals(
+    y: np.ndarray, X: np.ndarray, offsets: np.ndarray, rcond: float = 1e-10
+) -> np.ndarray:
+    """
+    Residuals of per-segment OLS of ``y`` on ``[1, X]`` for date-sorted rows.
+
+    All segments are solved at once: the intercept is removed by demeaning
+    within each segment, every segment's cross-product matrix is built with
+    segment reductions and the stacked normal equations are solved by one
+    batched pseudo-inverse.  Regressors with no variation inside a segment,
+    and collinear combinations (eigenvalues below ``rcond`` of the scaled
+    cross-product matrix), are dropped from that segment's fit, which gives
+    the same fitted values as a minimum-norm ``lstsq`` solution.
+    """
+    yc = segments.demean(y, offsets)
+    Xc = segments.demean(X, offsets)
+
+    # scale each segment's regressors to unit norm so that one relative
+    # tolerance applies to all days; constant-within-day regressors vanish
+    norm = np.sqrt(segments.total(Xc * Xc, offsets))
+    scale = np.sqrt(segments.total(X * X, offsets))
+    present = norm > np.sqrt(np.finfo(float).eps) * np.maximum(scale, 1e-300)
+    inv = np.divide(1.0, norm, out=np.zeros_like(norm), where=present)
+    Z = Xc * segments.broadcast(inv, offsets)
+
+    k = Z.shape[1]
+    xtx = np.empty((len(offsets) - 1, k, k))
+    for j in range(k):
+        xtx[:, :, j] = segments.total(Z * Z[:, j : j + 1], offsets)
+    xty = segments.total(Z * yc[:, None], offsets)
+
+    beta = np.matmul(
+        np.linalg.pinv(xtx, rcond=rcond, hermitian=True), xty[:, :, None]
+    )[:, :, 0]
+    return yc - np.einsum("ij,ij->i", Z, segments.broadcast(beta, offsets))
+
+
+@instrument.instrumented()
+def neutralise(
+    factor: pd.Series,
+    exposures: str = "ff",
+    betas: Optional[Dict[str, pd.DataFrame]] = None,
+) -> pd.Series:
     """
     Regress the raw tone-dispersion signal on daily FF-5 + UMD
     and return the cross-sectional residuals.
     Works whether the index level is called 'date' or 'trade_date'.
+
+    Parameters:
+    -----------
+    factor : pd.Series
+        Signal with MultiIndex (date, symbol)
+    exposures : str
+        "ff" regresses on the day's factor returns (constant across the
+        cross-section, so this only demeans), "betas" on each stock's rolling
+        factor betas from ``betas.stock_betas``
+    betas : dict, optional
+        Precomputed beta matrices for ``exposures="betas"``
     """
-    # align factors
-    date_level = factor.index.names[0]  # 'trade_date' in our build
-    df = (
-        factor.to_frame()
-        .join(FF, how="left", on=date_level)  # CRSP factors keyed on same date
-        .dropna()
-    )
-
-    def _resid(day_df: pd.DataFrame):
-        y = day_df.iloc[:, 0].values
-        cols = ["mktrf", "smb", "hml", "rmw", "cma", "umd"]
-        # design matrix with constant term
-        X = np.column_stack([np.ones(len(day_df))] + [day_df[c].values for c in cols])
-        # solve least squares for speed
-        try:
-            beta, *_ = np.linalg.lstsq(X, y, rcond=None)
-            resid = y - X.dot(beta)
-        except Exception:
-            # fallback to statsmodels if numpy fails
-            X_sm = sm.add_constant(day_df[cols])
-            resid = sm.OLS(day_df.iloc[:, 0], X_sm).fit().resid.values
-        return pd.Series(resid, index=day_df.index)
-
-    resid = (
-        df.groupby(_get_date_index(df), group_keys=False)
-        .apply(_resid)
-        .rename("tone_resid")
-    )
-    return resid
+    if exposures == "ff":
+        # align factors
+        date_level = factor.index.names[0]  # 'trade_date' in our build
+        ff = _ff_window(_get_date_index(factor))
+        df = (
+            factor.to_frame()
+            .join(ff, how="left", on=date_level)  # CRSP factors keyed on same date
+            .dropna()
+        )
+    elif exposures == "betas":
+        if betas is None:
+            betas = stock_betas()
+        exposure = betas_at(cast(pd.MultiIndex, factor.index), betas)
+        df = pd.concat([factor, exposure], axis=1).dropna()
+    else:
+        raise ValueError(f"unknown exposures {exposures!r}, use 'ff' or 'betas'")
+    instrument.dropped(len(factor) - len(df), "missing signal or exposures")
+    if df.empty:
+        return pd.Series(dtype=float, index=df.index, name="tone_resid")
+
+    # sort once by date (stable, so rows keep their order within a day)
+    order, offsets = segments.sort_by(_get_date_index(df).to_numpy())
+
+    y = df.iloc[:, 0].to_numpy(dtype=float)[order]
+    X = df[FACTORS].to_numpy(dtype=float)[order]
+    resid = _segment_residuals(y, X, offsets)
+    return pd.Series(resid, index=df.index[order], name="tone_resid")
@@ -0,0 +1,342 @@
+"""Content-addressed stage cache and DAG runner for the backtest.
+
+A ``Pipeline`` is a set of named stages, each a function of the outputs of
+its dependency stages plus keyword parameters.  Every stage has a key: a
+SHA-256 over its name, parameters, the source code of the modules it names,
+the fingerprints of the data files it reads and the keys of its
+dependencies.  Outputs are persisted under ``load.CACHE_DIR / "stages"`` as
+parquet (Series / DataFrame) or JSON (dicts of scalars), so a stage whose
+key has not changed is read back instead of recomputed — in this process,
+in a later run or from another script.  Requesting a node only loads what
+is needed to produce it, and stages whose inputs are ready run concurrently
+on a thread pool.
+
+    pipe = pipeline.backtest(smoothing=0.75)
+    pnl = pipe["pnl"]                         # cache hit if nothing changed
+    out = pipe.run("pnl", "turnover")         # {"pnl": ..., "turnover": ...}
+"""
+import contextvars
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import load
+
+
+class Stage:
+    """
+    One node of a ``Pipeline``.
+
+    Parameters:
+    -----------
+    name : str
+        Node name
+    func : callable
+        Called as ``func(*dependency_outputs, **params)``
+    deps : sequence of str
+        Upstream stages whose outputs are passed positionally
+    params : dict, optional
+        Keyword arguments, part of the cache key
+    sources : iterable of Path
+        Data files read by ``func``; their (mtime, size) enter the key
+    code : iterable of module
+        Modules whose source enters the key (default: ``func``'s module)
+    persist : bool
+        Store the output; side-effect stages (plots) set this to False
+    exclusive : bool
+        Run on the calling thread, one at a time (for pyplot)
+    """
+
+    __slots__ = (
+        "name", "func", "deps", "params", "sources", "code", "persist", "exclusive",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Any],
+        deps: Sequence[str] = (),
+        params: Optional[Dict[str, Any]] = None,
+        sources: Iterable[Path] = (),
+        code: Iterable[ModuleType] = (),
+        persist: bool = True,
+        exclusive: bool = False,
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.params = dict(params or {})
+        self.sources = tuple(Path(p) for p in sources)
+        module = inspect.getmodule(func)
+        self.code: Tuple[ModuleType, ...] = tuple(code) or ((module,) if module else ())
+        self.persist = persist
+        self.exclusive = exclusive
+
+
+def _code_hash(module: ModuleType) -> str:
+    try:
+        text = inspect.getsource(module)
+    except (OSError, TypeError):
+        text = module.__name__
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class Pipeline:
+    """
+    DAG of cached stages.
+
+    Parameters:
+    -----------
+    cache_dir : Path, optional
+        Where stage outputs are persisted (default ``load.CACHE_DIR / "stages"``)
+    max_workers : int
+        Threads used to run independent stages concurrently
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_workers: int = 4) -> None:
+        self.cache_dir = Path(cache_dir) if cache_dir else load.CACHE_DIR / "stages"
+        self.max_workers = max_workers
+        self.stages: Dict[str, Stage] = {}
+        self._memo: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0}
+
+    def add(self, name: str, func: Callable[..., Any], **kwargs: Any) -> "Pipeline":
+        """Register a stage (see ``Stage`` for the keyword arguments)."""
+        stage = Stage(name, func, **kwargs)
+        missing = [d for d in stage.deps if d not in self.stages]
+        if missing:
+            raise ValueError(f"stage {name!r} depends on unknown stages {missing}")
+        self.stages[name] = stage
+        return self
+
+    # -------------------------------------------------------------- #
+    # keys and storage
+    # -------------------------------------------------------------- #
+    def key(self, name: str) -> str:
+        """Content hash of a stage's inputs, parameters and code."""
+        stage = self.stages[name]
+        payload = {
+            "name": name,
+            "params": stage.params,
+            "code": [_code_hash(m) for m in stage.code],
+            "sources": [
+                [p.name, *load._fingerprint(p)] if p.exists() else [p.name, None]
+                for p in stage.sources
+            ],
+            "deps": [self.key(d) for d in stage.deps],
+        }
+        blob = json.dumps(payload, sort_keys=True, default=str).encode()
+        return hashlib.sha256(blob).hexdigest()
+
+    def _path(self, name: str, key: str) -> Path:
+        return self.cache_dir / f"{name}-{key[:20]}"
+
+    def _stored(self, name: str, key: str) -> bool:
+        return (self._path(name, key) / "meta.json").exists()
+
+    def _save(self, name: str, key: str, value: Any) -> None:
+        path = self._path(name, key)
+        tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+        tmp.mkdir(parents=True, exist_ok=True)
+        if isinstance(value, pd.Series):
+            meta = {"kind": "series", "name": value.name}
+            value.to_frame("value").to_parquet(tmp / "data.parquet")
+        elif isinstance(value, pd.DataFrame):
+            meta = {"kind": "frame"}
+            value.to_parquet(tmp / "data.parquet")
+        else:
+            meta = {"kind": "json"}
+            (tmp / "data.json").write_text(json.dumps(value, default=_jsonable))
+        (tmp / "meta.json").write_text(json.dumps({**meta, "stage": name, "key": key}))
+        shutil.rmtree(path, ignore_errors=True)
+        try:
+            os.replace(tmp, path)
+        except OSError:
+            # another process stored the same key in the meantime
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _load(self, name: str, key: str) -> Any:
+        path = self._path(name, key)
+        meta = json.loads((path / "meta.json").read_text())
+        if meta["kind"] == "json":
+            return json.loads((path / "data.json").read_text())
+        df = pd.read_parquet(path / "data.parquet")
+        if meta["kind"] == "series":
+            return df["value"].rename(meta["name"])
+        return df
+
+    # -------------------------------------------------------------- #
+    # execution
+    # -------------------------------------------------------------- #
+    def _plan(self, targets: Sequence[str], force: bool) -> Dict[str, str]:
+        """Map every node needed for ``targets`` to 'memo', 'load' or 'run'."""
+        plan: Dict[str, str] = {}
+
+        def visit(name: str) -> None:
+            if name in plan:
+                return
+            if name not in self.stages:
+                raise KeyError(f"unknown stage {name!r}")
+            stage = self.stages[name]
+            key = self.key(name)
+            if not force and key in self._memo:
+                plan[name] = "memo"
+            elif not force and stage.persist and self._stored(name, key):
+                plan[name] = "load"
+            else:
+                plan[name] = "run"
+                for d in stage.deps:
+                    visit(d)
+
+        for t in targets:
+            visit(t)
+        return plan
+
+    def _execute(self, name: str, action: str, inputs: Dict[str, Any]) -> Any:
+        stage = self.stages[name]
+        key = self.key(name)
+        if action == "memo":
+            value = self._memo[key]
+        elif action == "load":
+            value = self._load(name, key)
+        else:
+            value = stage.func(*[inputs[d] for d in stage.deps], **stage.params)
+            if stage.persist:
+                self._save(name, key, value)
+        with self._lock:
+            self._memo[key] = value
+            self._counts["misses" if action == "run" else "hits"] += 1
+        return value
+
+    def run(self, *targets: str, force: bool = False) -> Dict[str, Any]:
+        """
+        Produce ``targets`` and return them by name.  With ``force=True``
+        every stage on the way is recomputed and its stored output replaced.
+        """
+        if not targets:
+            targets = tuple(self.stages)
+        plan = self._plan(targets, force)
+        done: Dict[str, Any] = {}
+        pending = dict(plan)
+
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            running: Dict["Future[Any]", str] = {}
+            while pending or running:
+                local = []
+                for name in list(pending):
+                    needs = self.stages[name].deps if pending[name] == "run" else ()
+                    if not all(d in done for d in needs):
+                        continue
+                    inputs = {d: done[d] for d in needs}
+                    action = pending.pop(name)
+                    if action == "run" and self.stages[name].exclusive:
+                        local.append((name, action, inputs))
+                    else:
+                        # the caller's context carries the enclosing instrument stage
+                        ctx = contextvars.copy_context()
+                        running[pool.submit(ctx.run, self._execute, name, action, inputs)] = name
+                # exclusive stages (pyplot) run one at a time on this thread
+                # while the pool works on the others
+                for name, action, inputs in local:
+                    done[name] = self._execute(name, action, inputs)
+                if running:
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        done[running.pop(fut)] = fut.result()
+
+        return {t: done[t] for t in targets}
+
+    def __getitem__(self, name: str) -> Any:
+        return self.run(name)[name]
+
+    def stats(self) -> Dict[str, int]:
+        """Stage executions ('misses') and cached results served ('hits')."""
+        with self._lock:
+            return dict(self._counts)
+
+    def clear(self) -> None:
+        """Forget in-memory results (stored outputs are kept)."""
+        with self._lock:
+            self._memo.clear()
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, pd.Timedelta)):
+        return str(value)
+    raise TypeError(f"cannot persist {type(value).__name__} as JSON")
+
+
+def backtest(
+    smoothing: float = 0.75,
+    gross: float = 1.0,
+    horizon: int = 5,
+    cache_dir: Optional[Path] = None,
+) -> Pipeline:
+    """
+    The standard research pipeline::
+
+        factor → resid → weights → pnl → metrics
+                                 ↘ turnover
+
+    ``factor`` is ``build_daily_factor()``, ``resid`` its FF neutralisation,
+    ``weights`` the smoothed long–short weights, ``pnl`` the ``horizon``-day
+    forward PnL, ``turnover`` the daily turnover and ``metrics`` the
+    ``report.calculate_metrics`` dictionary of the PnL.
+    """
+    from . import (
+        betas,
+        events,
+        factor_build,
+        neutralise,
+        portfolio,
+        report,
+        segments,
+        trading_calendar,
+    )
+
+    data = load.DATA
+    pipe = Pipeline(cache_dir)
+    pipe.add(
+        "factor",
+        factor_build.build_daily_factor,
+        sources=[load.tone_source()],
+        code=[factor_build, load, segments, trading_calendar],
+    )
+    pipe.add(
+        "resid",
+        neutralise.neutralise,
+        deps=["factor"],
+        sources=[data / "ff5_daily.parquet"],
+        code=[neutralise, betas, segments],
+    )
+    pipe.add(
+        "weights",
+        portfolio.build_weights,
+        deps=["resid"],
+        params={"gross": gross, "smoothing": smoothing},
+        code=[portfolio, events, segments],
+    )
+    pipe.add(
+        "pnl",
+        portfolio.pnl,
+        deps=["weights"],
+        params={"horizon": horizon},
+        sources=[data / "stock_prices.parquet"],
+        code=[portfolio, events, load],
+    )
+    pipe.add("turnover", portfolio.calculate_turnover, deps=["weights"], code=[portfolio])
+    pipe.add("metrics", report.calculate_metrics, deps=["pnl"], code=[report])
+    return pipe
@@ -1,193 +1,79 @@
-import warnings
-from typing import Dict, Optional, Tuple
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional, Sequence, Tuple, Union
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
+from . import analytics, instrument
 from .load import prices
 
+if TYPE_CHECKING:  # matplotlib is imported lazily by the plotting functions
+    from matplotlib.figure import Figure
 
-def make_tearsheet(factor: pd.Series, out="outputs/tearsheet.png"):
-    try:
-        import alphalens as al
-    except ImportError:
-        print(
-            "alphalens not installed; please install alpahalens-reloaded to generate tear sheet"
-        )
-        return
-
-    # Get access to the utility functions we need
-    from alphalens.utils import (
-        NonMatchingTimezoneError,
-        diff_custom_calendar_timedeltas,
-        mode,
-        timedelta_to_string,
+
+@instrument.instrumented()
+def make_tearsheet(
+    factor: pd.Series,
+    out: Optional[Union[str, Path]] = "outputs/tearsheet.png",
+    periods: Sequence[int] = (5, 10),
+    quantiles: int = 5,
+) -> pd.DataFrame:
+    """
+    Factor tear sheet: mean return by quantile, cumulative quantile returns,
+    daily rank IC and factor rank autocorrelation, saved to ``out``.
+
+    Forward returns are gathered only at the factor's (date, symbol) events
+    (see ``analytics``).  Returns the IC summary table.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg", force=True)
+    import matplotlib.pyplot as plt
+
+    # only the factor's window and universe are needed for the forward returns
+    px = prices(
+        start=factor.index.get_level_values(0).min(),
+        symbols=factor.index.get_level_values(1).unique(),
     )
+    data = analytics.factor_data(factor, px, periods, quantiles)
+    ic = analytics.rank_ic(data)
+    summary = analytics.ic_summary(ic)
+    by_date = analytics.quantile_returns_by_date(data, periods[0])
 
-    # Define our own version of compute_forward_returns that doesn't set the freq
-    def patched_compute_forward_returns(
-        factor,
-        prices,
-        periods=(1, 5, 10),
-        filter_zscore=None,
-        cumulative_returns=True,
-    ):
-        """
-        Finds the N period forward returns (as percent change) for each asset
-        provided. Modified version that doesn't set a frequency on the index.
-        """
-        factor_dateindex = factor.index.levels[0]
-        if factor_dateindex.tz != prices.index.tz:
-            raise NonMatchingTimezoneError(
-                "The timezone of 'factor' is not the "
-                "same as the timezone of 'prices'. See "
-                "the pandas methods tz_localize and "
-                "tz_convert."
-            )
-
-        # Use generic business day frequency for custom calendar calculations.
-        # We avoid attaching this frequency to the index (which would fail
-        # when the prices index has irregular spacing) but still provide a
-        # valid pandas offset object so that diff_custom_calendar_timedeltas
-        # can compute period lengths without raising.
-        from pandas.tseries.offsets import BusinessDay as _BDay
-
-        freq = _BDay()
-
-        factor_dateindex = factor_dateindex.intersection(prices.index)
-
-        if len(factor_dateindex) == 0:
-            raise ValueError(
-                "Factor and prices indices don't match: make sure "
-                "they have the same convention in terms of datetimes "
-                "and symbol-names"
-            )
-
-        # chop prices down to only the assets we care about
-        prices = prices.filter(items=factor.index.levels[1])
-
-        raw_values_dict = {}
-        column_list = []
-
-        for period in sorted(periods):
-            if cumulative_returns:
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore", FutureWarning)
-                    returns = prices.pct_change(period, fill_method=None)
-            else:
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore", FutureWarning)
-                    returns = prices.pct_change(fill_method=None)
-
-            forward_returns = returns.shift(-period).reindex(factor_dateindex)
-
-            if filter_zscore is not None:
-                mask = abs(forward_returns - forward_returns.mean()) > (
-                    filter_zscore * forward_returns.std()
-                )
-                forward_returns[mask] = np.nan
-
-            # Process period length for column name
-            days_diffs = []
-            for i in range(30):
-                if i >= len(forward_returns.index):
-                    break
-                p_idx = prices.index.get_loc(forward_returns.index[i])
-                if p_idx is None or p_idx < 0 or (p_idx + period) >= len(prices.index):
-                    continue
-                start = prices.index[p_idx]
-                end = prices.index[p_idx + period]
-                period_len = diff_custom_calendar_timedeltas(start, end, freq)
-                days_diffs.append(period_len.components.days)
-
-            if len(days_diffs) > 0:
-                delta_days = (
-                    period_len.components.days - mode(days_diffs, keepdims=True).mode[0]
-                )
-                period_len -= pd.Timedelta(days=delta_days)
-            else:
-                # Fallback if we couldn't calculate
-                period_len = pd.Timedelta(days=period)
-
-            label = timedelta_to_string(period_len)
-            column_list.append(label)
-            raw_values_dict[label] = np.concatenate(forward_returns.values)
-
-        df = pd.DataFrame.from_dict(raw_values_dict)
-        df.set_index(
-            pd.MultiIndex.from_product(
-                [factor_dateindex, prices.columns], names=["date", "asset"]
-            ),
-            inplace=True,
-        )
-        df = df.reindex(factor.index)
+    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
 
-        # Set the columns correctly
-        df = df[column_list]
+    (analytics.quantile_returns(data) * 1e4).plot.bar(ax=axes[0, 0])
+    axes[0, 0].set_title("Mean Demeaned Forward Return by Quantile (bps)")
+    axes[0, 0].set_xlabel("Factor quantile")
 
-        # **** KEY DIFFERENCE: Don't set .freq ****
-        # df.index.levels[0].freq = freq
+    analytics.cumulative_quantile_returns(by_date, periods[0]).plot(
+        ax=axes[0, 1], colormap="RdYlGn"
+    )
+    axes[0, 1].set_title(f"Cumulative Demeaned Return by Quantile ({periods[0]}D)")
 
-        df.index.set_names(["date", "asset"], inplace=True)
-        return df
+    col = ic.columns[0]
+    ic[col].plot(ax=axes[1, 0], alpha=0.3, color="steelblue", label="daily")
+    ic[col].rolling(21, min_periods=5).mean().plot(
+        ax=axes[1, 0], color="navy", label="21-day mean"
+    )
+    axes[1, 0].axhline(0, color="black", linewidth=0.8)
+    axes[1, 0].set_title(f"Rank IC ({col}), mean {summary.loc['ic_mean', col]:.4f}")
+    axes[1, 0].legend()
 
-    # Save the original function and replace it with our patched version
-    original_compute_forward_returns = al.utils.compute_forward_returns
-    al.utils.compute_forward_returns = patched_compute_forward_returns
+    analytics.factor_autocorrelation(factor).plot(ax=axes[1, 1], color="gray")
+    axes[1, 1].set_title("Factor Rank Autocorrelation (lag 1)")
 
-    try:
-        # Prepare clean factor data
-        fac = factor.copy()
-        if isinstance(fac.index, pd.MultiIndex):
-            lvl0 = fac.index.levels[0]
-            dates = pd.DatetimeIndex(lvl0.values)
-            fac.index = fac.index.set_levels([dates, fac.index.levels[1]])
-        else:
-            fac.index = pd.DatetimeIndex(fac.index.values)
-
-        # Suppress warnings
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", FutureWarning)
-            # Build clean factor+forward returns DataFrame
-            fd = al.utils.get_clean_factor_and_forward_returns(
-                fac, prices(), periods=[5, 10], quantiles=5
-            )
-
-            # Use a non-interactive backend and capture the figure instead of
-            # popping up a GUI window (which would block execution when this
-            # script is run from the CLI / CI).
-            import matplotlib
-
-            matplotlib.use("Agg", force=True)
-            import matplotlib.pyplot as _plt
-
-            _original_show = _plt.show
-
-            def _silent_show(*_args, **_kwargs):
-                # Save the latest figure to the requested output path, if any
-                if out is not None:
-                    try:
-                        _plt.gcf().savefig(out, bbox_inches="tight")
-                    except Exception:
-                        pass
-                # Always close to free memory and avoid leaks
-                _plt.close("all")
-
-            # Monkey-patch plt.show while the tear sheet is being built
-            _plt.show = _silent_show
-
-            try:
-                al.tears.create_full_tear_sheet(fd, long_short=True)
-                if out is not None:
-                    print(f"✓ tear-sheet image saved to {out}")
-            finally:
-                _plt.show = _original_show
-    finally:
-        # Restore original compute_forward_returns implementation
-        al.utils.compute_forward_returns = original_compute_forward_returns
+    for ax in axes.flat:
+        ax.grid(True, alpha=0.3)
+    plt.tight_layout()
+    if out is not None:
+        fig.savefig(out, bbox_inches="tight")
+        print(f"✓ tear-sheet image saved to {out}")
+    plt.close(fig)
+    return summary
 
 
+@instrument.instrumented()
 def calculate_metrics(
     returns: pd.Series, risk_free_rate: Optional[pd.Series] = None
 ) -> Dict[str, float]:
@@ -281,7 +167,7 @@ def plot_enhanced_tearsheet(
     benchmark_returns: pd.Series = None,
     title: str = "Enhanced Portfolio Performance",
     save_path: str = "outputs/enhanced_tearsheet.png",
-) -> plt.Figure:
+) -> "Figure":
     """
     Generate an enhanced tear sheet with multiple performance metrics.
 
@@ -300,9 +186,11 @@ def plot_enhanced_tearsheet(
 
     Returns:
     --------
-    plt.Figure
+    matplotlib.figure.Figure
         The matplotlib figure object
     """
+    import matplotlib.pyplot as plt
+
     metrics = calculate_metrics(returns)
 
     # Create figure with subplots
@@ -419,9 +307,82 @@ def plot_enhanced_tearsheet(
     return fig
 
 
+def rolling_ols(
+    y: np.ndarray,
+    X: np.ndarray,
+    window: int,
+    mode: str = "rolling",
+    halflife: Optional[float] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Slopes and R² of ``y = a + X·b + e`` over moving windows of the rows.
+
+    The first and second moments of ``[X, y]`` are averaged over each window
+    in one vectorised pass (``mode`` "rolling": the trailing ``window`` rows,
+    "expanding": every row so far, "ewm": exponentially weighted with
+    ``halflife`` rows); the centred cross-product matrices of all windows are
+    then solved as one stacked linear system and R² = b'Sxy / Syy comes from
+    the same moments.  Rows before the ``window``-th observation are NaN.
+
+    Returns:
+    --------
+    Tuple[np.ndarray, np.ndarray]
+        Slopes (rows × regressors) and R² (rows)
+    """
+    T, k = X.shape
+    if mode not in ("rolling", "expanding", "ewm"):
+        raise ValueError(f"unknown mode {mode!r}, use 'rolling', 'expanding' or 'ewm'")
+    if mode == "ewm" and halflife is None:
+        raise ValueError("mode='ewm' requires a halflife")
+
+    # centring on the sample mean leaves the slopes unchanged and keeps the
+    # moment differences below well conditioned
+    Z = np.column_stack([X, y]).astype(float)
+    Z -= Z.mean(axis=0) if T else 0.0
+    iu, ju = np.triu_indices(k + 1)
+    moments = pd.DataFrame(np.column_stack([Z, Z[:, iu] * Z[:, ju]]))
+
+    if mode == "rolling":
+        avg = moments.rolling(window, min_periods=window).mean()
+    elif mode == "expanding":
+        avg = moments.expanding(min_periods=window).mean()
+    else:
+        avg = moments.ewm(halflife=halflife, min_periods=window).mean()
+    avg = avg.to_numpy()
+
+    first, second = avg[:, : k + 1], avg[:, k + 1 :]
+    cov = np.empty((T, k + 1, k + 1))
+    for p, (i, j) in enumerate(zip(iu, ju)):
+        cov[:, i, j] = second[:, p] - first[:, i] * first[:, j]
+        cov[:, j, i] = cov[:, i, j]
+
+    beta = np.full((T, k), np.nan)
+    r2 = np.full(T, np.nan)
+    ready = ~np.isnan(first[:, 0])
+    if not ready.any():
+        return beta, r2
+    sxx = cov[ready, :k, :k]
+    sxy = cov[ready, :k, k]
+    syy = cov[ready, k, k]
+    try:
+        b = np.linalg.solve(sxx, sxy[..., None])[..., 0]
+    except np.linalg.LinAlgError:
+        # a degenerate window: the pseudo-inverse gives the minimum-norm fit
+        b = np.matmul(np.linalg.pinv(sxx, hermitian=True), sxy[..., None])[..., 0]
+    beta[ready] = b
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r2[ready] = np.where(syy > 0, np.einsum("ij,ij->i", b, sxy) / syy, np.nan)
+    return beta, r2
+
+
+@instrument.instrumented()
 def analyze_factor_exposures(
-    returns: pd.Series, factor_returns: pd.DataFrame, rolling_window: int = 60
-) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    returns: pd.Series,
+    factor_returns: pd.DataFrame,
+    rolling_window: int = 60,
+    mode: str = "rolling",
+    halflife: Optional[float] = None,
+) -> Tuple[pd.DataFrame, pd.Series]:
     """
     Analyze time-varying factor exposures using rolling regression.
 
@@ -432,36 +393,31 @@ def analyze_factor_exposures(
     factor_returns : pd.DataFrame
         Factor returns (e.g., Fama-French factors)
     rolling_window : int
-        Window size for rolling regression
+        Window size for rolling regression; with ``mode`` "expanding" or
+        "ewm" the minimum number of observations before the first fit
+    mode : str
+        "rolling" (equal weights over the window), "expanding" (all history)
+        or "ewm" (exponentially decaying weights, see ``halflife``)
+    halflife : float, optional
+        Half-life in days of the "ewm" weights
 
     Returns:
     --------
     Tuple[pd.DataFrame, pd.DataFrame]
-        Factor betas and R-squared over time
+        Factor betas and R-squared over time (float64)
     """
-    from sklearn.linear_model import LinearRegression
-
     # Align data
     aligned_data = pd.concat([returns, factor_returns], axis=1).dropna()
 
-    # Initialize results
-    dates = aligned_data.index[rolling_window - 1 :]
-    factor_names = factor_returns.columns
-    betas = pd.DataFrame(index=dates, columns=factor_names)
-    r2 = pd.Series(index=dates)
-
-    # Rolling regression
-    for i in range(rolling_window, len(aligned_data) + 1):
-        window = aligned_data.iloc[i - rolling_window : i]
-
-        y = window.iloc[:, 0].values
-        X = window.iloc[:, 1:].values
-
-        model = LinearRegression().fit(X, y)
-        betas.iloc[i - rolling_window] = model.coef_
-        r2.iloc[i - rolling_window] = model.score(X, y)
+    y = aligned_data.iloc[:, 0].to_numpy(dtype=float)
+    X = aligned_data.iloc[:, 1:].to_numpy(dtype=float)
+    beta, r2 = rolling_ols(y, X, rolling_window, mode, halflife)
 
-    return betas, r2
+    # first full window onwards
+    lo = max(rolling_window - 1, 0)
+    dates = aligned_data.index[lo:]
+    betas = pd.DataFrame(beta[lo:], index=dates, columns=factor_returns.columns)
+    return betas, pd.Series(r2[lo:], index=dates)
 
 
 def calculate_conditional_metrics(
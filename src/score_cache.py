@@ -0,0 +1,203 @@
+"""Persistent cache of per-turn sentiment scores keyed by content hash.
+
+A turn's key is a 64-bit BLAKE2b digest of the scorer's ``name:version`` and
+the normalised turn text (``normalise_text``), so a re-delivered transcript,
+or the same boilerplate sentence in another call, is looked up instead of
+scored, and a new scorer version never sees stale scores.
+
+The cache is a directory holding
+
+* ``keys.u64``   – append-only raw uint64 keys, one per record
+* ``scores.f64`` – append-only raw float64 scores, in the same order
+* ``index.npy``  – compact index: (key, row) pairs sorted by key
+
+Records are only ever appended (scores before keys, so a torn write leaves a
+key-less score that is ignored, and is cut off before the next append).  The index covers the records present when
+it was last ``compact``-ed and is memory-mapped; records appended since are
+kept in a small sorted in-memory tail.  A batch lookup is one
+``np.searchsorted`` into each, so readers in any number of processes share
+the index and the scores through the page cache.
+"""
+import hashlib
+import os
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+
+_KEYS = "keys.u64"
+_SCORES = "scores.f64"
+_INDEX = "index.npy"
+_INDEX_DTYPE = np.dtype([("key", "<u8"), ("row", "<i8")])
+
+
+def normalise_text(text: Optional[str]) -> str:
+    """NFKC-normalised text with runs of whitespace collapsed ("" for None)."""
+    if not isinstance(text, str):
+        return ""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def text_keys(texts: Iterable[str], scorer_key: str) -> np.ndarray:
+    """Cache keys (uint64) of already normalised texts under one scorer."""
+    prefix = hashlib.blake2b(scorer_key.encode(), digest_size=8).digest()
+    return np.fromiter(
+        (
+            int.from_bytes(
+                hashlib.blake2b(t.encode(), digest_size=8, key=prefix).digest(), "little"
+            )
+            for t in texts
+        ),
+        dtype=np.uint64,
+    )
+
+
+def _search(sorted_keys: np.ndarray, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Positions of ``keys`` in ``sorted_keys`` and whether each is present."""
+    if len(sorted_keys) == 0:
+        return np.zeros(len(keys), dtype=np.int64), np.zeros(len(keys), dtype=bool)
+    pos = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    return pos, sorted_keys[pos] == keys
+
+
+class ScoreCache:
+    """
+    Append-only on-disk map from turn keys to scores.
+
+    Parameters:
+    -----------
+    path : Path
+        Cache directory (created unless ``readonly``)
+    readonly : bool
+        Open for lookups only (worker processes)
+    """
+
+    def __init__(self, path: Union[str, Path], readonly: bool = False) -> None:
+        self.path = Path(path)
+        self.readonly = readonly
+        if not readonly:
+            self.path.mkdir(parents=True, exist_ok=True)
+        self._hits = 0
+        self._misses = 0
+        self._open()
+
+    def _records(self) -> int:
+        def size(name: str) -> int:
+            f = self.path / name
+            return f.stat().st_size // 8 if f.exists() else 0
+
+        return min(size(_KEYS), size(_SCORES))
+
+    def _trim(self) -> int:
+        """Truncate both files to their common record count (after a torn write)."""
+        n = self._records()
+        for name in (_KEYS, _SCORES):
+            f = self.path / name
+            if f.exists() and f.stat().st_size != n * 8:
+                os.truncate(f, n * 8)
+        return n
+
+    def _open(self) -> None:
+        n = self._records() if self.readonly else self._trim()
+        self._n = n
+        self._scores = (
+            np.memmap(self.path / _SCORES, dtype="<f8", mode="r", shape=(n,))
+            if n
+            else np.empty(0)
+        )
+        index = self.path / _INDEX
+        self._index = (
+            np.load(index, mmap_mode="r") if index.exists() else np.empty(0, _INDEX_DTYPE)
+        )
+        # records appended after the last compaction
+        indexed = len(self._index)
+        tail = np.empty(0, dtype="<u8")
+        if n > indexed:
+            keys = np.memmap(self.path / _KEYS, dtype="<u8", mode="r", shape=(n,))
+            tail = np.array(keys[indexed:])
+        order = np.argsort(tail, kind="stable")
+        self._tail_keys = tail[order]
+        self._tail_scores = np.array(self._scores[indexed:])[order] if n else np.empty(0)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _find(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        keys = np.asarray(keys, dtype=np.uint64)
+        scores = np.full(len(keys), np.nan)
+        pos, found = _search(self._index["key"], keys)
+        scores[found] = self._scores[self._index["row"][pos[found]]]
+        pos, in_tail = _search(self._tail_keys, keys)
+        scores[in_tail] = self._tail_scores[pos[in_tail]]
+        return scores, found | in_tail
+
+    def lookup(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Cached scores of ``keys`` (NaN where absent) and the found mask."""
+        scores, found = self._find(keys)
+        hits = int(found.sum())
+        self._hits += hits
+        self._misses += len(found) - hits
+        return scores, found
+
+    def append(self, keys: np.ndarray, scores: np.ndarray) -> int:
+        """Add the records whose keys are not cached yet; returns how many."""
+        if self.readonly:
+            raise PermissionError(f"score cache at {self.path} is read-only")
+        keys = np.asarray(keys, dtype="<u8")
+        scores = np.asarray(scores, dtype="<f8")
+        keys, first = np.unique(keys, return_index=True)
+        scores = scores[first]
+        new = ~self._find(keys)[1]
+        keys, scores = keys[new], scores[new]
+        if len(keys) == 0:
+            return 0
+        # keep the two files in step, so the new keys pair with their scores
+        self._trim()
+        with open(self.path / _SCORES, "ab") as f:
+            f.write(scores.tobytes())
+        with open(self.path / _KEYS, "ab") as f:
+            f.write(keys.tobytes())
+
+        tail_keys = np.concatenate([self._tail_keys, keys])
+        order = np.argsort(tail_keys, kind="stable")
+        self._tail_keys = tail_keys[order]
+        self._tail_scores = np.concatenate([self._tail_scores, scores])[order]
+        self._n += len(keys)
+        return len(keys)
+
+    def compact(self) -> None:
+        """Rewrite the index over all records (atomically) and reopen."""
+        if self.readonly:
+            raise PermissionError(f"score cache at {self.path} is read-only")
+        n = self._records()
+        keys = np.fromfile(self.path / _KEYS, dtype="<u8", count=n) if n else np.empty(0)
+        order = np.argsort(keys, kind="stable")
+        index = np.empty(n, dtype=_INDEX_DTYPE)
+        index["key"] = keys[order]
+        index["row"] = order
+        tmp = self.path / f"index.tmp-{os.getpid()}.npy"
+        np.save(tmp, index)
+        os.replace(tmp, self.path / _INDEX)
+        self._open()
+
+    def record(self, hits: int, misses: int) -> None:
+        """Add lookups made elsewhere (e.g. in worker processes) to the counters."""
+        self._hits += hits
+        self._misses += misses
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters, the number of records and bytes on disk."""
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "entries": self._n,
+            "indexed": len(self._index),
+            "bytes": int(
+                sum(
+                    (self.path / f).stat().st_size
+                    for f in (_KEYS, _SCORES, _INDEX)
+                    if (self.path / f).exists()
+                )
+            ),
+        }
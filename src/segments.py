@@ -0,0 +1,165 @@
+"""Vectorised per-segment statistics for date-sorted cross-sectional panels.
+
+A panel is a flat value array sorted by date plus CSR ``offsets``: segment
+``i`` (one trade date) is ``values[offsets[i]:offsets[i + 1]]``.  Every
+operation is a single sort and/or ``ufunc.reduceat`` pass with no Python-level
+work per segment.  NaN values are ignored by the reductions and stay NaN in
+the element-wise transforms, as with the pandas groupby equivalents.
+"""
+from typing import Tuple
+
+import numpy as np
+
+
+def sort_by(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stable sort order that groups equal ``keys`` together, and the CSR
+    offsets of the groups in that order.
+    """
+    keys = np.asarray(keys)
+    order = np.argsort(keys, kind="stable")
+    return order, offsets_of(keys[order])
+
+
+def offsets_of(sorted_keys: np.ndarray) -> np.ndarray:
+    """CSR offsets of the runs of equal values in already sorted keys."""
+    sorted_keys = np.asarray(sorted_keys)
+    n = len(sorted_keys)
+    if n == 0:
+        return np.zeros(1, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    return np.r_[starts, n].astype(np.int64)
+
+
+def segment_ids(offsets: np.ndarray) -> np.ndarray:
+    """Segment number of every element."""
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+
+def broadcast(per_segment: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Repeat one value per segment over the segment's elements."""
+    return np.repeat(per_segment, np.diff(offsets), axis=0)
+
+
+def _reduce(
+    ufunc: np.ufunc, values: np.ndarray, offsets: np.ndarray, empty: float = 0.0
+) -> np.ndarray:
+    """``ufunc.reduceat`` that also copes with empty segments."""
+    sizes = np.diff(offsets)
+    out = np.full((len(sizes),) + values.shape[1:], empty, dtype=float)
+    nonempty = sizes > 0
+    if nonempty.any():
+        out[nonempty] = ufunc.reduceat(values, offsets[:-1][nonempty], axis=0)
+    return out
+
+
+def count(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Non-NaN observations per segment."""
+    return _reduce(np.add, (~np.isnan(values)).astype(float), offsets)
+
+
+def total(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """NaN-skipping sum per segment."""
+    return _reduce(np.add, np.where(np.isnan(values), 0.0, values), offsets)
+
+
+def minimum(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """NaN-skipping minimum per segment (NaN for segments without data)."""
+    out = _reduce(np.minimum, np.where(np.isnan(values), np.inf, values), offsets, np.inf)
+    return np.where(np.isposinf(out) & (count(values, offsets) == 0), np.nan, out)
+
+
+def maximum(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """NaN-skipping maximum per segment (NaN for segments without data)."""
+    return -minimum(-values, offsets)
+
+
+def mean(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """NaN-skipping mean per segment (NaN for segments without data)."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return total(values, offsets) / count(values, offsets)
+
+
+def demean(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Subtract each segment's mean."""
+    return values - broadcast(mean(values, offsets), offsets)
+
+
+def std(values: np.ndarray, offsets: np.ndarray, ddof: int = 0) -> np.ndarray:
+    """NaN-skipping standard deviation per segment."""
+    dev = demean(values, offsets)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.sqrt(total(dev * dev, offsets) / (count(values, offsets) - ddof))
+
+
+def zscore(values: np.ndarray, offsets: np.ndarray, ddof: int = 0) -> np.ndarray:
+    """Cross-sectional z-score ``(x - mean) / std`` within each segment."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return demean(values, offsets) / broadcast(std(values, offsets, ddof), offsets)
+
+
+def _sorted_within(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Order that sorts values inside each segment (NaN last)."""
+    return np.lexsort((values, segment_ids(offsets)))
+
+
+def rank(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """1-based ranks within each segment, ties get their average rank."""
+    n = len(values)
+    ranks = np.full(n, np.nan)
+    if n == 0:
+        return ranks
+    order = _sorted_within(values, offsets)
+    v = values[order]
+    seg_start = broadcast(offsets[:-1], offsets)
+    pos = (np.arange(n) - seg_start + 1).astype(float)
+
+    # tie groups: runs of equal values inside one segment
+    new_seg = np.zeros(n, dtype=bool)
+    new_seg[offsets[:-1][np.diff(offsets) > 0]] = True
+    new_grp = new_seg | np.r_[True, v[1:] != v[:-1]]
+    gstart = np.flatnonzero(new_grp)
+    gcount = np.diff(np.append(gstart, n))
+    avg = np.add.reduceat(pos, gstart) / gcount
+
+    ranks[order] = np.repeat(avg, gcount)
+    ranks[np.isnan(values)] = np.nan
+    return ranks
+
+
+def quantile(values: np.ndarray, offsets: np.ndarray, q: float) -> np.ndarray:
+    """Per-segment ``q`` quantile with linear interpolation, skipping NaN."""
+    order = _sorted_within(values, offsets)
+    v = values[order]
+    n = count(values, offsets)
+    pos = q * np.maximum(n - 1, 0)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, np.maximum(n - 1, 0).astype(np.int64))
+    base = offsets[:-1]
+    out = np.full(len(n), np.nan)
+    ok = n > 0
+    a = v[(base + lo)[ok]]
+    b = v[(base + hi)[ok]]
+    out[ok] = a + (b - a) * (pos - lo)[ok]
+    return out
+
+
+def winsorise(
+    values: np.ndarray, offsets: np.ndarray, lower: float = 0.01, upper: float = 0.99
+) -> np.ndarray:
+    """Clip each segment to its ``lower`` / ``upper`` quantiles."""
+    lo = broadcast(quantile(values, offsets, lower), offsets)
+    hi = broadcast(quantile(values, offsets, upper), offsets)
+    return np.where(np.isnan(values), np.nan, np.clip(values, lo, hi))
+
+
+def quantile_bucket(values: np.ndarray, offsets: np.ndarray, q: int = 5) -> np.ndarray:
+    """
+    Bucket 1..q of each value by its percentile rank inside the segment
+    (``ceil(q * rank / n)``); NaN values get bucket 0.
+    """
+    r = rank(values, offsets)
+    n = broadcast(count(values, offsets), offsets)
+    with np.errstate(invalid="ignore"):
+        b = np.ceil(q * r / n)
+    return np.where(np.isnan(b), 0, b).astype(np.int64)
@@ -0,0 +1,402 @@
+"""Offline, batched sentiment scoring of transcript speaker turns.
+
+Transcript snapshots are stored locally as parquet or JSON-lines files of
+speaker turns (``dispersion.TURN_COLUMNS`` with a ``text`` field in place of
+``score``).  ``score_transcripts`` splits them into batches of about
+``batch_turns`` turns, scores each batch in a process pool and writes one
+turn-score parquet file per batch — the input of ``dispersion``.
+
+A scorer is any ``Scorer``: a ``name``, a ``version`` that changes whenever
+its output may change, and ``score(texts)`` returning one value in [-1, 1]
+per text (NaN for texts without tokens, which do not count as turns).  Two
+are provided, both vectorised over the whole batch — the texts are tokenised
+once into one flat token array with CSR offsets and the per-turn sums are
+``segments`` reductions:
+
+* ``LexiconScorer`` — summed word valences of a lexicon (by default NLTK's
+  VADER lexicon, read from the local ``nltk_data``), normalised as VADER does
+  with ``s / sqrt(s² + 15)``;
+* ``HashedLinearScorer`` — a linear model on l2-normalised counts of hashed
+  tokens (CRC32, so stable across processes and runs), squashed by ``tanh``.
+
+    python -m src.sentiment TRANSCRIPTS [...] --out DIR [--scorer lexicon] [--jobs N]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from . import instrument, segments
+from .dispersion import CALL_COLUMNS, TURN_COLUMNS, _chunks, _read_chunk, turn_files
+from .score_cache import ScoreCache, normalise_text, text_keys
+
+TEXT_COLUMN = "text"
+_TOKEN = re.compile(r"[a-z][a-z']*")
+VADER_ALPHA = 15.0
+
+
+def tokenize(texts: Sequence[Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lower-cased word tokens of all ``texts`` as one flat object array plus
+    CSR offsets: the tokens of text ``i`` are ``tokens[offsets[i]:offsets[i + 1]]``.
+    """
+    per_text = [_TOKEN.findall(t.lower()) if isinstance(t, str) else [] for t in texts]
+    lengths = np.fromiter(map(len, per_text), dtype=np.int64, count=len(per_text))
+    offsets = np.zeros(len(per_text) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    tokens = np.empty(offsets[-1], dtype=object)
+    tokens[:] = [tok for words in per_text for tok in words]
+    return tokens, offsets
+
+
+class Scorer(ABC):
+    """Interface of a deterministic turn scorer."""
+
+    name = "scorer"
+    version = "0"
+
+    @property
+    def key(self) -> str:
+        """``name:version``, identifying the scores this scorer produces."""
+        return f"{self.name}:{self.version}"
+
+    @abstractmethod
+    def score(self, texts: Sequence[Optional[str]]) -> np.ndarray:
+        """One score in [-1, 1] per text, NaN for texts without tokens."""
+
+
+class LexiconScorer(Scorer):
+    """
+    Normalised sum of word valences.
+
+    Parameters:
+    -----------
+    lexicon : mapping, optional
+        Word → valence; defaults to the VADER lexicon of the locally
+        installed NLTK data (``nltk.download("vader_lexicon")`` once)
+    alpha : float
+        Normalisation constant of ``s / sqrt(s² + alpha)``
+    """
+
+    name = "lexicon"
+
+    def __init__(
+        self, lexicon: Optional[Mapping[str, float]] = None, alpha: float = VADER_ALPHA
+    ) -> None:
+        if lexicon is None:
+            from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+            lexicon = SentimentIntensityAnalyzer().lexicon
+        items = sorted({str(w).lower(): float(v) for w, v in lexicon.items()}.items())
+        self.words = pd.Index([w for w, _ in items])
+        self.valence = np.array([v for _, v in items], dtype=float)
+        self.alpha = float(alpha)
+        digest = hashlib.blake2b(
+            json.dumps([items, self.alpha]).encode(), digest_size=8
+        ).hexdigest()
+        self.version = f"1-{digest}"
+
+    def score(self, texts: Sequence[Optional[str]]) -> np.ndarray:
+        tokens, offsets = tokenize(texts)
+        idx = self.words.get_indexer(tokens)
+        values = np.where(idx >= 0, self.valence[idx], 0.0)
+        s = segments.total(values, offsets)
+        out = s / np.sqrt(s * s + self.alpha)
+        out[np.diff(offsets) == 0] = np.nan
+        return out
+
+
+def hash_tokens(tokens: np.ndarray, n_features: int) -> np.ndarray:
+    """CRC32 feature index of every token (each distinct token hashed once)."""
+    codes, uniques = pd.factorize(tokens)
+    hashed = np.fromiter(
+        (zlib.crc32(t.encode()) for t in uniques), dtype=np.int64, count=len(uniques)
+    )
+    return (hashed % n_features)[codes]
+
+
+class HashedLinearScorer(Scorer):
+    """
+    ``tanh(bias + w · x)`` on l2-normalised hashed token counts ``x``.
+
+    Parameters:
+    -----------
+    weights : np.ndarray
+        One coefficient per hashed feature (the length sets the feature space)
+    bias : float
+        Intercept
+    """
+
+    name = "hashed_linear"
+
+    def __init__(self, weights: np.ndarray, bias: float = 0.0) -> None:
+        self.weights = np.ascontiguousarray(weights, dtype=float)
+        self.bias = float(bias)
+        h = hashlib.blake2b(self.weights.tobytes(), digest_size=8)
+        h.update(np.float64(self.bias).tobytes())
+        self.version = f"1-{h.hexdigest()}"
+
+    @property
+    def n_features(self) -> int:
+        return len(self.weights)
+
+    def save(self, path: Union[str, Path]) -> None:
+        np.savez(path, weights=self.weights, bias=self.bias)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "HashedLinearScorer":
+        with np.load(path) as f:
+            return cls(f["weights"], float(f["bias"]))
+
+    def score(self, texts: Sequence[Optional[str]]) -> np.ndarray:
+        tokens, offsets = tokenize(texts)
+        n = self.n_features
+        # sparse counts: one entry per distinct (turn, feature) pair
+        key = segments.segment_ids(offsets) * n + hash_tokens(tokens, n)
+        key, counts = np.unique(key, return_counts=True)
+        turn, feature = np.divmod(key, n)
+        m = len(texts)
+        norm = np.sqrt(np.bincount(turn, counts.astype(float) ** 2, minlength=m))
+        dot = np.bincount(turn, counts * self.weights[feature], minlength=m)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.tanh(self.bias + dot / norm)
+
+
+def make_scorer(spec: str) -> Scorer:
+    """Scorer from a CLI spec: ``lexicon`` or ``hashed:path/to/model.npz``."""
+    kind, _, arg = spec.partition(":")
+    if kind == "lexicon":
+        return LexiconScorer()
+    if kind == "hashed" and arg:
+        return HashedLinearScorer.load(arg)
+    raise ValueError(f"unknown scorer {spec!r}, use 'lexicon' or 'hashed:MODEL.npz'")
+
+
+# scorer and read-only score cache of the current worker process
+_WORKER: Dict[str, Any] = {}
+
+
+def _init_worker(scorer: Scorer, cache_path: Optional[str] = None) -> None:
+    _WORKER["scorer"] = scorer
+    _WORKER["cache"] = ScoreCache(cache_path, readonly=True) if cache_path else None
+
+
+def _scored(
+    turns: pd.DataFrame, scorer: Scorer, cache: Optional[ScoreCache]
+) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """
+    Turn records with ``score`` in place of ``text``, and the keys and scores
+    of the distinct texts missing from ``cache``.
+    """
+    if TEXT_COLUMN not in turns.columns:
+        raise KeyError(f"transcript turns lack a {TEXT_COLUMN!r} column")
+    texts = [normalise_text(t) for t in turns[TEXT_COLUMN].tolist()]
+    if cache is None:
+        scores = scorer.score(texts)
+        new_keys, new_scores = np.empty(0, dtype=np.uint64), np.empty(0)
+    else:
+        keys = text_keys(texts, scorer.key)
+        scores, found = cache.lookup(keys)
+        miss = np.flatnonzero(~found)
+        # each distinct unseen text is scored once
+        new_keys, first, inverse = np.unique(
+            keys[miss], return_index=True, return_inverse=True
+        )
+        new_scores = np.empty(0)
+        if len(miss):
+            new_scores = scorer.score([texts[i] for i in miss[first]])
+            scores[miss] = new_scores[inverse]
+    keep = [c for c in dict.fromkeys(TURN_COLUMNS + CALL_COLUMNS) if c in turns.columns]
+    frame = turns[[c for c in keep if c != "score"]].assign(score=scores)
+    return frame, new_keys, new_scores
+
+
+def score_frame(
+    turns: pd.DataFrame, scorer: Scorer, cache: Optional[ScoreCache] = None
+) -> pd.DataFrame:
+    """
+    Replace the ``text`` column of turn records by the scorer's ``score``,
+    reusing and extending ``cache`` when given.
+    """
+    frame, keys, scores = _scored(turns, scorer, cache)
+    if cache is not None and not cache.readonly:
+        cache.append(keys, scores)
+    return frame
+
+
+def _score_chunk(
+    path: str, kind: str, groups: Optional[List[int]], batch_turns: int, out: str
+) -> Dict[str, Any]:
+    """
+    Score one work unit into ``out``-NNNN.parquet files.  Returns the turn,
+    scored and cache hit / miss counts and the newly scored cache records.
+    """
+    scorer, cache = _WORKER["scorer"], _WORKER["cache"]
+    columns = [*TURN_COLUMNS, *CALL_COLUMNS, TEXT_COLUMN]
+    res: Dict[str, Any] = {"turns": 0, "scored": 0, "hits": 0, "misses": 0}
+    keys, scores = [], []
+    for j, batch in enumerate(_read_chunk(path, kind, groups, batch_turns, columns)):
+        before = cache.stats() if cache is not None else {}
+        frame, new_keys, new_scores = _scored(batch, scorer, cache)
+        frame.to_parquet(f"{out}-{j:04d}.parquet", index=False)
+        res["turns"] += len(frame)
+        res["scored"] += int(frame["score"].notna().sum())
+        if cache is not None:
+            after = cache.stats()
+            res["hits"] += after["hits"] - before["hits"]
+            res["misses"] += after["misses"] - before["misses"]
+        keys.append(new_keys)
+        scores.append(new_scores)
+    res["keys"] = np.concatenate(keys) if keys else np.empty(0, dtype=np.uint64)
+    res["scores"] = np.concatenate(scores) if scores else np.empty(0)
+    return res
+
+
+def _score_chunk_star(args: Tuple) -> Dict[str, Any]:
+    return _score_chunk(*args)
+
+
+def _collect(
+    results: Iterable[Dict[str, Any]], cache: Optional[ScoreCache]
+) -> Dict[str, int]:
+    """Sum the per-chunk counts, appending new scores to the cache as they arrive."""
+    totals = {"turns": 0, "scored": 0, "hits": 0, "misses": 0}
+    for res in results:
+        for k in totals:
+            totals[k] += res[k]
+        if cache is not None:
+            cache.append(res["keys"], res["scores"])
+            cache.record(res["hits"], res["misses"])
+    return totals
+
+
+@instrument.instrumented("sentiment_scoring")
+def score_transcripts(
+    sources: Union[str, Path, Iterable[Union[str, Path]]],
+    out_dir: Union[str, Path],
+    scorer: Optional[Scorer] = None,
+    batch_turns: int = 50_000,
+    n_jobs: Optional[int] = None,
+    cache: Optional[Union[str, Path, ScoreCache]] = None,
+) -> Dict[str, Any]:
+    """
+    Score every speaker turn of the transcript files under ``sources``.
+
+    Parameters:
+    -----------
+    sources : path or iterable of paths
+        Transcript turn files (parquet / JSON-lines) or directories of them
+    out_dir : Path
+        Dedicated directory receiving the turn-score parquet files (one per
+        batch, named after the source file); pass it to
+        ``dispersion.compute_dispersion``.  It is replaced as a whole once
+        every batch is written, so files of an earlier run do not survive
+    scorer : Scorer, optional
+        Defaults to ``LexiconScorer()``
+    batch_turns : int
+        Approximate turns per scored batch
+    n_jobs : int, optional
+        Worker processes (default: all CPUs); 1 runs in the calling process
+    cache : Path or ScoreCache, optional
+        Score cache (e.g. ``load.CACHE_DIR / "scores"``): only turns whose
+        normalised text this scorer version has never scored are scored,
+        and their scores are added to the cache
+
+    Returns:
+    --------
+    Dict[str, Any]
+        ``scorer`` key, ``batches``, ``turns``, ``scored`` (turns with a
+        score), ``seconds``, ``turns_per_sec`` and, with a cache,
+        ``cache_hits`` / ``cache_misses`` (turns looked up / scored afresh)
+    """
+    scorer = scorer or LexiconScorer()
+    out_dir = Path(out_dir)
+    # the run is written to a sibling directory that then replaces out_dir,
+    # so batches of an earlier run (other sources or batch sizes) never mix in
+    staging = out_dir.with_name(f".{out_dir.name}.tmp-{os.getpid()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    tasks = [
+        (path, kind, groups, batch_turns, str(staging / f"{Path(path).stem}-{i:05d}"))
+        for i, (path, kind, groups) in enumerate(
+            _chunks(turn_files(sources, exclude=[out_dir]), batch_turns)
+        )
+    ]
+    staging.mkdir(parents=True)
+    n_jobs = max(min(n_jobs or os.cpu_count() or 1, len(tasks)), 1)
+    if cache is not None and not isinstance(cache, ScoreCache):
+        cache = ScoreCache(cache)
+    # workers look scores up in the cache as it was at the start; this
+    # process is its only writer
+    initargs = (scorer, str(cache.path) if cache is not None else None)
+
+    t0 = time.perf_counter()
+    try:
+        if n_jobs <= 1:
+            _init_worker(*initargs)
+            try:
+                totals = _collect(map(_score_chunk_star, tasks), cache)
+            finally:
+                _WORKER.clear()
+        else:
+            with ProcessPoolExecutor(
+                n_jobs, initializer=_init_worker, initargs=initargs
+            ) as pool:
+                totals = _collect(pool.map(_score_chunk_star, tasks), cache)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    os.replace(staging, out_dir)
+    if cache is not None:
+        cache.compact()
+    seconds = time.perf_counter() - t0
+
+    stats = {
+        "scorer": scorer.key,
+        "batches": len(tasks),
+        "turns": totals["turns"],
+        "scored": totals["scored"],
+        "seconds": seconds,
+        "turns_per_sec": totals["turns"] / seconds if seconds > 0 else float("nan"),
+    }
+    if cache is not None:
+        stats.update(cache_hits=totals["hits"], cache_misses=totals["misses"])
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("transcripts", nargs="+", help="transcript files or directories")
+    parser.add_argument("--out", required=True, help="directory for the turn scores")
+    parser.add_argument("--scorer", default="lexicon", help="lexicon or hashed:MODEL.npz")
+    parser.add_argument("--batch-turns", type=int, default=50_000)
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--cache", default=None, help="score cache directory")
+    args = parser.parse_args()
+    stats = score_transcripts(
+        args.transcripts,
+        args.out,
+        make_scorer(args.scorer),
+        args.batch_turns,
+        args.jobs,
+        args.cache,
+    )
+    print(
+        f"{stats['turns']:,} turns in {stats['batches']} batches "
+        f"({stats['scorer']}): {stats['seconds']:.1f}s, "
+        f"{stats['turns_per_sec']:,.0f} turns/sec"
+    )
+    if args.cache:
+        print(f"cache: {stats['cache_hits']:,} hits, {stats['cache_misses']:,} misses")
@@ -0,0 +1,161 @@
+"""Parallel parameter sweeps over the portfolio construction choices.
+
+The expensive, parameter-free part of a backtest — factor build,
+neutralisation, per-date ranking and the log-price matrix — is computed once
+and written to temporary ``matrix_store`` directories.  Worker processes map
+those stores read-only, so every process shares one physical copy of the
+inputs, and each (smoothing, exponent, gross) combination only pays for
+shaping, smoothing and the PnL of all requested horizons.
+"""
+import itertools
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import load, matrix_store
+from .factor_build import build_daily_factor
+from .neutralise import neutralise
+from .portfolio import centred_ranks, horizon_pnl, shape_ranks, smooth_weights
+
+COLUMNS = [
+    "smoothing",
+    "exponent",
+    "gross",
+    "horizon",
+    "ir",
+    "ann_return",
+    "max_drawdown",
+    "turnover",
+]
+
+# inputs of the current process: centred ranks and log prices
+_INPUTS: Dict[str, pd.DataFrame] = {}
+
+
+def _init_worker(ranks_path: str, logp_path: str) -> None:
+    _INPUTS["ranks"] = matrix_store.open_matrix(ranks_path)
+    _INPUTS["logp"] = matrix_store.open_matrix(logp_path)
+
+
+def _metrics(returns: np.ndarray) -> Tuple[float, float, float]:
+    """IR, annualised return and max drawdown as ``report.calculate_metrics``."""
+    std = returns.std(ddof=1)
+    ir = returns.mean() / std * np.sqrt(252) if std > 0 else np.nan
+    ann_return = np.prod(1 + returns) ** (252 / len(returns)) - 1
+    cum = np.cumprod(1 + returns)
+    max_drawdown = (cum / np.maximum.accumulate(cum) - 1).min()
+    return ir, ann_return, max_drawdown
+
+
+def _evaluate(
+    smoothing: float, exponent: float, gross: float, horizons: Tuple[int, ...]
+) -> List[Tuple]:
+    """Score one (smoothing, exponent, gross) setting at every horizon."""
+    ranks, logp = _INPUTS["ranks"], _INPUTS["logp"]
+
+    target = shape_ranks(ranks.to_numpy(), gross, exponent)
+    weights = smooth_weights(target, gross, smoothing) if smoothing else target
+    turnover = np.r_[0.0, np.nansum(np.abs(np.diff(weights, axis=0)), axis=1) / 2]
+
+    # yesterday's weights on the price calendar (as ``portfolio.pnl``)
+    rows = logp.index.get_indexer(ranks.index)
+    cols = ranks.columns.get_indexer(logp.columns)
+    aligned = np.zeros(logp.shape)
+    later = np.flatnonzero(rows[1:] >= 0) + 1
+    aligned[rows[later]] = weights[later - 1][:, cols]
+    aligned[np.isnan(aligned)] = 0.0
+
+    pnl = horizon_pnl(aligned, logp.to_numpy(), horizons)
+    return [
+        (smoothing, exponent, gross, h, *_metrics(pnl[:, j]), turnover.mean())
+        for j, h in enumerate(horizons)
+    ]
+
+
+def _evaluate_star(args: Tuple) -> List[Tuple]:
+    return _evaluate(*args)
+
+
+def run_sweep(
+    factor: Optional[pd.Series] = None,
+    smoothing: Iterable[float] = (0.0, 0.25, 0.5, 0.75, 0.9),
+    exponent: Iterable[float] = (0.5, 0.75, 1.0, 1.25, 1.5),
+    gross: Iterable[float] = (1.0,),
+    horizon: Sequence[int] = (1, 5, 10, 20),
+    n_jobs: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Backtest every combination of the parameter grids.
+
+    Parameters:
+    -----------
+    factor : pd.Series, optional
+        Signal indexed by (date, symbol); defaults to the neutralised
+        earnings-call factor
+    smoothing, exponent, gross : iterable of float
+        Values passed to ``portfolio.build_weights``
+    horizon : sequence of int
+        Forward-return horizons in trading days, as in ``portfolio.pnl``
+    n_jobs : int, optional
+        Worker processes (default: all CPUs); 1 runs in the calling process
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per combination with the ``COLUMNS`` fields: annualised IR,
+        annualised return, max drawdown and mean daily turnover
+    """
+    if factor is None:
+        factor = neutralise(build_daily_factor())
+
+    horizons = tuple(int(h) for h in horizon)
+    if any(h < 1 for h in horizons):
+        raise ValueError("horizons must be positive")
+    for s in smoothing:
+        if not (0 <= s <= 1):
+            raise ValueError("Smoothing parameter must be between 0 and 1")
+
+    ranks = centred_ranks(factor)
+    px = load.prices(symbols=ranks.columns)
+    common = ranks.columns.intersection(px.columns)
+    if common.empty:
+        raise ValueError("weights vs price columns have no overlap")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        logp = np.log(px[common].astype(float))
+
+    tasks = [
+        (float(s), float(e), float(g), horizons)
+        for s, e, g in itertools.product(smoothing, exponent, gross)
+    ]
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(tasks))
+
+    if n_jobs <= 1:
+        _INPUTS.update(ranks=ranks, logp=logp)
+        try:
+            rows = [r for t in tasks for r in _evaluate(*t)]
+        finally:
+            _INPUTS.clear()
+    else:
+        with tempfile.TemporaryDirectory(prefix="sweep-") as tmp:
+            paths = (
+                str(matrix_store.write_matrix(ranks, Path(tmp) / "ranks")),
+                str(matrix_store.write_matrix(logp, Path(tmp) / "logp")),
+            )
+            with ProcessPoolExecutor(
+                n_jobs, initializer=_init_worker, initargs=paths
+            ) as pool:
+                rows = [r for res in pool.map(_evaluate_star, tasks) for r in res]
+
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+if __name__ == "__main__":
+    os.makedirs("outputs", exist_ok=True)
+    results = run_sweep()
+    results.to_csv("outputs/parameter_sweep.csv", index=False)
+    print(results.sort_values("ir", ascending=False).head(10).to_string(index=False))
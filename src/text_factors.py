@@ -0,0 +1,311 @@
+"""Call-level tone statistics and a multi-feature factor panel in one pass.
+
+``build_text_factors`` streams the turn-score files once (through
+``dispersion.stream_calls``) and keeps, per call, a row of mergeable
+accumulators: the count, mean and second / third central moment sums of the
+scores, their minimum and maximum, score sums by speaker role, and the
+sums before and after the start of the Q&A.  Any subset of ``FEATURES`` is
+derived from them:
+
+``tone_dispersion``   population variance of the turn scores (as ``dispersion``)
+``tone_mean``         mean turn score
+``tone_min`` / ``tone_max``
+``tone_skew``         population skewness ``sqrt(n) M3 / M2^1.5``
+``exec_analyst_gap``  mean executive score minus mean analyst score
+``qa_tone_change``    mean score from the first analyst turn on minus the
+                      mean of the management turns before it
+
+Roles containing "analyst" are analysts, "operator" turns are neither;
+everything else counts as management.  Each partial keeps the first and last
+turn it placed before its own Q&A start, so a merge can tell partials lying
+wholly before the call's first analyst turn from those wholly after it (a
+later chunk without analyst turns, whose turns all move to the Q&A).  The
+split is therefore exact as long as each chunk holds a contiguous run of a
+call's turns (transcripts stored in turn order, however they are chunked, as
+``stream_calls`` merges chunks in order); calls with a partial straddling the
+call's Q&A start get NaN.
+
+The call-level features are then mapped to trade dates, averaged per
+(trade_date, symbol) and z-scored per date exactly like
+``factor_build.build_daily_factor``, so the ``tone_dispersion`` column is that
+factor.  Each column can be backtested on its own
+(``neutralise(panel[feature].dropna())``) without re-reading transcripts.
+
+    python -m src.text_factors TURN_SCORES [...] [--out PATH] [--features a,b]
+"""
+import argparse
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from . import instrument, segments
+from .dispersion import CALL_COLUMNS, MIN_TURNS, stream_calls
+from .factor_build import call_timestamps, trade_dates
+
+FEATURES = (
+    "tone_dispersion",
+    "tone_mean",
+    "tone_min",
+    "tone_max",
+    "tone_skew",
+    "exec_analyst_gap",
+    "qa_tone_change",
+)
+# orientation of the factor columns: low dispersion is the positive signal,
+# as in build_daily_factor
+SIGNS = {"tone_dispersion": -1.0}
+
+_SUMS = [
+    "exec_n",
+    "exec_sum",
+    "analyst_n",
+    "analyst_sum",
+    "pre_n",
+    "pre_sum",
+    "post_n",
+    "post_sum",
+]
+
+
+def _roles(turns: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Boolean analyst / management masks of the turn records."""
+    if "role" not in turns.columns:
+        n = len(turns)
+        return np.zeros(n, dtype=bool), np.ones(n, dtype=bool)
+    role = turns["role"].fillna("").astype(str).str.lower()
+    analyst = role.str.contains("analyst").to_numpy()
+    operator = role.str.contains("operator").to_numpy()
+    return analyst, ~analyst & ~operator
+
+
+def call_stats(turns: pd.DataFrame) -> pd.DataFrame:
+    """Per-call accumulators of one batch of turn records (one row per ``call_key``)."""
+    missing = {"call_key", "score"} - set(turns.columns)
+    if missing:
+        raise KeyError(f"turn records lack columns {sorted(missing)}")
+
+    order, offsets = segments.sort_by(turns["call_key"].to_numpy())
+    x = turns["score"].to_numpy(dtype=float)[order]
+    analyst, management = (m[order] for m in _roles(turns))
+    if "turn" in turns.columns:
+        turn = turns["turn"].to_numpy(dtype=float)[order]
+    else:
+        turn = np.full(len(x), np.nan)
+    scored = ~np.isnan(x)
+
+    n = segments.count(x, offsets)
+    mean = segments.mean(x, offsets)
+    d = segments.demean(x, offsets)
+
+    # Q&A starts at the first analyst turn (scored or not); management turns
+    # before it are the prepared remarks
+    qa_start = segments.minimum(np.where(analyst & ~np.isnan(turn), turn, np.inf), offsets)
+    qa_start = np.where(np.isnan(qa_start), np.inf, qa_start)
+    qa = segments.broadcast(qa_start, offsets)
+    before = scored & (turn < qa)
+    post = scored & (turn >= qa)
+    # first / last scored turn before this batch's Q&A start, to merge splits
+    pre_first = segments.minimum(np.where(before, turn, np.inf), offsets)
+    pre_last = segments.maximum(np.where(before, turn, -np.inf), offsets)
+
+    sums: Dict[str, np.ndarray] = {}
+    for name, mask in [
+        ("exec", scored & management),
+        ("analyst", scored & analyst),
+        ("pre", before & management),
+        ("post", post),
+    ]:
+        sums[f"{name}_n"] = segments.total(mask.astype(float), offsets)
+        sums[f"{name}_sum"] = segments.total(np.where(mask, x, 0.0), offsets)
+
+    firsts = order[offsets[:-1]]
+    out = turns.iloc[firsts][[c for c in CALL_COLUMNS if c in turns.columns]]
+    out = out.reset_index(drop=True)
+    out.insert(0, "call_key", turns["call_key"].to_numpy()[firsts])
+    return out.assign(
+        n=n.astype(np.int64),
+        mean=np.where(n > 0, mean, 0.0),
+        m2=segments.total(d**2, offsets),
+        m3=segments.total(d**3, offsets),
+        min=segments.minimum(x, offsets),
+        max=segments.maximum(x, offsets),
+        qa_start=qa_start,
+        pre_first=np.where(np.isnan(pre_first), np.inf, pre_first),
+        pre_last=np.where(np.isnan(pre_last), -np.inf, pre_last),
+        qa_exact=1.0,
+        **sums,
+    )
+
+
+def merge_stats(parts: Sequence[pd.DataFrame]) -> pd.DataFrame:
+    """Combine partial ``call_stats`` of the same calls (exact k-way moment merge)."""
+    parts = [p for p in parts if len(p)]
+    if len(parts) <= 1:
+        return parts[0] if parts else pd.DataFrame()
+    frame = pd.concat(parts, ignore_index=True)
+    order, offsets = segments.sort_by(frame["call_key"].to_numpy())
+    frame = frame.iloc[order].reset_index(drop=True)
+
+    n_i = frame["n"].to_numpy(dtype=float)
+    mean_i = frame["mean"].to_numpy()
+    m2_i = frame["m2"].to_numpy()
+    n = segments.total(n_i, offsets)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(n > 0, segments.total(n_i * mean_i, offsets) / n, 0.0)
+    d = mean_i - segments.broadcast(mean, offsets)
+    m2 = segments.total(m2_i + n_i * d**2, offsets)
+    m3 = segments.total(frame["m3"].to_numpy() + 3 * d * m2_i + n_i * d**3, offsets)
+
+    # a partial's pre / post split stays valid if none of its turns before
+    # its own Q&A start lies past the call's (possibly earlier) one; if all
+    # of them do (a later chunk of the call), they all belong to the Q&A
+    qa_i = frame["qa_start"].to_numpy()
+    qa = segments.minimum(qa_i, offsets)
+    qa_b = segments.broadcast(qa, offsets)
+    pre_first = frame["pre_first"].to_numpy()
+    pre_last = frame["pre_last"].to_numpy()
+    late = (qa_i > qa_b) & (pre_first >= qa_b)
+    valid = late | (pre_last < qa_b) | (qa_i == qa_b)
+    exact = segments.minimum(np.where(valid, frame["qa_exact"].to_numpy(), 0.0), offsets)
+
+    sums = {c: frame[c].to_numpy(dtype=float) for c in _SUMS}
+    sums["post_n"] = np.where(late, n_i, sums["post_n"])
+    sums["post_sum"] = np.where(late, n_i * mean_i, sums["post_sum"])
+    sums["pre_n"] = np.where(late, 0.0, sums["pre_n"])
+    sums["pre_sum"] = np.where(late, 0.0, sums["pre_sum"])
+    pre_first = np.where(late, np.inf, pre_first)
+    pre_last = np.where(late, -np.inf, pre_last)
+
+    out = frame.iloc[offsets[:-1]].reset_index(drop=True)
+    return out.assign(
+        n=n.astype(np.int64),
+        mean=mean,
+        m2=m2,
+        m3=m3,
+        min=segments.minimum(frame["min"].to_numpy(), offsets),
+        max=segments.maximum(frame["max"].to_numpy(), offsets),
+        qa_start=qa,
+        pre_first=segments.minimum(pre_first, offsets),
+        pre_last=segments.maximum(pre_last, offsets),
+        qa_exact=exact,
+        **{c: segments.total(v, offsets) for c, v in sums.items()},
+    )
+
+
+def call_features(
+    stats: pd.DataFrame,
+    features: Sequence[str] = FEATURES,
+    min_turns: int = MIN_TURNS,
+) -> pd.DataFrame:
+    """Call-level ``features`` (one row per call) from merged ``call_stats``."""
+    unknown = set(features) - set(FEATURES)
+    if unknown:
+        raise ValueError(f"unknown features {sorted(unknown)}, choose from {FEATURES}")
+    n = stats["n"].to_numpy(dtype=float)
+    s = {c: stats[c].to_numpy(dtype=float) for c in ["mean", "m2", "m3", "min", "max"]}
+    s.update({c: stats[c].to_numpy(dtype=float) for c in _SUMS})
+    any_turn = n >= 1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        values = {
+            "tone_dispersion": np.where(n >= max(min_turns, 1), s["m2"] / n, np.nan),
+            "tone_mean": np.where(any_turn, s["mean"], np.nan),
+            "tone_min": s["min"],
+            "tone_max": s["max"],
+            "tone_skew": np.where(
+                (n >= 3) & (s["m2"] > 0), np.sqrt(n) * s["m3"] / s["m2"] ** 1.5, np.nan
+            ),
+            "exec_analyst_gap": (
+                s["exec_sum"] / s["exec_n"] - s["analyst_sum"] / s["analyst_n"]
+            ),
+            "qa_tone_change": np.where(
+                stats["qa_exact"].to_numpy() > 0,
+                s["post_sum"] / s["post_n"] - s["pre_sum"] / s["pre_n"],
+                np.nan,
+            ),
+        }
+    meta = stats[["call_key", *[c for c in CALL_COLUMNS if c in stats.columns]]]
+    calls = meta.assign(**{f: values[f] for f in features}, n_turns=n.astype(np.int64))
+    if "date" in calls.columns:
+        calls = calls.sort_values(["date", "call_key"], kind="stable")
+    return calls.reset_index(drop=True)
+
+
+def factor_panel(calls: pd.DataFrame, features: Sequence[str]) -> pd.DataFrame:
+    """
+    (trade_date, symbol) × ``features`` panel of call-level features: trade
+    dates from the NYSE calendar, multiple calls averaged, ``SIGNS`` applied
+    and every column z-scored per trade date, as ``build_daily_factor``.
+    """
+    features = list(features)
+    n_calls = len(calls)
+    calls = calls[["symbol", *features]].assign(call_ts=call_timestamps(calls))
+    calls = calls.dropna(subset=["call_ts"])
+    instrument.dropped(n_calls - len(calls), "unparseable call date")
+    calls["trade_date"] = trade_dates(calls["call_ts"])
+    n_mapped = len(calls)
+    calls = calls.dropna(subset=["trade_date"])
+    instrument.dropped(n_mapped - len(calls), "outside trading calendar")
+
+    panel = calls.groupby(["trade_date", "symbol"])[features].mean()
+    values = panel.to_numpy(dtype=float) * np.array([SIGNS.get(f, 1.0) for f in features])
+    offsets = segments.offsets_of(panel.index.get_level_values(0).to_numpy())
+    panel = pd.DataFrame(
+        segments.zscore(values, offsets), index=panel.index, columns=features
+    )
+    n_rows = len(panel)
+    panel = panel.dropna(how="all")
+    instrument.dropped(n_rows - len(panel), "undefined z-score")
+    return panel
+
+
+@instrument.instrumented("text_factors")
+def build_text_factors(
+    sources: Union[str, Path, Iterable[Union[str, Path]]],
+    features: Sequence[str] = FEATURES,
+    out: Optional[Union[str, Path]] = None,
+    chunk_rows: int = 500_000,
+    n_jobs: Optional[int] = None,
+    min_turns: int = MIN_TURNS,
+) -> pd.DataFrame:
+    """
+    Multi-feature text factor panel from one pass over turn scores.
+
+    Parameters:
+    -----------
+    sources : path or iterable of paths
+        Turn-score parquet / JSON-lines files or directories holding them
+    features : sequence of str
+        Subset of ``FEATURES``
+    out : Path, optional
+        Write the panel to this parquet file
+    chunk_rows, n_jobs, min_turns :
+        As in ``dispersion.compute_dispersion``
+
+    Returns:
+    --------
+    pd.DataFrame
+        Z-scored features indexed by (trade_date, symbol)
+    """
+    exclude = [out] if out is not None else []
+    stats = stream_calls(sources, call_stats, merge_stats, chunk_rows, n_jobs, exclude)
+    panel = factor_panel(call_features(stats, features, min_turns), features)
+    if out is not None:
+        Path(out).parent.mkdir(parents=True, exist_ok=True)
+        panel.to_parquet(out)
+    return panel
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("turns", nargs="+", help="turn-score files or directories")
+    parser.add_argument("--out", default="outputs/text_factors.parquet")
+    parser.add_argument("--features", default=",".join(FEATURES))
+    parser.add_argument("--chunk-rows", type=int, default=500_000)
+    parser.add_argument("--jobs", type=int, default=None)
+    args = parser.parse_args()
+    result = build_text_factors(
+        args.turns, args.features.split(","), args.out, args.chunk_rows, args.jobs
+    )
+    print(f"{len(result)} (date, symbol) rows × {result.shape[1]} features → {args.out}")
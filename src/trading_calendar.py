@@ -0,0 +1,194 @@
+"""NYSE trading sessions from embedded holiday rules (no network, no extra deps).
+
+The session table (dates, opens and closes, exchange local time) is built
+once per year range from the rules below and cached.  Mapping timestamps to
+sessions is a single ``np.searchsorted`` of their int64 nanoseconds onto the
+sorted session boundaries, so millions of call times map per second.
+
+Rules: weekends; New Year's Day (Sunday → Monday, Saturday → not observed);
+Martin Luther King Jr. Day (from 1998); Washington's Birthday; Good Friday;
+Memorial Day; Juneteenth (from 2022); Independence Day; Labor Day;
+Thanksgiving; Christmas (Saturday → Friday, Sunday → Monday); plus the
+unscheduled closures in ``SPECIAL_CLOSURES``.  Sessions close at 13:00 on
+the day after Thanksgiving, on 24 December (Monday–Thursday) and on
+3 July when Independence Day falls on Tuesday–Friday.
+"""
+import datetime as dt
+import functools
+from typing import List, Union
+
+import numpy as np
+import pandas as pd
+
+TZ = "America/New_York"
+
+OPEN = pd.Timedelta(hours=9, minutes=30)
+CLOSE = pd.Timedelta(hours=16)
+EARLY_CLOSE = pd.Timedelta(hours=13)
+
+FIRST_YEAR = 1990
+LAST_YEAR = 2040
+
+# market-wide closures outside the regular holiday rules
+SPECIAL_CLOSURES = [
+    dt.date(1994, 4, 27),  # President Nixon's funeral
+    dt.date(2001, 9, 11),
+    dt.date(2001, 9, 12),
+    dt.date(2001, 9, 13),
+    dt.date(2001, 9, 14),
+    dt.date(2004, 6, 11),  # President Reagan's funeral
+    dt.date(2007, 1, 2),  # President Ford's funeral
+    dt.date(2012, 10, 29),  # Hurricane Sandy
+    dt.date(2012, 10, 30),
+    dt.date(2018, 12, 5),  # President G. H. W. Bush's funeral
+    dt.date(2025, 1, 9),  # President Carter's funeral
+]
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> dt.date:
+    """``n``-th (1-based, -1 = last) ``weekday`` (Monday = 0) of a month."""
+    if n > 0:
+        first = dt.date(year, month, 1)
+        return first + dt.timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    nxt = dt.date(year + month // 12, month % 12 + 1, 1)
+    last = nxt - dt.timedelta(days=1)
+    return last - dt.timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year: int) -> dt.date:
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    ell = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * ell) // 451
+    month = (h + ell - 7 * m + 114) // 31
+    day = (h + ell - 7 * m + 114) % 31 + 1
+    return dt.date(year, month, day)
+
+
+def _observed(day: dt.date) -> dt.date:
+    """Saturday holidays are observed on Friday, Sunday ones on Monday."""
+    if day.weekday() == 5:
+        return day - dt.timedelta(days=1)
+    if day.weekday() == 6:
+        return day + dt.timedelta(days=1)
+    return day
+
+
+def holidays(year: int) -> List[dt.date]:
+    """Regular NYSE full-day holidays of ``year``."""
+    out = []
+    new_year = dt.date(year, 1, 1)
+    if new_year.weekday() != 5:  # a Saturday New Year is not observed
+        out.append(_observed(new_year))
+    if year >= 1998:
+        out.append(_nth_weekday(year, 1, 0, 3))  # Martin Luther King Jr. Day
+    out.append(_nth_weekday(year, 2, 0, 3))  # Washington's Birthday
+    out.append(_easter(year) - dt.timedelta(days=2))  # Good Friday
+    out.append(_nth_weekday(year, 5, 0, -1))  # Memorial Day
+    if year >= 2022:
+        out.append(_observed(dt.date(year, 6, 19)))  # Juneteenth
+    out.append(_observed(dt.date(year, 7, 4)))  # Independence Day
+    out.append(_nth_weekday(year, 9, 0, 1))  # Labor Day
+    out.append(_nth_weekday(year, 11, 3, 4))  # Thanksgiving
+    out.append(_observed(dt.date(year, 12, 25)))  # Christmas
+    return sorted(out)
+
+
+def early_closes(year: int) -> List[dt.date]:
+    """13:00 closes of ``year`` (before holiday removal)."""
+    out = [_nth_weekday(year, 11, 3, 4) + dt.timedelta(days=1)]
+    if dt.date(year, 7, 4).weekday() in (1, 2, 3, 4):
+        out.append(dt.date(year, 7, 3))
+    if dt.date(year, 12, 24).weekday() in (0, 1, 2, 3):
+        out.append(dt.date(year, 12, 24))
+    return sorted(out)
+
+
+Timestamps = Union[pd.Series, pd.DatetimeIndex, np.ndarray]
+DateLike = Union[str, dt.date, np.datetime64]
+
+
+def _local_ns(ts: Timestamps) -> np.ndarray:
+    """int64 exchange-local nanoseconds (NaT → int64 min); naive input is local."""
+    idx = pd.DatetimeIndex(ts)
+    if idx.tz is not None:
+        idx = idx.tz_convert(TZ).tz_localize(None)
+    return idx.to_numpy("datetime64[ns]").view("i8")
+
+
+class TradingCalendar:
+    """
+    Session table of one exchange between two years.
+
+    ``sessions`` are the trading dates, ``opens`` / ``closes`` their local
+    open and close times as int64 nanoseconds, all sorted.
+    """
+
+    __slots__ = ("sessions", "opens", "closes")
+
+    def __init__(self, start_year: int = FIRST_YEAR, end_year: int = LAST_YEAR) -> None:
+        closed = set(SPECIAL_CLOSURES)
+        early = set()
+        for year in range(start_year, end_year + 1):
+            closed.update(holidays(year))
+            early.update(early_closes(year))
+
+        days = pd.bdate_range(dt.date(start_year, 1, 1), dt.date(end_year, 12, 31))
+        keep = ~days.isin(pd.DatetimeIndex(sorted(closed)))
+        self.sessions = days[keep].rename("trade_date")
+        short = self.sessions.isin(pd.DatetimeIndex(sorted(early)))
+        base = self.sessions.to_numpy("datetime64[ns]").view("i8")
+        self.opens = base + OPEN.value
+        self.closes = base + np.where(short, EARLY_CLOSE.value, CLOSE.value)
+
+    def __repr__(self) -> str:
+        return (
+            f"TradingCalendar({len(self.sessions)} sessions, "
+            f"{self.sessions[0].date()} – {self.sessions[-1].date()})"
+        )
+
+    def trade_dates(self, ts: Timestamps, cutoff: str = "open") -> np.ndarray:
+        """
+        Session on which each timestamp can first be traded.
+
+        With ``cutoff="open"`` a timestamp strictly before a session's open
+        maps to that session, anything later (intraday or after the close)
+        rolls to the next one.  With ``cutoff="close"`` timestamps before a
+        session's close still map to that session.  Naive timestamps are
+        exchange local time; NaT and timestamps beyond the table give NaT.
+
+        Returns:
+        --------
+        np.ndarray
+            datetime64[ns] session dates, one per timestamp
+        """
+        if cutoff not in ("open", "close"):
+            raise ValueError(f"unknown cutoff {cutoff!r}, use 'open' or 'close'")
+        ns = _local_ns(ts)
+        bounds = self.opens if cutoff == "open" else self.closes
+        pos = np.searchsorted(bounds, ns, side="right")
+        ok = (ns != np.iinfo(np.int64).min) & (pos < len(bounds))
+        out = np.full(len(ns), np.datetime64("NaT"), dtype="datetime64[ns]")
+        out[ok] = self.sessions.to_numpy("datetime64[ns]")[pos[ok]]
+        return out
+
+    def is_session(self, dates: Timestamps) -> np.ndarray:
+        """Whether each (normalised) date is a trading session."""
+        return pd.DatetimeIndex(dates).normalize().isin(self.sessions)
+
+    def sessions_in_range(self, start: DateLike, end: DateLike) -> pd.DatetimeIndex:
+        """Sessions between ``start`` and ``end`` inclusive."""
+        return self.sessions[
+            self.sessions.slice_indexer(pd.Timestamp(start), pd.Timestamp(end))
+        ]
+
+
+@functools.lru_cache(maxsize=None)
+def nyse(start_year: int = FIRST_YEAR, end_year: int = LAST_YEAR) -> TradingCalendar:
+    """Cached NYSE calendar (built once per year range)."""
+    return TradingCalendar(start_year, end_year)
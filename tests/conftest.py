@@ -0,0 +1,11 @@
+import pytest
+
+from src import pipeline
+
+
+@pytest.fixture(scope="session")
+def pipe(tmp_path_factory):
+    # factor → resid → weights is computed once per session and shared
+    # through a temporary stage cache, never the repository's data/.cache
+    cache_dir = tmp_path_factory.mktemp("stages")
+    return pipeline.backtest(smoothing=0.75, cache_dir=cache_dir)
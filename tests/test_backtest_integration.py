@@ -13,8 +13,6 @@ import numpy as np
 import pandas as pd
 import pytest
 
-import src.factor_build as fb
-import src.neutralise as nz
 import src.portfolio as pf
 import src.report as report
 from src.load import ff_factors, prices, tone_calls
@@ -52,7 +50,7 @@ def _have_all_files():
 class TestBacktestPipeline:
     """Test the complete backtest pipeline execution."""
     
-    def test_full_pipeline_execution(self):
+    def test_full_pipeline_execution(self, pipe):
         """Test complete execution of the backtest pipeline."""
         with tempfile.TemporaryDirectory() as tmp_dir:
             outputs_dir = Path(tmp_dir) / "outputs"
@@ -63,18 +61,18 @@ class TestBacktestPipeline:
                 os.chdir(tmp_dir)
                 
                 # Execute the full pipeline
-                factor_raw = fb.build_daily_factor()
+                factor_raw = pipe["factor"]
                 
                 if factor_raw.empty:
                     pytest.skip("Empty factor - cannot test full pipeline")
                 
                 # Step 1: Factor neutralization
-                factor_neut = nz.neutralise(factor_raw)
+                factor_neut = pipe["resid"]
                 assert isinstance(factor_neut, pd.Series), "Neutralized factor should be Series"
                 assert not factor_neut.empty, "Neutralized factor should not be empty"
                 
                 # Step 2: Portfolio construction with smoothing
-                weights = pf.build_weights(factor_neut, smoothing=0.75)
+                weights = pipe["weights"]
                 assert isinstance(weights, pd.DataFrame), "Weights should be DataFrame"
                 assert not weights.empty, "Weights should not be empty"
                 
@@ -190,14 +188,14 @@ class TestBacktestPipeline:
 class TestPerformanceRegression:
     """Test that performance characteristics remain stable."""
     
-    def test_smoothing_reduces_turnover(self):
+    def test_smoothing_reduces_turnover(self, pipe):
         """Regression test: smoothing should reduce turnover."""
-        factor = fb.build_daily_factor()
+        factor = pipe["factor"]
         
         if factor.empty:
             pytest.skip("Empty factor - cannot test smoothing regression")
         
-        resid = nz.neutralise(factor)
+        resid = pipe["resid"]
         
         # Test different smoothing levels
         smoothing_levels = [0.0, 0.5, 0.75, 0.9]
@@ -216,15 +214,14 @@ class TestPerformanceRegression:
                 increase_ratio = turnovers[i] / turnovers[i-1]
                 assert increase_ratio < 1.1, f"Smoothing={smoothing_levels[i]} increased turnover too much"
     
-    def test_market_neutrality_maintained(self):
+    def test_market_neutrality_maintained(self, pipe):
         """Regression test: portfolios should remain market neutral."""
-        factor = fb.build_daily_factor()
+        factor = pipe["factor"]
         
         if factor.empty:
             pytest.skip("Empty factor - cannot test market neutrality")
         
-        resid = nz.neutralise(factor)
-        weights = pf.build_weights(resid, smoothing=0.75)
+        weights = pipe["weights"]
         
         # Check market neutrality (weights sum to zero)
         weight_sums = weights.sum(axis=1)
@@ -232,14 +229,14 @@ class TestPerformanceRegression:
         
         assert max_deviation < 1e-8, f"Market neutrality violated: max deviation {max_deviation}"
     
-    def test_gross_exposure_control(self):
+    def test_gross_exposure_control(self, pipe):
         """Regression test: gross exposure should be controlled to target."""
-        factor = fb.build_daily_factor()
+        factor = pipe["factor"]
         
         if factor.empty:
             pytest.skip("Empty factor - cannot test gross exposure")
         
-        resid = nz.neutralise(factor)
+        resid = pipe["resid"]
         
         # Test different gross exposure targets
         for target_gross in [0.5, 1.0, 1.5]:
@@ -258,9 +255,9 @@ class TestPerformanceRegression:
 class TestDataConsistency:
     """Test that data relationships remain consistent."""
     
-    def test_factor_symbol_coverage(self):
+    def test_factor_symbol_coverage(self, pipe):
         """Test that factor has reasonable symbol coverage in price data."""
-        factor = fb.build_daily_factor()
+        factor = pipe["factor"]
         px = prices()
         
         if factor.empty:
@@ -277,9 +274,9 @@ class TestDataConsistency:
         # Should have good coverage (at least 70%)
         assert overlap_ratio > 0.7, f"Poor symbol coverage: {overlap_ratio:.2%}"
     
-    def test_temporal_coverage(self):
+    def test_temporal_coverage(self, pipe):
         """Test that factor has reasonable temporal coverage."""
-        factor = fb.build_daily_factor()
+        factor = pipe["factor"]
         px = prices()
         
         if factor.empty:
@@ -304,7 +301,7 @@ class TestDataConsistency:
 # Output File Validation Tests
 ###############################################################################
 @pytest.mark.skipif(not _have_all_files(), reason="research parquets missing")
-def test_output_file_integrity():
+def test_output_file_integrity(pipe):
     """Test that output files can be generated and have correct structure."""
     with tempfile.TemporaryDirectory() as tmp_dir:
         outputs_dir = Path(tmp_dir) / "outputs"
@@ -315,11 +312,11 @@ def test_output_file_integrity():
             os.chdir(tmp_dir)
             
             # Run pipeline and generate outputs
-            factor = fb.build_daily_factor()
+            factor = pipe["factor"]
             
             if not factor.empty:
-                resid = nz.neutralise(factor)
-                weights = pf.build_weights(resid, smoothing=0.75)
+                resid = pipe["resid"]
+                weights = pipe["weights"]
                 pnl = pf.pnl(weights)
                 turnover = pf.calculate_turnover(weights)
                 
@@ -375,7 +372,9 @@ def test_run_backtest_script():
                     capture_output=True, 
                     text=True, 
                     timeout=300,  # 5 minute timeout
-                    cwd=original_cwd
+                    cwd=original_cwd,
+                    # keep the stage cache out of the repository
+                    env={**os.environ, "TONE_CACHE_DIR": tmp_dir},
                 )
                 
                 # Should complete without error
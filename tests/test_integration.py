@@ -7,8 +7,6 @@ import numpy as np
 import pandas as pd
 import pytest
 
-import src.factor_build as fb
-import src.neutralise as nz
 import src.portfolio as pf
 import src.report as report
 from src.load import ff_factors, prices, tone_calls
@@ -49,8 +47,8 @@ def test_parquet_not_empty(fp):
 # 2 ─ Full pipeline (xfail if factor empty)
 ###############################################################################
 @pytest.mark.skipif(not _have_all_files(), reason="research parquets missing")
-def test_pipeline_end_to_end(tmp_path):
-    factor = fb.build_daily_factor()
+def test_pipeline_end_to_end(tmp_path, pipe):
+    factor = pipe["factor"]
 
     if factor.empty:
         pytest.xfail(
@@ -58,8 +56,7 @@ def test_pipeline_end_to_end(tmp_path):
             "check date mapping or parquet contents."
         )
 
-    resid = nz.neutralise(factor)
-    weights = pf.build_weights(resid)
+    weights = pipe["weights"]
     pnl = pf.pnl(weights)
 
     # basic sanity
@@ -77,12 +74,12 @@ def test_pipeline_end_to_end(tmp_path):
 # 5 ─ factor dates must exist in price index
 # ------------------------------------------------------------------ #
 @pytest.mark.skipif(not _have_all_files(), reason="research parquets missing")
-def test_factor_dates_overlap_prices():
+def test_factor_dates_overlap_prices(pipe):
     """
     Ensure that at least one trade_date created in build_daily_factor()
     is present in the price table.  Catches silent empty-factor issues.
     """
-    factor = fb.build_daily_factor()
+    factor = pipe["factor"]
     assert not factor.empty, "build_daily_factor() returned 0 rows"
 
     price_idx = prices().index
@@ -218,18 +215,18 @@ class TestDataAlignment:
 class TestEnhancedPipeline:
     """Test the enhanced pipeline with smoothing and advanced metrics."""
     
-    def test_portfolio_smoothing_effect(self):
+    def test_portfolio_smoothing_effect(self, pipe):
         """Test that portfolio smoothing reduces turnover."""
-        factor = fb.build_daily_factor()
+        factor = pipe["factor"]
         
         if factor.empty:
             pytest.skip("Empty factor - cannot test smoothing")
         
-        resid = nz.neutralise(factor)
+        resid = pipe["resid"]
         
         # Build weights with and without smoothing
         weights_no_smooth = pf.build_weights(resid, smoothing=0.0)
-        weights_smooth = pf.build_weights(resid, smoothing=0.75)
+        weights_smooth = pipe["weights"]
         
         # Calculate turnover
         turnover_no_smooth = pf.calculate_turnover(weights_no_smooth)
@@ -295,7 +292,7 @@ class TestEnhancedPipeline:
 # 6 ─ Output Generation and File I/O Tests  
 ###############################################################################
 @pytest.mark.skipif(not _have_all_files(), reason="research parquets missing")
-def test_output_file_generation():
+def test_output_file_generation(pipe):
     """Test that the pipeline can generate expected output files."""
     with tempfile.TemporaryDirectory() as tmp_dir:
         # Set up temporary outputs directory
@@ -308,11 +305,10 @@ def test_output_file_generation():
             os.chdir(tmp_dir)
             
             # Run partial pipeline
-            factor = fb.build_daily_factor()
+            factor = pipe["factor"]
             
             if not factor.empty:
-                resid = nz.neutralise(factor)
-                weights = pf.build_weights(resid)
+                weights = pipe["weights"]
                 
                 # Test parquet output
                 weights_file = outputs_dir / "test_weights.parquet"
@@ -336,15 +332,14 @@ def test_output_file_generation():
 # 7 ─ Performance and Regression Tests
 ###############################################################################
 @pytest.mark.skipif(not _have_all_files(), reason="research parquets missing")
-def test_pipeline_performance_characteristics():
+def test_pipeline_performance_characteristics(pipe):
     """Test that pipeline produces reasonable performance characteristics."""
-    factor = fb.build_daily_factor()
+    factor = pipe["factor"]
     
     if factor.empty:
         pytest.skip("Empty factor - cannot test performance")
     
-    resid = nz.neutralise(factor)
-    weights = pf.build_weights(resid, smoothing=0.75)
+    weights = pipe["weights"]
     pnl = pf.pnl(weights)
     
     # Basic performance checks
@@ -418,15 +413,14 @@ class TestDataLoading:
             assert (px_clean > 0).all().all(), "All prices should be positive"
             assert (px_clean < 10000).all().all(), "Prices should be reasonable (< $10,000)"
     
-    def test_pnl_calculation_robustness(self):
+    def test_pnl_calculation_robustness(self, pipe):
         """Test that PnL calculation handles edge cases properly."""
-        factor = fb.build_daily_factor()
+        factor = pipe["factor"]
         
         if factor.empty:
             pytest.skip("Empty factor - cannot test PnL calculation")
         
-        resid = nz.neutralise(factor)
-        weights = pf.build_weights(resid, smoothing=0.75)
+        weights = pipe["weights"]
         
         # Test PnL calculation doesn't generate warnings
         import warnings
@@ -1,4 +1,8 @@
 # tests/test_pipeline.py
+import os
+import subprocess
+import sys
+
 import numpy as np
 import pandas as pd
 import pytest
@@ -30,12 +34,24 @@ def tiny_prices():
     return pd.DataFrame(data, index=dates)
 
 
+@pytest.fixture
+def tmp_data(tmp_path, monkeypatch):
+    """An empty ``load.DATA`` directory with a fresh loader cache."""
+    import src.load as ld
+
+    data = tmp_path / "data"
+    data.mkdir()
+    monkeypatch.setattr(ld, "DATA", data)
+    monkeypatch.setattr(ld, "cache", ld.FrameCache())
+    return data
+
+
 # ------------------------------------------------------------------ #
 # 1. factor build
 # ------------------------------------------------------------------ #
 def test_factor_build_structure(tiny_calls, monkeypatch):
     # Supply tiny_calls when real parquet absent
-    monkeypatch.setattr(fb, "tone_calls", lambda: tiny_calls.reset_index())
+    monkeypatch.setattr(fb, "tone_calls", lambda **_: tiny_calls.reset_index())
 
     fac = fb.build_daily_factor()
     assert isinstance(fac, pd.Series)
@@ -66,11 +82,157 @@ def test_neutralise_zero_cov(monkeypatch):
     assert abs(resid.groupby("trade_date").mean()).max() < 1e-8
 
 
+def test_segment_residuals_match_lstsq():
+    rng = np.random.default_rng(3)
+    sizes = [5, 1, 9, 12]
+    offsets = np.cumsum([0] + sizes)
+    X = rng.normal(size=(sum(sizes), 3))
+    X[:, 2] = 2 * X[:, 1]  # collinear regressor
+    X[5:6] = 0.4  # single-row day
+    y = rng.normal(size=sum(sizes))
+
+    resid = nz._segment_residuals(y, X, offsets)
+    for lo, n in zip(offsets, sizes):
+        Xd = np.column_stack([np.ones(n), X[lo : lo + n]])
+        beta, *_ = np.linalg.lstsq(Xd, y[lo : lo + n], rcond=None)
+        assert np.allclose(resid[lo : lo + n], y[lo : lo + n] - Xd @ beta)
+
+
+def test_segment_kernels_match_groupby():
+    from src import segments
+
+    rng = np.random.default_rng(3)
+    keys = rng.integers(0, 6, size=200)
+    vals = rng.normal(size=200).round(1)  # rounding creates ties
+    vals[rng.integers(0, 200, size=15)] = np.nan
+    order, offsets = segments.sort_by(keys)
+    v = vals[order]
+    g = pd.Series(v).groupby(keys[order])
+
+    z = (g.transform("mean"), g.transform(lambda x: x.std(ddof=0)))
+    assert np.allclose(segments.zscore(v, offsets), (v - z[0]) / z[1], equal_nan=True)
+    assert np.allclose(segments.rank(v, offsets), g.rank(), equal_nan=True)
+    assert np.allclose(segments.quantile(v, offsets, 0.25), g.quantile(0.25))
+    lo, hi = g.transform(lambda x: x.quantile(0.1)), g.transform(lambda x: x.quantile(0.9))
+    assert np.allclose(segments.winsorise(v, offsets, 0.1, 0.9), v.clip(lo, hi), equal_nan=True)
+    buckets = segments.quantile_bucket(v, offsets, 5)
+    assert set(np.unique(buckets[~np.isnan(v)])) <= {1, 2, 3, 4, 5}
+    assert (buckets[np.isnan(v)] == 0).all()
+
+
+def test_rolling_betas_match_lstsq():
+    from src import betas as bt
+
+    rng = np.random.default_rng(4)
+    dates = pd.date_range("2024-01-01", periods=80, freq="B")
+    ff = pd.DataFrame(rng.normal(0, 0.01, (80, 6)), index=dates, columns=bt.FACTORS)
+    rets = pd.DataFrame(
+        ff.to_numpy() @ rng.normal(1, 0.5, (6, 3)) + rng.normal(0, 0.01, (80, 3)),
+        index=dates,
+        columns=["AAA", "BBB", "CCC"],
+    )
+    rets.iloc[30:33, 1] = np.nan  # gap inside the window
+    rets.iloc[:50, 2] = np.nan  # late listing
+
+    b = bt.rolling_betas(rets, ff, window=40, min_periods=20)
+    for t, col in [(39, 0), (60, 1), (79, 2), (45, 2)]:
+        win = rets.iloc[t - 39 : t + 1, col]
+        ok = win.notna().to_numpy()
+        got = np.array([b[f].iloc[t, col] for f in bt.FACTORS])
+        if ok.sum() < 20:
+            assert np.isnan(got).all()
+            continue
+        X = np.column_stack([np.ones(ok.sum()), ff.iloc[t - 39 : t + 1][ok]])
+        beta, *_ = np.linalg.lstsq(X, win[ok], rcond=None)
+        assert np.allclose(got, beta[1:])
+
+    # a signal dated t uses the betas estimated through t - 1
+    ix = pd.MultiIndex.from_tuples(
+        [(dates[60], "AAA"), (dates[60], "CCC"), (dates[60], "ZZZ")],
+        names=["trade_date", "symbol"],
+    )
+    at = bt.betas_at(ix, b)
+    assert at.iloc[0, 0] == b["mktrf"].iloc[59, 0]
+    assert np.isnan(at.iloc[1, 0]) and np.isnan(at.iloc[2, 0])
+
+
+def test_factor_analytics_match_pandas():
+    from src import analytics
+
+    rng = np.random.default_rng(6)
+    dates = pd.date_range("2024-01-01", periods=40, freq="B")
+    syms = [f"S{i}" for i in range(12)]
+    px = pd.DataFrame(
+        100 * np.exp(np.cumsum(rng.normal(0, 0.02, (40, 12)), axis=0)),
+        index=dates,
+        columns=syms,
+    )
+    ix = pd.MultiIndex.from_product([dates[:30], syms], names=["trade_date", "symbol"])
+    factor = pd.Series(rng.normal(size=len(ix)), index=ix).sample(frac=0.6, random_state=1)
+
+    data = analytics.factor_data(factor, px, periods=(1, 5), quantiles=3)
+    dense = px.pct_change(5).shift(-5).stack().rename("5D")
+    pd.testing.assert_series_equal(
+        data["5D"], dense.reindex(data.index).rename("5D"), check_names=False
+    )
+
+    by_day = data.groupby(level=0)
+    ic = analytics.rank_ic(data)
+    expected = by_day.apply(lambda g: g["factor"].corr(g["5D"], method="spearman"))
+    assert np.allclose(ic["5D"], expected, equal_nan=True)
+
+    demeaned = data["1D"] - by_day["1D"].transform("mean")
+    means = analytics.quantile_returns(data)["1D"]
+    assert np.allclose(means, demeaned.groupby(data["factor_quantile"]).mean())
+    spread = analytics.quantile_spread(data, 5)
+    raw = data.groupby([data.index.get_level_values(0), "factor_quantile"])["5D"].mean()
+    expected = (raw.xs(3, level=1) - raw.xs(1, level=1)).reindex(spread.index)
+    assert np.allclose(spread, expected, equal_nan=True)
+
+    # lag-1 rank autocorrelation over the symbols present on both dates
+    ranks = factor.groupby(level=0).rank().unstack()
+    ac = analytics.factor_autocorrelation(factor)
+    assert np.isclose(ac.iloc[10], ranks.iloc[10].corr(ranks.iloc[9]))
+
+
+def test_factor_exposures_match_lstsq():
+    from src import report
+
+    rng = np.random.default_rng(5)
+    dates = pd.date_range("2024-01-01", periods=90, freq="B")
+    ff = pd.DataFrame(rng.normal(0, 0.01, (90, 5)), index=dates, columns=list("abcde"))
+    rets = pd.Series(ff.to_numpy() @ rng.normal(0, 1, 5) + rng.normal(0, 0.01, 90), index=dates)
+
+    def fit(y, X, w=None):
+        w = np.ones(len(y)) if w is None else w
+        A = np.column_stack([np.ones(len(y)), X]) * np.sqrt(w)[:, None]
+        coef, *_ = np.linalg.lstsq(A, y * np.sqrt(w), rcond=None)
+        fitted = np.column_stack([np.ones(len(y)), X]) @ coef
+        mean = np.average(y, weights=w)
+        return coef[1:], 1 - np.sum(w * (y - fitted) ** 2) / np.sum(w * (y - mean) ** 2)
+
+    y, X = rets.to_numpy(), ff.to_numpy()
+    betas, r2 = report.analyze_factor_exposures(rets, ff, rolling_window=30)
+    assert betas.index.equals(dates[29:])
+    assert all(pd.api.types.is_float_dtype(t) for t in betas.dtypes)
+    for t in (29, 60, 89):
+        b, r = fit(y[t - 29 : t + 1], X[t - 29 : t + 1])
+        assert np.allclose(betas.loc[dates[t]], b) and np.isclose(r2[dates[t]], r)
+
+    betas, r2 = report.analyze_factor_exposures(rets, ff, 30, mode="expanding")
+    b, r = fit(y, X)
+    assert np.allclose(betas.iloc[-1], b) and np.isclose(r2.iloc[-1], r)
+
+    betas, r2 = report.analyze_factor_exposures(rets, ff, 30, mode="ewm", halflife=20)
+    b, r = fit(y, X, 0.5 ** (np.arange(90)[::-1] / 20))
+    assert np.allclose(betas.iloc[-1], b) and np.isclose(r2.iloc[-1], r)
+
+
 # ------------------------------------------------------------------ #
 # 3. weights & pnl
 # ------------------------------------------------------------------ #
 def test_weights_and_pnl(tiny_calls, tiny_prices, monkeypatch):
-    monkeypatch.setattr(pf, "prices", lambda: tiny_prices)
+    monkeypatch.setattr(pf, "prices", lambda **_: tiny_prices)
 
     w = pf.build_weights(tiny_calls)
     assert isinstance(w, pd.DataFrame)
@@ -78,3 +240,815 @@ def test_weights_and_pnl(tiny_calls, tiny_prices, monkeypatch):
 
     pnl = pf.pnl(w, horizon=2)
     assert isinstance(pnl, pd.Series) and len(pnl) > 0
+
+
+def test_pnl_horizons_match_single(tiny_calls, tiny_prices, monkeypatch):
+    monkeypatch.setattr(pf, "prices", lambda **_: tiny_prices)
+    w = pf.build_weights(tiny_calls)
+
+    profile = pf.pnl_horizons(w, horizons=(1, 2, 5))
+    assert list(profile.columns) == [1, 2, 5]
+    for h in profile.columns:
+        assert np.allclose(profile[h], pf.pnl(w, horizon=h))
+
+
+def test_sweep_matches_single_run(tiny_calls, tiny_prices, monkeypatch):
+    import src.load as ld
+    import src.sweep as sw
+
+    monkeypatch.setattr(pf, "prices", lambda **_: tiny_prices)
+    monkeypatch.setattr(ld, "prices", lambda **_: tiny_prices)
+    grid = dict(smoothing=[0.0, 0.5], exponent=[0.75, 1.0], horizon=[1, 2])
+
+    res = sw.run_sweep(tiny_calls, n_jobs=1, **grid)
+    assert list(res.columns) == sw.COLUMNS and len(res) == 8
+
+    w = pf.build_weights(tiny_calls, smoothing=0.5, exponent=1.0)
+    p = pf.pnl(w, horizon=2)
+    row = res.query("smoothing == 0.5 and exponent == 1.0 and horizon == 2").iloc[0]
+    assert np.isclose(row.ir, p.mean() / p.std() * 252**0.5)
+    assert np.isclose(row.turnover, pf.calculate_turnover(w).mean())
+
+    pooled = sw.run_sweep(tiny_calls, n_jobs=2, **grid)
+    assert np.allclose(pooled.to_numpy(float), res.to_numpy(float), equal_nan=True)
+
+
+def test_event_panel_matches_dense(tiny_calls, tiny_prices, monkeypatch):
+    from src.events import EventPanel
+
+    monkeypatch.setattr(pf, "prices", lambda **_: tiny_prices)
+    panel = EventPanel.from_series(tiny_calls)
+    assert panel.to_series().equals(tiny_calls)
+
+    dense = pf.build_weights(tiny_calls, smoothing=0)
+    sparse = pf.build_weights(panel, smoothing=0)
+    assert isinstance(sparse, EventPanel)
+    assert np.allclose(sparse.to_frame().to_numpy(), dense.to_numpy())
+    assert np.allclose(pf.pnl(sparse, horizon=2), pf.pnl(dense, horizon=2))
+    assert np.allclose(pf.calculate_turnover(sparse), pf.calculate_turnover(dense))
+    assert np.allclose(pf.build_weights(panel), pf.build_weights(tiny_calls))
+
+    # one event held for two sessions of a longer calendar
+    held = panel.ffill(2, calendar=tiny_prices.index).to_frame(np.nan)
+    assert held.notna().sum().tolist() == [4, 4]
+
+
+def test_smooth_weights_constraints():
+    rng = np.random.default_rng(2)
+    target = rng.normal(size=(20, 8))
+    target -= target.mean(axis=1, keepdims=True)
+    target /= np.abs(target).sum(axis=1, keepdims=True)
+
+    smoothed = pf.smooth_weights(target, gross=1.0, smoothing=0.75)
+    assert smoothed.shape == target.shape
+    assert np.allclose(smoothed[0], target[0])
+    assert np.allclose(smoothed.sum(axis=1), 0.0)
+
+    # resuming from a stored row reproduces the rest of the recurrence
+    resumed = pf.smooth_weights(target[10:], prev=smoothed[9])
+    assert np.allclose(resumed, smoothed[10:])
+
+
+def test_online_smoother_matches_batch(tmp_path):
+    rng = np.random.default_rng(9)
+    dates = pd.bdate_range("2024-01-02", periods=15)
+    ix = pd.MultiIndex.from_product([dates, list("ABCDEFG")], names=["trade_date", "symbol"])
+    signal = pd.Series(rng.normal(size=len(ix)), index=ix).sample(frac=0.7, random_state=2)
+    batch = pf.build_weights(signal, smoothing=0.75)
+
+    live = pf.OnlineSmoother(batch.columns, smoothing=0.75)
+    for i, day in enumerate(batch.index):
+        if i == 8:  # nightly restart from the saved state
+            live.save(tmp_path / "state.npz")
+            live = pf.OnlineSmoother.load(tmp_path / "state.npz")
+            assert live.last_date == batch.index[7]
+        w = live.step(signal.xs(day, level=0), day)
+        assert np.allclose(w.to_numpy(), batch.loc[day].to_numpy())
+
+
+# ------------------------------------------------------------------ #
+# 4. loader cache
+# ------------------------------------------------------------------ #
+def test_loader_cache_fingerprint(tmp_data, tmp_path, monkeypatch):
+    import src.load as ld
+
+    dates = pd.date_range("2025-01-02", periods=4, freq="B")
+    long_px = pd.DataFrame(
+        {
+            "date": np.repeat(dates, 2),
+            "symbol": ["aaa", "bbb"] * 4,
+            "adjClose": np.arange(8, dtype=float),
+        }
+    )
+    long_px.to_parquet(tmp_data / "stock_prices.parquet")
+    monkeypatch.setattr(ld, "CACHE_DIR", tmp_path / ".cache")
+
+    first = ld.prices(disk_cache=True)
+    assert list(first.columns) == ["AAA", "BBB"]
+    assert ld.prices() is first
+    assert ld.cache.stats()["hits"] == 1
+    with pytest.raises(ValueError):
+        first.iloc[0, 0] = -1.0
+    assert (tmp_path / ".cache" / "stock_prices.matrix" / "values.npy").exists()
+
+    # a rewritten source file invalidates the in-process entry
+    long_px.assign(adjClose=long_px["adjClose"] + 1).to_parquet(
+        tmp_data / "stock_prices.parquet"
+    )
+    os.utime(tmp_data / "stock_prices.parquet", ns=(0, 10**9))
+    second = ld.prices()
+    assert second is not first and second.iloc[0, 0] == 1.0
+    assert ld.cache.stats()["invalidations"] == 1
+
+    ld.cache.clear()
+    assert ld.cache.stats()["entries"] == 0
+
+
+def test_loader_pushdown_window(tmp_data):
+    import src.load as ld
+
+    dates = pd.date_range("2025-01-02", periods=6, freq="B")
+    pd.DataFrame(
+        {
+            "date": np.repeat(dates, 3),
+            "symbol": ["aaa", "bbb", "ccc"] * 6,
+            "open": 0.0,
+            "adjClose": np.arange(18, dtype=float),
+        }
+    ).to_parquet(tmp_data / "stock_prices.parquet", row_group_size=3)
+
+    full = ld.prices(disk_cache=False)
+    part = ld.prices(start=dates[2], end=dates[4], symbols=["BBB", "aaa"])
+    assert list(part.columns) == ["AAA", "BBB"]
+    assert part.index.equals(dates[2:5])
+    pd.testing.assert_frame_equal(part, full.loc[dates[2] : dates[4], ["AAA", "BBB"]])
+
+
+def test_matrix_store_roundtrip(tmp_path, tiny_prices):
+    from src import matrix_store
+
+    frame = tiny_prices.rename_axis("date").rename_axis("symbol", axis=1)
+    store = matrix_store.write_matrix(frame, tmp_path / "px.matrix")
+    reopened = matrix_store.open_matrix(store)
+    pd.testing.assert_frame_equal(reopened, frame, check_freq=False)
+
+    # the frame is a read-only view of the mapped file, not a copy
+    base = reopened.to_numpy()
+    assert not base.flags.writeable
+    while base is not None and not isinstance(base, np.memmap):
+        base = base.base
+    assert isinstance(base, np.memmap)
+
+    half = matrix_store.open_matrix(
+        matrix_store.write_matrix(frame, tmp_path / "px32.matrix", dtype="float32")
+    )
+    assert half.dtypes.eq(np.float32).all()
+
+
+def test_nyse_calendar_sessions_and_mapping():
+    from src import trading_calendar as tc
+
+    cal = tc.nyse()
+    assert len(cal.sessions_in_range("2023-01-01", "2023-12-31")) == 250
+    assert len(cal.sessions_in_range("2024-01-01", "2024-12-31")) == 252
+    assert not cal.is_session(["2024-03-29", "2024-06-19", "2012-10-29", "2025-01-09"]).any()
+
+    ts = pd.Series(
+        pd.to_datetime(
+            [
+                "2024-03-28 16:30",  # after the close before Good Friday
+                "2024-04-01 08:00",  # pre-open
+                "2024-04-01 11:00",  # intraday
+                "2024-07-03 13:30",  # after an early close
+                None,
+            ]
+        )
+    )
+    got = pd.DatetimeIndex(cal.trade_dates(ts))
+    expected = pd.to_datetime(["2024-04-01", "2024-04-01", "2024-04-02", "2024-07-05", None])
+    assert got.equals(pd.DatetimeIndex(expected))
+    close = pd.DatetimeIndex(cal.trade_dates(ts, cutoff="close"))
+    assert list(close[:4].day) == [1, 1, 1, 5]
+
+    # tz-aware input is converted to exchange time (12:00 UTC = 08:00 EDT)
+    utc = pd.DatetimeIndex(["2024-04-01 12:00"]).tz_localize("UTC")
+    assert cal.trade_dates(utc)[0] == np.datetime64("2024-04-01")
+
+
+def test_incremental_update_matches_batch(tmp_data, tmp_path, monkeypatch):
+    from src.incremental import IncrementalBacktest
+
+    rng = np.random.default_rng(8)
+    days = pd.bdate_range("2024-01-02", periods=30)
+    calls = pd.DataFrame(
+        {
+            "symbol": rng.choice(["AAA", "BBB", "CCC", "DDD", "EEE"], 150),
+            "date": days[rng.integers(0, 30, 150)].strftime("%Y-%m-%d 16:30:00"),
+            "tone_dispersion": rng.normal(0.15, 0.04, 150),
+        }
+    ).sort_values("date", kind="stable")
+    calls["call_key"] = [f"k{i}" for i in range(150)]
+    ff = pd.DataFrame(0.0, index=pd.bdate_range("2024-01-01", periods=40), columns=nz.FACTORS)
+    monkeypatch.setattr(nz, "FF", ff.rename_axis("trade_date"))
+
+    def write(frame, mtime):
+        frame.to_parquet(tmp_data / "tone_dispersion.parquet", index=False)
+        os.utime(tmp_data / "tone_dispersion.parquet", ns=(mtime, mtime))
+
+    inc = IncrementalBacktest(tmp_path / "state", smoothing=0.5)
+    write(calls.iloc[:120], 10**9)
+    assert inc.update()["mode"] == "full"
+    assert inc.update()["mode"] == "unchanged"
+
+    # the last 30 calls arrive, one old call is revised
+    revised = calls.copy()
+    revised.iloc[100, revised.columns.get_loc("tone_dispersion")] += 0.1
+    write(revised, 2 * 10**9)
+    summary = inc.update()
+    assert summary["mode"] == "incremental"
+    assert (summary["new"], summary["changed"], summary["removed"]) == (30, 1, 0)
+
+    expected = pf.build_weights(nz.neutralise(fb.factor_from_calls(revised)), smoothing=0.5)
+    pd.testing.assert_series_equal(inc.resid, nz.neutralise(fb.factor_from_calls(revised)))
+    assert np.allclose(inc.weights.to_numpy(), expected.to_numpy())
+    assert inc.weights.index.equals(expected.index)
+
+
+def test_incremental_update_new_symbol(tmp_data, tmp_path, monkeypatch):
+    from src.incremental import IncrementalBacktest
+
+    rng = np.random.default_rng(18)
+    days = pd.bdate_range("2024-01-02", periods=30)
+    day = rng.integers(0, 30, 150)
+    names = np.array(["AAA", "BBB", "CCC", "DDD", "EEE", "FFF"])
+    calls = pd.DataFrame(
+        {
+            "symbol": names[rng.integers(0, np.where(day >= 20, 6, 5))],
+            "date": days[day].strftime("%Y-%m-%d 16:30:00"),
+            "tone_dispersion": rng.normal(0.15, 0.04, 150),
+        }
+    ).sort_values("date", kind="stable")
+    calls["call_key"] = [f"k{i}" for i in range(150)]
+    ff = pd.DataFrame(0.0, index=pd.bdate_range("2024-01-01", periods=40), columns=nz.FACTORS)
+    monkeypatch.setattr(nz, "FF", ff.rename_axis("trade_date"))
+
+    def write(frame, mtime):
+        frame.to_parquet(tmp_data / "tone_dispersion.parquet", index=False)
+        os.utime(tmp_data / "tone_dispersion.parquet", ns=(mtime, mtime))
+
+    # FFF first reports on day 20, after the state was built
+    inc = IncrementalBacktest(tmp_path / "state", smoothing=0.5)
+    old = pd.to_datetime(calls["date"]) < days[20]
+    write(calls[old], 10**9)
+    assert inc.update()["mode"] == "full"
+    assert "FFF" not in inc.weights.columns
+    write(calls, 2 * 10**9)
+    summary = inc.update()
+    assert summary["recomputed_from"] == str(inc.weights.index[0])
+
+    expected = pf.build_weights(nz.neutralise(fb.factor_from_calls(calls)), smoothing=0.5)
+    assert inc.weights.columns.equals(expected.columns)
+    assert np.allclose(inc.weights.to_numpy(), expected.to_numpy(), equal_nan=True)
+
+
+def test_incremental_update_dataset_reads_new_files(tmp_data, tmp_path, monkeypatch):
+    import src.load as ld
+    from src import matrix_store
+    from src.incremental import IncrementalBacktest
+    from src.ingest import ingest_calls
+
+    rng = np.random.default_rng(28)
+    days = pd.bdate_range("2023-12-01", periods=60)
+    day = np.sort(rng.integers(0, 60, 300))
+    calls = pd.DataFrame(
+        {
+            "call_key": [f"k{i}" for i in range(300)],
+            "symbol": rng.choice(["AAA", "BBB", "CCC", "DDD", "EEE"], 300),
+            "date": days[day].strftime("%Y-%m-%d 16:30:00"),
+            "tone_dispersion": rng.normal(0.15, 0.04, 300),
+        }
+    )
+    ff = pd.DataFrame(0.0, index=pd.bdate_range("2023-11-01", periods=90), columns=nz.FACTORS)
+    monkeypatch.setattr(nz, "FF", ff.rename_axis("trade_date"))
+
+    inc = IncrementalBacktest(tmp_path / "state", smoothing=0.5)
+    first = day < 40
+    ingest_calls(calls[first])
+    assert inc.update()["mode"] == "full"
+    kept = tmp_path / "state" / "resid" / "2023.parquet"
+    mtime = kept.stat().st_mtime_ns
+
+    # the second batch is read on its own, plus the calls around its dates;
+    # the weights are extended in place and earlier years are not rewritten
+    ingest_calls(calls[~first])
+    opened = []
+    read = ld._read
+    monkeypatch.setattr(
+        ld, "_read", lambda path, *a, **k: opened.append(path) or read(path, *a, **k)
+    )
+    monkeypatch.setattr(matrix_store, "write_matrix", None)
+    summary = inc.update()
+    assert summary["mode"] == "incremental" and summary["new"] == (~first).sum()
+    assert summary["recomputed_from"] > str(days[39])
+    assert not any("part-000000" in str(p) for p in opened)
+    assert kept.stat().st_mtime_ns == mtime
+
+    expected = nz.neutralise(fb.factor_from_calls(calls))
+    pd.testing.assert_series_equal(inc.resid, expected)
+    weights = pf.build_weights(expected, smoothing=0.5)
+    assert inc.weights.index.equals(weights.index)
+    assert np.allclose(inc.weights.to_numpy(), weights.to_numpy(), equal_nan=True)
+
+
+def test_chunked_backtest_matches_batch(tmp_data, tmp_path):
+    from src.chunked import run_chunked
+    from src.matrix_store import open_matrix
+
+    rng = np.random.default_rng(9)
+    days = pd.bdate_range("2024-01-02", periods=40)
+    ix = pd.MultiIndex.from_arrays(
+        [days[rng.integers(0, 35, 120)], rng.choice(["AAA", "BBB", "CCC", "DDD"], 120)],
+        names=["trade_date", "symbol"],
+    )
+    resid = pd.Series(rng.normal(size=120), index=ix).groupby(level=[0, 1]).mean()
+    px_days = days.delete(7)  # a weight date without a price row
+    pd.DataFrame(
+        {
+            "date": np.repeat(px_days, 3),
+            "symbol": ["aaa", "bbb", "ccc"] * len(px_days),  # DDD is never priced
+            "adjClose": rng.uniform(50, 150, 3 * len(px_days)),
+        }
+    ).to_parquet(tmp_data / "stock_prices.parquet", row_group_size=30)
+
+    w = pf.build_weights(resid, smoothing=0.5)
+    # a budget of one weight date per block exercises every carry
+    out = run_chunked(
+        resid, smoothing=0.5, horizon=3, memory_mb=1e-4, weights_path=tmp_path / "w"
+    )
+    stored = open_matrix(tmp_path / "w").to_numpy()
+    assert np.allclose(stored, w.to_numpy(), equal_nan=True)
+    expected = pf.pnl(w, horizon=3)
+    assert out["pnl"].index.equals(expected.index)
+    assert np.allclose(out["pnl"], expected)
+    assert np.allclose(out["turnover"], pf.calculate_turnover(w))
+
+
+def test_streaming_dispersion_matches_groupby(tmp_data, tmp_path):
+    import src.load as ld
+    from src.dispersion import compute_dispersion
+
+    rng = np.random.default_rng(10)
+    n_calls = 40
+    turns = pd.DataFrame(
+        {
+            "call_key": np.repeat([f"c{i}" for i in range(n_calls)], 12),
+            "turn": np.tile(np.arange(12), n_calls),
+            "role": rng.choice(["executive", "analyst"], 12 * n_calls),
+            "score": rng.uniform(-1, 1, 12 * n_calls),
+        }
+    )
+    meta = pd.DataFrame(
+        {
+            "call_key": [f"c{i}" for i in range(n_calls)],
+            "symbol": rng.choice(["AAA", "BBB", "CCC"], n_calls),
+            "date": pd.bdate_range("2024-01-02", periods=n_calls).strftime(
+                "%Y-%m-%d 16:30:00"
+            ),
+        }
+    )
+    turns = turns.merge(meta, on="call_key").sample(frac=1.0, random_state=1)
+    turns.iloc[:3, turns.columns.get_loc("score")] = np.nan  # unscored turns
+    turns.loc[turns["call_key"] == "c0", "score"] = [0.5] + [np.nan] * 11  # one turn
+
+    # calls are split across parquet row groups and a JSON-lines file
+    half = len(turns) // 2
+    src_dir = tmp_path / "turns"
+    src_dir.mkdir()
+    turns.iloc[:half].to_parquet(src_dir / "a.parquet", index=False, row_group_size=50)
+    turns.iloc[half:].to_json(src_dir / "b.jsonl", orient="records", lines=True)
+
+    expected = turns.groupby("call_key")["score"].agg(
+        lambda s: s.var(ddof=0) if s.count() >= 2 else np.nan
+    )
+    for n_jobs in (1, 2):
+        calls = compute_dispersion(src_dir, tmp_data / "tone_dispersion.parquet", 60, n_jobs)
+        got = calls.set_index("call_key")["tone_dispersion"]
+        assert np.allclose(got[expected.index], expected, equal_nan=True)
+        assert calls["date"].is_monotonic_increasing and len(calls) == n_calls
+        assert calls.set_index("call_key")["n_turns"]["c0"] == 1
+
+    # an output under the sources is not read back as turns on the next run
+    for _ in range(2):
+        inside = compute_dispersion(src_dir, src_dir / "out" / "calls.parquet", 60, 1)
+    assert len(inside) == n_calls
+
+    loaded = ld.tone_calls(columns=["symbol", "date", "tone_dispersion"])
+    assert list(loaded.columns) == ["symbol", "date", "tone_dispersion"]
+    assert len(loaded) == n_calls
+
+
+def test_sentiment_scorers_and_batch_pipeline(tmp_path):
+    import zlib
+
+    from src.dispersion import compute_dispersion
+    from src.sentiment import HashedLinearScorer, LexiconScorer, Scorer, score_transcripts
+
+    with pytest.raises(TypeError):
+        Scorer()  # abstract: subclasses must implement score
+
+    texts = ["Strong growth, great quarter!", "", None, "weak demand, weak margins", "ok"]
+    lex = LexiconScorer({"great": 3.1, "strong": 2.3, "weak": -1.9, "Growth": 1.0})
+    s = sum([2.3, 1.0, 3.1])
+    expected = [s / np.sqrt(s * s + 15), np.nan, np.nan, -3.8 / np.sqrt(3.8**2 + 15), 0.0]
+    assert np.allclose(lex.score(texts), expected, equal_nan=True)
+
+    rng = np.random.default_rng(11)
+    hashed = HashedLinearScorer(rng.normal(size=64), bias=0.1)
+    for text, got in zip(texts, hashed.score(texts)):
+        words = (text or "").lower().replace(",", " ").replace("!", " ").split()
+        if not words:
+            assert np.isnan(got)
+            continue
+        counts = pd.Series([zlib.crc32(w.encode()) % 64 for w in words]).value_counts()
+        x = counts.to_numpy(dtype=float) / np.sqrt((counts.to_numpy() ** 2).sum())
+        assert np.isclose(got, np.tanh(0.1 + x @ hashed.weights[counts.index]))
+    hashed.save(tmp_path / "model.npz")
+    assert HashedLinearScorer.load(tmp_path / "model.npz").key == hashed.key
+
+    turns = pd.DataFrame(
+        {
+            "symbol": "AAA",
+            "call_key": np.repeat(["c0", "c1", "c2"], 4),
+            "date": "2024-03-01 16:30:00",
+            "turn": np.tile(np.arange(4), 3),
+            "role": "executive",
+            "text": rng.choice(texts[:2] + texts[3:], 12),
+        }
+    )
+    turns.to_parquet(tmp_path / "calls.parquet", index=False, row_group_size=5)
+    for n_jobs in (1, 2):
+        stats = score_transcripts(tmp_path / "calls.parquet", tmp_path / "s", lex, 5, n_jobs)
+        assert stats["turns"] == 12 and stats["batches"] == 3
+        assert stats["scored"] == int((turns["text"] != "").sum())
+    scores = pd.read_parquet(tmp_path / "s").sort_values(["call_key", "turn"])
+    assert np.allclose(scores["score"], lex.score(turns["text"].tolist()), equal_nan=True)
+    assert len(compute_dispersion(tmp_path / "s", n_jobs=1)) == 3
+
+    # a rerun with another batch size replaces the earlier batches
+    before = compute_dispersion(tmp_path / "s", n_jobs=1)
+    rerun = score_transcripts(tmp_path / "calls.parquet", tmp_path / "s", lex, 12, 1)
+    assert rerun["batches"] == 1
+    assert len(pd.read_parquet(tmp_path / "s")) == 12
+    pd.testing.assert_frame_equal(compute_dispersion(tmp_path / "s", n_jobs=1), before)
+    assert [p.name for p in tmp_path.iterdir() if p.name.startswith(".")] == []
+
+
+def test_score_cache_only_scores_unseen_turns(tmp_path):
+    from src.score_cache import ScoreCache, normalise_text, text_keys
+    from src.sentiment import LexiconScorer, score_transcripts
+
+    cache = ScoreCache(tmp_path / "cache")
+    keys = text_keys(["a b", "c"], "lexicon:1")
+    assert not np.array_equal(keys, text_keys(["a b", "c"], "lexicon:2"))
+    assert normalise_text("  a\n b ") == "a b" and normalise_text(None) == ""
+    assert cache.append(np.r_[keys, keys[:1]], [0.5, np.nan, 0.5]) == 2
+    assert cache.append(keys, [0.1, 0.1]) == 0  # append-only: first score wins
+    scores, found = cache.lookup(np.r_[keys, np.uint64(7)])
+    assert found.tolist() == [True, True, False] and scores[0] == 0.5
+    cache.compact()
+    reopened = ScoreCache(tmp_path / "cache", readonly=True)
+    assert len(reopened) == 2 and reopened.lookup(keys)[1].all()
+    with pytest.raises(PermissionError):
+        reopened.append(keys, [0.0, 0.0])
+
+    # a torn append (scores written, keys not) must not shift later records
+    with open(tmp_path / "cache" / "scores.f64", "ab") as f:
+        f.write(np.array([9.0, 9.0]).tobytes())
+    more = text_keys(["d", "e"], "lexicon:1")
+    assert ScoreCache(tmp_path / "cache").append(more, [0.25, 0.75]) == 2
+    reopened = ScoreCache(tmp_path / "cache", readonly=True)
+    scores, found = reopened.lookup(np.r_[keys, more])
+    assert found.all() and scores[[0, 2, 3]].tolist() == [0.5, 0.25, 0.75]
+
+    counted = []
+
+    class Counting(LexiconScorer):
+        def score(self, texts):
+            counted.extend(texts)
+            return super().score(texts)
+
+    scorer = Counting({"great": 3.0, "weak": -2.0})
+    text = ["great call", "weak  call", "great call", "", "weak call"]
+    pd.DataFrame(
+        {"call_key": "c0", "turn": range(5), "symbol": "AAA", "text": text}
+    ).to_parquet(tmp_path / "t.parquet", index=False)
+
+    src_file, cache_dir = tmp_path / "t.parquet", tmp_path / "sc"
+    first = score_transcripts(src_file, tmp_path / "s1", scorer, 10, 1, cache_dir)
+    assert (first["cache_hits"], first["cache_misses"]) == (0, 5)
+    assert sorted(counted) == ["", "great call", "weak call"]
+
+    counted.clear()
+    second = score_transcripts(src_file, tmp_path / "s2", scorer, 10, 1, cache_dir)
+    assert (second["cache_hits"], second["cache_misses"]) == (5, 0) and not counted
+    pd.testing.assert_frame_equal(
+        pd.read_parquet(tmp_path / "s1"), pd.read_parquet(tmp_path / "s2")
+    )
+
+
+def test_text_factors_single_pass(tmp_path):
+    from src.dispersion import compute_dispersion
+    from src.text_factors import build_text_factors, call_features, call_stats, merge_stats
+
+    rng = np.random.default_rng(12)
+    roles = ["Executive"] * 4 + ["Operator"] + ["Analyst", "Executive"] * 4
+    rows = []
+    for i in range(30):
+        day = pd.bdate_range("2024-02-01", periods=6)[i % 6]
+        for t, role in enumerate(roles):
+            rows.append((f"k{i}", "ABCDE"[i % 5], f"{day:%Y-%m-%d} 07:00:00", t, role))
+    turns = pd.DataFrame(rows, columns=["call_key", "symbol", "date", "turn", "role"])
+    turns["score"] = rng.uniform(-1, 1, len(turns))
+    turns.to_parquet(tmp_path / "scores.parquet", index=False, row_group_size=20)
+
+    panel = build_text_factors(tmp_path / "scores.parquet", chunk_rows=20, n_jobs=1)
+    expected = fb.factor_from_calls(compute_dispersion(tmp_path / "scores.parquet", n_jobs=1))
+    got = panel["tone_dispersion"].dropna()
+    assert got.index.equals(expected.index) and np.allclose(got, expected)
+
+    # call-level features against pandas, with calls split across row groups
+    parts = [call_stats(turns.iloc[:200]), call_stats(turns.iloc[200:])]
+    calls = call_features(merge_stats(parts))
+    g = turns.groupby("call_key")["score"]
+    by_call = calls.set_index("call_key").loc[g.mean().index]
+    assert np.allclose(by_call["tone_mean"], g.mean())
+    assert np.allclose(by_call["tone_skew"], g.skew() * (13 - 2) / np.sqrt(13 * 12))
+    assert np.allclose(by_call["tone_min"], g.min())
+    assert np.allclose(by_call["tone_max"], g.max())
+    execs = turns[turns["role"] == "Executive"].groupby("call_key")["score"].mean()
+    analysts = turns[turns["role"] == "Analyst"].groupby("call_key")["score"].mean()
+    assert np.allclose(by_call["exec_analyst_gap"], execs - analysts)
+    pre = turns[turns["turn"] < 4].groupby("call_key")["score"].mean()
+    qa = turns[turns["turn"] >= 5].groupby("call_key")["score"].mean()
+    assert np.allclose(by_call["qa_tone_change"], qa - pre)
+
+    # contiguous chunks without analyst turns before and after the Q&A start,
+    # merged in two steps as stream_calls does
+    t = turns["turn"]
+    head, mid, tail = (call_stats(turns[m]) for m in (t < 4, (t >= 4) & (t < 12), t >= 12))
+    for merged in [
+        merge_stats([merge_stats([head, mid]), tail]),
+        merge_stats([tail, head, mid]),
+    ]:
+        split = call_features(merged).set_index("call_key").loc[by_call.index]
+        assert np.allclose(split["qa_tone_change"], by_call["qa_tone_change"])
+    by_turn = turns.sort_values(["call_key", "turn"])
+    by_turn.to_parquet(tmp_path / "ordered.parquet", index=False, row_group_size=12)
+    streamed = build_text_factors(tmp_path / "ordered.parquet", chunk_rows=12, n_jobs=2)
+    assert streamed["qa_tone_change"].notna().all()
+    pd.testing.assert_series_equal(streamed["qa_tone_change"], panel["qa_tone_change"])
+
+    # moments are exact in any order; the Q&A split of interleaved partials is not
+    shuffled = turns.sample(frac=1.0, random_state=2)
+    mixed = call_features(
+        merge_stats([call_stats(shuffled.iloc[:200]), call_stats(shuffled.iloc[200:])])
+    ).set_index("call_key").loc[by_call.index]
+    assert np.allclose(mixed["tone_dispersion"], by_call["tone_dispersion"])
+    assert np.allclose(mixed["tone_skew"], by_call["tone_skew"])
+    ok = mixed["qa_tone_change"].notna()
+    assert np.allclose(mixed.loc[ok, "qa_tone_change"], by_call.loc[ok, "qa_tone_change"])
+
+
+def test_ingest_dedups_and_prunes_partitions(tmp_data):
+    import src.load as ld
+    from src.ingest import ingest_calls, key_digests, read_manifest
+
+    days = pd.to_datetime(["2022-03-01", "2022-11-01", "2023-05-02", "2024-02-01"])
+    calls = pd.DataFrame(
+        {
+            "call_key": ["a", "b", "c", "d"],
+            "symbol": ["AAA", "BBB", "AAA", "CCC"],
+            "date": days.strftime("%Y-%m-%d 16:30:00"),
+            "tone_dispersion": [0.1, 0.2, 0.3, 0.4],
+        }
+    )
+    # the existing single-file table is imported by the first ingest
+    legacy = tmp_data / "tone_dispersion.parquet"
+    calls.iloc[:1].to_parquet(legacy, index=False)
+    first = ingest_calls(calls.iloc[1:3])
+    assert (first["new"], first["partitions"]) == (2, ["2022", "2023"])
+    assert first["seeded"] == str(legacy)
+
+    # a re-delivery of "b" and "c" ("b" moved to another year), a repeated key
+    # inside the batch and a bad date
+    moved = calls.iloc[[1]].assign(date="2024-01-03 08:00:00")
+    bad = calls.iloc[[0]].assign(date="n/a")
+    again = pd.concat([moved, calls.iloc[2:], calls.iloc[[3]], bad])
+    with pytest.MonkeyPatch.context() as mp:
+        import pyarrow.dataset as ds
+
+        mp.setattr(ds, "dataset", None)  # keys come from the key file alone
+        second = ingest_calls(again)
+    assert (second["new"], second["duplicates"], second["unparseable"]) == (1, 3, 1)
+    assert second["seeded"] is None
+    manifest = read_manifest()
+    assert manifest["rows"] == 4 and sorted(manifest["partitions"]) == ["2022", "2023", "2024"]
+    assert manifest["partitions"]["2022"]["max_date"] == "2022-11-01 16:30:00"
+    keys = np.load(tmp_data / "tone_dispersion" / manifest["keys"])
+    assert np.array_equal(keys, np.sort(key_digests(calls["call_key"])))
+    assert len(list((tmp_data / "tone_dispersion").glob("keys-*.npy"))) == 1
+    assert ld.tone_source() == tmp_data / "tone_dispersion" / "manifest.json"
+
+    loaded = ld.tone_calls().sort_values("call_key").reset_index(drop=True)
+    pd.testing.assert_frame_equal(loaded, calls, check_dtype=False)
+    assert [f.parent.name for f in ld.tone_files("2023-01-01", "2023-12-31")] == ["2023"]
+    window = ld.tone_calls(columns=["call_key"], start="2022-06-01", end="2023-12-31")
+    assert sorted(window["call_key"]) == ["b", "c"]
+    assert ld.tone_calls(start="2030-01-01").empty
+
+
+def test_stage_cache_and_dag(tmp_path):
+    import threading
+
+    from src.pipeline import Pipeline
+
+    calls = []
+    src_file = tmp_path / "input.txt"
+    src_file.write_text("1")
+
+    def base(scale):
+        calls.append("base")
+        idx = pd.MultiIndex.from_product([pd.date_range("2025-01-02", periods=3), ["A", "B"]])
+        return pd.Series(np.arange(6.0) * scale, index=idx, name="x")
+
+    def double(x):
+        calls.append("double")
+        return x * 2
+
+    def summary(x):
+        calls.append("summary")
+        return {"total": float(x.sum()), "n": np.int64(len(x))}
+
+    def plot(x):
+        calls.append(threading.current_thread() is threading.main_thread())
+
+    def build(scale):
+        pipe = Pipeline(tmp_path / "stages")
+        pipe.add("base", base, params={"scale": scale}, sources=[src_file])
+        pipe.add("double", double, deps=["base"])
+        pipe.add("summary", summary, deps=["base"])
+        pipe.add("plot", plot, deps=["double"], persist=False, exclusive=True)
+        return pipe
+
+    out = build(1.0).run("double", "summary", "plot")
+    assert out["summary"] == {"total": 15.0, "n": 6}
+    assert sorted(map(str, calls)) == ["True", "base", "double", "summary"]
+
+    # a fresh pipeline reads stored outputs without touching upstream stages
+    calls.clear()
+    pipe = build(1.0)
+    doubled = pipe["double"]
+    assert doubled.equals(out["double"]) and doubled.name == "x"
+    assert calls == [] and pipe.stats() == {"hits": 1, "misses": 0}
+
+    # parameters and source files are part of the key
+    assert build(2.0)["summary"]["total"] == 30.0
+    assert calls == ["base", "summary"]
+    calls.clear()
+    src_file.write_text("22")
+    build(1.0)["double"]
+    assert calls == ["base", "double"]
+
+
+def test_backtest_stage_code(tmp_path):
+    from src import pipeline, trading_calendar
+
+    # session rules feed the factor, so editing them must invalidate it
+    pipe = pipeline.backtest(cache_dir=tmp_path)
+    assert trading_calendar in pipe.stages["factor"].code
+
+
+def test_stage_trace_records(tiny_calls, tmp_path, monkeypatch):
+    import json
+
+    from src import instrument
+
+    trace = tmp_path / "trace.jsonl"
+    monkeypatch.setenv("TONE_TRACE", str(trace))
+    monkeypatch.setenv("TONE_PROFILE", "build_daily_factor")
+    monkeypatch.setenv("TONE_PROFILE_DIR", str(tmp_path / "prof"))
+
+    calls = tiny_calls.reset_index().astype({"trade_date": object})
+    calls.loc[5, "trade_date"] = "not a date"  # leaves a one-stock date too
+    monkeypatch.setattr(fb, "tone_calls", lambda **_: calls)
+
+    with instrument.stage("outer"):
+        fac = fb.build_daily_factor()
+    inner, outer = [json.loads(line) for line in trace.read_text().splitlines()]
+
+    assert inner["stage"] == "build_daily_factor" and inner["parent"] == "outer"
+    assert inner["output"] == [len(fac)]
+    assert inner["dropped"] == {"unparseable call date": 1, "undefined z-score": 1}
+    assert outer["wall_s"] >= inner["wall_s"] and outer["peak_mb"] >= inner["peak_mb"]
+    assert len(list((tmp_path / "prof").glob("build_daily_factor-*.prof"))) == 1
+    assert instrument.summarise(trace).loc["build_daily_factor", "dropped_rows"] == 2
+
+
+def test_stage_trace_concurrent_threads(tmp_path, monkeypatch):
+    import json
+    import threading
+    import tracemalloc
+
+    from src import instrument
+    from src.pipeline import Pipeline
+
+    trace = tmp_path / "trace.jsonl"
+    monkeypatch.setenv("TONE_TRACE", str(trace))
+    both = threading.Barrier(2)
+
+    def work(name):
+        with instrument.stage(name):
+            both.wait()
+            block = bytearray(2**21)
+            both.wait()
+            del block
+
+    with instrument.stage("outer"):
+        side = threading.Thread(target=work, args=("side",))
+        side.start()
+        work("main")
+        side.join()
+    # memory belongs to the first thread in; the other stage is not measured
+    # and nothing resets or stops tracemalloc under the measuring stage
+    rec = {r["stage"]: r for r in map(json.loads, trace.read_text().splitlines())}
+    assert rec["side"]["peak_mb"] is None and rec["side"]["parent"] is None
+    assert rec["main"]["peak_mb"] >= 2 and rec["outer"]["peak_mb"] >= rec["main"]["peak_mb"]
+    assert tracemalloc.is_tracing()
+
+    # pipeline stages on pool threads keep the caller's stage as parent
+    trace.unlink()
+    pipe = Pipeline(tmp_path / "stages", max_workers=2)
+    pipe.add("a", instrument.instrumented("a")(lambda: pd.Series([1.0])))
+    pipe.add("b", instrument.instrumented("b")(lambda a: a * 2), deps=["a"])
+    with instrument.stage("run"):
+        pipe.run("b")
+    rec = {r["stage"]: r for r in map(json.loads, trace.read_text().splitlines())}
+    assert rec["a"]["parent"] == rec["b"]["parent"] == "run"
+    tracemalloc.stop()
+
+
+def test_stage_profile_nested(tmp_path, monkeypatch):
+    import pstats
+
+    from src import instrument
+
+    monkeypatch.setenv("TONE_PROFILE", "all")
+    monkeypatch.setenv("TONE_PROFILE_DIR", str(tmp_path / "prof"))
+
+    def after_inner():
+        return sum(range(1000))
+
+    with instrument.stage("outer"):
+        with instrument.stage("inner"):
+            sum(range(1000))
+        after_inner()
+
+    # one profile for the outermost stage, still recording after the nested one
+    (prof,) = (tmp_path / "prof").glob("*.prof")
+    assert prof.name.startswith("outer-")
+    funcs = {fn for _, _, fn in pstats.Stats(str(prof)).stats}
+    assert "after_inner" in funcs
+
+
+def test_synthetic_data_feeds_loaders(tmp_data, tmp_path):
+    import src.load as ld
+    from benchmarks import synthetic
+
+    paths = synthetic.generate(tmp_data, symbols=12, years=1, seed=3)
+    again = synthetic.generate(tmp_path / "b", symbols=12, years=1, seed=3)
+    for name, path in paths.items():
+        pd.testing.assert_frame_equal(pd.read_parquet(path), pd.read_parquet(again[name]))
+
+    px = ld.prices(disk_cache=False)
+    assert px.shape == (252, 12) and px.notna().any().all()
+    assert list(ld.ff_factors().columns) == [*synthetic.FACTORS, "rf"]
+
+    calls = ld.tone_calls()
+    assert set(calls["symbol"]) <= set(px.columns)
+    assert calls["call_key"].is_unique
+    fac = fb.build_daily_factor()
+    assert fac.index.names == ["trade_date", "symbol"] and len(fac) > 0
+
+
+def test_import_is_lazy():
+    # importing the pipeline must not load data or heavy optional libraries
+    code = (
+        "import sys, src.factor_build, src.neutralise, src.portfolio, src.report\n"
+        "import src.load as ld\n"
+        "heavy = [m for m in ('matplotlib', 'statsmodels', 'sklearn', 'alphalens')"
+        " if m in sys.modules]\n"
+        "assert not heavy, heavy\n"
+        "assert ld.cache.stats()['misses'] == 0\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", code], cwd=root, check=True)